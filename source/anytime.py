@@ -0,0 +1,171 @@
+from __future__ import annotations
+import heapq
+import math
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from pathfinder import AdjTable, NodeId
+
+CostFn      = Callable[[NodeId, NodeId], int]
+HeuristicFn = Callable[[NodeId, NodeId], float]
+
+# a cada quantas expansões o relógio é consultado
+CLOCK_EVERY = 8
+
+
+"""
+ARA* (Anytime Repairing A*) que pode ser pausado e retomado.
+
+    • Começa com A* ponderado (f = g + w·h, w = `w0`): acha rápido um caminho
+      no máximo `w` vezes pior que o ótimo.
+    • A cada solução reduz `w` em `w_step` e reaproveita a busca (nós
+      inconsistentes voltam para a fronteira) até chegar a w = 1 (ótimo).
+    • `run` trabalha só até estourar o orçamento (expansões e/ou tempo) e
+      continua de onde parou na próxima chamada.
+
+`bound` é o limite de subotimalidade garantido para `path`; só vale com
+heurística admissível (`admissible=False` deixa o limite desconhecido, inf)
+e custos fixos durante a busca: se o custo de entrar num nó que já tem g
+mudar (`touches`), a busca precisa recomeçar.
+"""
+class AnytimePlanner:
+
+    def __init__(
+        self,
+        start: NodeId,
+        goal: NodeId,
+        adj: AdjTable,
+        cost_fn: CostFn,
+        heuristic: HeuristicFn,
+        w0: float = 2.5,
+        w_step: float = 0.5,
+        admissible: bool = True,   # h nunca superestima (sem isso não há limite)
+    ) -> None:
+
+        self.start  = start
+        self.goal   = goal
+        self.adj    = adj
+        self.cost   = cost_fn
+        self.h      = heuristic
+        self.w      = max(1.0, w0)
+        self.w_step = w_step
+        self.admissible = admissible
+
+        # resultado
+        self.path: List[NodeId] | None = None
+        self.bound = math.inf
+        self.done  = False
+        self.expansions = 0
+        self.solutions  = 0
+
+        # estado da busca
+        self._g: Dict[NodeId, float] = {start: 0}
+        self._came: Dict[NodeId, NodeId] = {}
+        self._open: List[Tuple[float, float, NodeId]] = []
+        self._in_open: Set[NodeId] = set()
+        self._closed: Set[NodeId] = set()
+        self._incons: Set[NodeId] = set()
+        self._push(start)
+
+    # Interface pública
+    def run(self, max_expansions: int | None = None, max_us: float | None = None) -> int:
+        """
+        Avança a busca dentro do orçamento; devolve as expansões usadas.
+        Sem orçamento, roda até o ótimo.
+        """
+        deadline = None if max_us is None else time.perf_counter() + max_us / 1e6
+        used = 0
+        while not self.done:
+            if max_expansions is not None and used >= max_expansions:
+                break
+            if deadline is not None and used % CLOCK_EVERY == 0 and used and time.perf_counter() >= deadline:
+                break
+
+            if self._iteration_finished():
+                self._finish_iteration()
+                continue
+
+            _, g_push, cur = heapq.heappop(self._open)
+            if cur not in self._in_open or g_push != self._g[cur]:
+                continue  # entrada velha
+            self._in_open.discard(cur)
+            self._closed.add(cur)
+            used += 1
+            self._expand(cur)
+
+        self.expansions += used
+        return used
+
+    def touches(self, nodes) -> bool:
+        """True se o custo de entrar em algum de `nodes` já entrou num g calculado."""
+        return any(n in self._g for n in nodes)
+
+    # Algoritmos internos
+    def _f(self, n: NodeId) -> float:
+        return self._g[n] + self.w * self.h(n, self.goal)
+
+    def _push(self, n: NodeId) -> None:
+        self._in_open.add(n)
+        heapq.heappush(self._open, (self._f(n), self._g[n], n))
+
+    def _min_open_f(self) -> float:
+        while self._open:
+            f, g_push, n = self._open[0]
+            if n in self._in_open and g_push == self._g[n]:
+                return f
+            heapq.heappop(self._open)
+        return math.inf
+
+    def _iteration_finished(self) -> bool:
+        g_goal = self._g.get(self.goal, math.inf)
+        return g_goal <= self._min_open_f() or not self._in_open
+
+    def _expand(self, cur: NodeId) -> None:
+        g_cur = self._g[cur]
+        for nxt in self.adj[cur]:
+            ng = g_cur + self.cost(cur, nxt)
+            if ng < self._g.get(nxt, math.inf):
+                self._g[nxt] = ng
+                self._came[nxt] = cur
+                if nxt in self._closed:
+                    self._incons.add(nxt)   # volta na próxima iteração
+                else:
+                    self._push(nxt)
+
+    def _finish_iteration(self) -> None:
+        if self.goal in self._g:
+            self.solutions += 1
+            self.path = self._reconstruct()
+            # limite garantido: min(w, g(goal) / menor g+h ainda pendente)
+            pendentes = self._in_open | self._incons
+            lower = min((self._g[n] + self.h(n, self.goal) for n in pendentes), default=math.inf)
+            g_goal = self._g[self.goal]
+            self.bound = min(self.w, g_goal / lower) if lower > 0 else self.w
+            self.bound = max(1.0, self.bound) if self.admissible else math.inf
+        elif not self._in_open and not self._incons:
+            self.done = True   # sem rota
+            return
+
+        if self.w <= 1.0 or self.bound <= 1.0:
+            self.done = True
+            self.bound = 1.0 if self.path is not None and self.admissible else self.bound
+            return
+
+        # próxima iteração: w menor, inconsistentes de volta à fronteira
+        self.w = max(1.0, self.w - self.w_step)
+        pendentes = self._in_open | self._incons
+        self._incons = set()
+        self._closed = set()
+        self._in_open = set()
+        self._open = []
+        for n in pendentes:
+            self._push(n)
+
+    def _reconstruct(self) -> List[NodeId]:
+        cur = self.goal
+        path = [cur]
+        while cur in self._came:
+            cur = self._came[cur]
+            path.append(cur)
+        path.reverse()
+        return path
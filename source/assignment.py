@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from pathfinder import AdjTable, NodeId, dijkstra_all
+
+# Custo usado para pares sem caminho (finito: evita inf - inf nas contas)
+SEM_ROTA = 1e12
+
+# Acima disto o lote vai para a heurística de inserção
+HUNGARIAN_MAX = 64
+
+
+"""
+Resultado de uma atribuição em lote.
+
+    routes    : van -> sequência de objetivos (ordem de visita)
+    unassigned: pedidos sem rota a partir de nenhuma van
+    total_cost: soma dos custos das rotas (na unidade de `cost_fn`)
+"""
+class Assignment:
+
+    def __init__(
+        self,
+        routes: Dict[str, List[NodeId]],
+        unassigned: List[NodeId],
+        total_cost: float,
+        method: str,
+        seconds: float,
+    ) -> None:
+
+        self.routes     = routes
+        self.unassigned = unassigned
+        self.total_cost = total_cost
+        self.method     = method
+        self.seconds    = seconds
+
+    @property
+    def assigned(self) -> int:
+        return sum(len(r) for r in self.routes.values())
+
+    def report(self) -> Dict[str, float | int | str]:
+        return {
+            "method": self.method,
+            "orders": self.assigned + len(self.unassigned),
+            "assigned": self.assigned,
+            "unassigned": len(self.unassigned),
+            "vans": len(self.routes),
+            "seconds": self.seconds,
+            "orders_per_s": self.assigned / self.seconds if self.seconds > 0 else float("inf"),
+            "total_route_len": self.total_cost,
+        }
+
+
+# Interface pública
+def cost_matrix(
+    sources: Sequence[NodeId],
+    targets: Sequence[NodeId],
+    adj: AdjTable,
+    cost_fn: Callable[[NodeId, NodeId], int],
+) -> np.ndarray:
+    """
+    Uma busca um-para-muitos (`dijkstra_all`) por origem; SEM_ROTA onde não
+    há caminho. O grafo é convertido uma vez para índices inteiros com os
+    custos das arestas já calculados (`pesos[a][b]`, que serve também de
+    adjacência), e cada busca para ao fixar todos os `targets`.
+    """
+    ids = list(adj)
+    idx = {nid: i for i, nid in enumerate(ids)}
+    pesos = [{idx[b]: cost_fn(a, b) for b in adj[a]} for a in ids]
+    alvo = {idx[t] for t in targets if t in idx}
+
+    out = np.full((len(sources), len(targets)), SEM_ROTA)
+    feitas: Dict[NodeId, int] = {}   # origens repetidas reaproveitam a linha
+    for r, s in enumerate(sources):
+        if s in feitas:
+            out[r] = out[feitas[s]]
+            continue
+        feitas[s] = r
+        if s not in idx:
+            continue
+        dist = dijkstra_all(idx[s], pesos, targets=alvo, weights=pesos)
+        out[r] = [dist.get(idx.get(t), SEM_ROTA) for t in targets]
+    return out
+
+
+def hungarian(cost: np.ndarray) -> List[int]:
+    """
+    Atribuição de custo mínimo (linhas <= colunas): devolve a coluna de cada
+    linha. Versão O(n²·m) com potenciais.
+    """
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("hungarian: mais linhas que colunas")
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)     # linha casada com cada coluna (1-based)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            # relaxa todas as colunas livres de uma vez
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            livres = ~used[1:]
+            melhora = livres & (cur < minv[1:])
+            minv[1:][melhora] = cur[melhora]
+            way[1:][melhora] = j0
+            cand = np.where(livres, minv[1:], np.inf)
+            j1 = int(np.argmin(cand)) + 1
+            delta = cand[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][livres] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            cols[p[j] - 1] = j - 1
+    return cols
+
+
+"""
+Distribui `orders` entre as vans (`vans`: id -> nó atual).
+
+    • len(orders) <= len(vans) <= hungarian_max: Hungarian exato, no máximo
+      um pedido por van;
+    • caso contrário: inserção por arrependimento (regret-2) — a cada passo
+      insere, na melhor posição da melhor van, o pedido que mais perderia se
+      fosse para a segunda melhor van.
+
+As rotas são abertas (não voltam à origem). Custos vêm de uma busca
+um-para-muitos por van e por pedido.
+"""
+def assign(
+    vans: Dict[str, NodeId],
+    orders: Sequence[NodeId],
+    adj: AdjTable,
+    cost_fn: Callable[[NodeId, NodeId], int] = lambda _a, _b: 1,
+    hungarian_max: int = HUNGARIAN_MAX,
+) -> Assignment:
+
+    t0 = time.perf_counter()
+    van_ids = list(vans)
+    orders = list(orders)
+    if not van_ids or not orders:
+        return Assignment({v: [] for v in van_ids}, orders, 0.0, "none", time.perf_counter() - t0)
+
+    # linhas: vans e depois pedidos; colunas: pedidos
+    origens = [vans[v] for v in van_ids] + orders
+    dist = cost_matrix(origens, orders, adj, cost_fn)
+
+    if len(orders) <= len(van_ids) <= hungarian_max:
+        seqs, sem_rota, total = _assign_hungarian(dist, len(van_ids))
+        method = "hungarian"
+    else:
+        seqs, sem_rota, total = _assign_regret(dist, len(van_ids))
+        method = "regret"
+
+    routes = {v: [orders[j] for j in seqs[k]] for k, v in enumerate(van_ids)}
+    return Assignment(routes, [orders[j] for j in sem_rota], total, method, time.perf_counter() - t0)
+
+
+# Algoritmos internos
+def _assign_hungarian(dist: np.ndarray, n_vans: int) -> Tuple[List[List[int]], List[int], float]:
+    van_to_order = dist[:n_vans].T                 # linhas = pedidos
+    cols = hungarian(van_to_order)
+    seqs: List[List[int]] = [[] for _ in range(n_vans)]
+    sem_rota: List[int] = []
+    total = 0.0
+    for j, v in enumerate(cols):
+        if van_to_order[j, v] >= SEM_ROTA:
+            sem_rota.append(j)
+            continue
+        seqs[v].append(j)
+        total += float(van_to_order[j, v])
+    return seqs, sem_rota, total
+
+
+def _best_insertion(
+    dist: np.ndarray,
+    dist_t: np.ndarray,
+    n_vans: int,
+    v: int,
+    seq: List[int],
+    cols: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Para cada pedido de `cols`: menor custo extra de inseri-lo na rota `seq`
+    da van `v` e a posição correspondente.
+    """
+    prev = [v] + [n_vans + j for j in seq]        # linhas de `dist`
+    delta = dist[np.ix_(prev, cols)]              # (k+1, c): prev -> pedido
+    if seq:
+        # inserir entre prev[p] e seq[p]: d(prev, x) + d(x, nxt) - d(prev, nxt)
+        d_x_next = dist_t[np.ix_(seq, cols)]      # (k, c): pedido -> nxt
+        d_prev_next = dist[prev[:-1], seq][:, None]
+        delta[:-1] += d_x_next - d_prev_next
+    pos = np.argmin(delta, axis=0)
+    return delta[pos, np.arange(len(cols))], pos
+
+
+def _assign_regret(dist: np.ndarray, n_vans: int) -> Tuple[List[List[int]], List[int], float]:
+    n = dist.shape[1]
+    dist_t = np.ascontiguousarray(dist[n_vans:].T)   # [nxt, x] = d(x, nxt)
+    seqs: List[List[int]] = [[] for _ in range(n_vans)]
+    extra = np.empty((n_vans, n))                 # custo extra por (van, pedido)
+    where = np.empty((n_vans, n), dtype=np.int64)
+    todos = np.arange(n)
+    for v in range(n_vans):
+        extra[v], where[v] = _best_insertion(dist, dist_t, n_vans, v, seqs[v], todos)
+
+    pendentes = np.arange(n)
+    sem_rota: List[int] = []
+    total = 0.0
+    while pendentes.size:
+        sub = extra[:, pendentes]
+        if n_vans > 1:
+            dois = np.partition(sub, 1, axis=0)
+            best, second = dois[0], dois[1]
+        else:
+            best = second = sub[0]
+        if best.min() >= SEM_ROTA:
+            sem_rota.extend(pendentes.tolist())
+            break
+
+        # maior arrependimento; empate -> menor custo
+        regret = np.where(best < SEM_ROTA, np.minimum(second, SEM_ROTA) - best, -np.inf)
+        cand = np.flatnonzero(regret == regret.max())
+        k = int(cand[np.argmin(best[cand])])
+        j = int(pendentes[k])
+        v = int(np.argmin(extra[:, j]))
+
+        seqs[v].insert(int(where[v, j]), j)
+        total += float(extra[v, j])
+        pendentes = np.delete(pendentes, k)
+        # só a rota que mudou precisa recalcular, e só para os pendentes
+        extra[v, pendentes], where[v, pendentes] = _best_insertion(
+            dist, dist_t, n_vans, v, seqs[v], pendentes
+        )
+    return seqs, sem_rota, total
@@ -0,0 +1,247 @@
+from __future__ import annotations
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import resource   # só em Unix: limite de memória e pico de RSS
+except ImportError:   # pragma: no cover
+    resource = None   # type: ignore[assignment]
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Python < 3.11 não tem max_tasks_per_child: o worker é reaproveitado entre
+# mapas e o pico de RSS precisa ser zerado a cada job (só Linux consegue)
+PROCESSO_POR_JOB = sys.version_info >= (3, 11)
+_pico_do_job = PROCESSO_POR_JOB
+
+# parâmetros de executar_pipeline aceitos no manifesto
+JOB_KEYS = (
+    "grid", "start_id", "goal_id", "n_ticks", "altura_faixa", "plan_budget", "plan_budget_us",
+)
+
+Job = Dict[str, object]
+
+
+"""
+Processa vários mapas de uma vez, cada um no seu processo.
+
+    • `entrada` é uma pasta de imagens ou um manifesto JSON:
+          {"defaults": {"grid": 16},
+           "maps": [{"image": "a.png", "name": "centro", "n_ticks": 50}, ...]}
+      (uma lista simples de mapas também vale; caminhos relativos ao manifesto).
+    • Cada mapa roda `main.executar_pipeline` num processo do pool, com as
+      saídas em `out_root/<nome>/` e o log em `out_root/<nome>/log.txt`.
+    • `workers` limita quantos mapas rodam juntos; `mem_limit_mb` limita o
+      espaço de endereços de cada processo (mapas gigantes falham sozinhos,
+      sem derrubar o lote).
+    • Ao final imprime a tabela de resumo e grava `summary.csv` / `summary.json`.
+
+Sem origem/destino no manifesto, cada mapa usa um par distante escolhido
+automaticamente (os IDs padrão do main.py só valem para a imagem de exemplo).
+"""
+def executar_lote(
+    entrada: str | Path,
+    out_root: str | Path = "source/batch",
+    workers: int | None = None,
+    mem_limit_mb: int | None = None,
+    defaults: Job | None = None,
+) -> List[Dict]:
+
+    jobs = carregar_jobs(entrada, defaults)
+    if not jobs:
+        raise ValueError(f"Nenhum mapa encontrado em {entrada}")
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    print(f"Lote: {len(jobs)} mapa(s), {workers} processo(s) → {out_root}")
+
+    # spawn: processos limpos (sem herdar estado de cv2/threads do pai);
+    # um mapa por processo devolve a memória ao sistema entre mapas
+    opts: Dict = {"mp_context": mp.get_context("spawn")}
+    if PROCESSO_POR_JOB:
+        opts["max_tasks_per_child"] = 1
+
+    t0 = time.perf_counter()
+    rows: List[Dict] = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(mem_limit_mb,), **opts
+    ) as pool:
+        futures = {pool.submit(_executar_job, job, str(out_root)): job for job in jobs}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                row = fut.result()
+            except Exception as exc:   # processo morto (ex.: OOM killer)
+                row = _linha(job, "erro", 0.0, erro=f"{type(exc).__name__}: {exc}")
+                row["peak_rss_mb"] = None
+            rows.append(row)
+            print(f"  [{len(rows)}/{len(jobs)}] {row['name']}: {row['status']} ({row['seconds']:.1f}s)")
+    wall = time.perf_counter() - t0
+
+    rows.sort(key=lambda r: r["name"])
+    _registrar(rows)
+    _gravar_resumo(rows, out_root, wall, workers)
+    return rows
+
+
+# Interface pública
+def carregar_jobs(entrada: str | Path, defaults: Job | None = None) -> List[Job]:
+    entrada = Path(entrada)
+    base: Job = dict(defaults or {})
+    if entrada.is_dir():
+        maps: List[Job] = [
+            {"image": str(p)} for p in sorted(entrada.iterdir()) if p.suffix.lower() in IMAGE_EXTS
+        ]
+        root = entrada
+    else:
+        data = json.loads(entrada.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            base.update(data.get("defaults", {}))
+            data = data.get("maps", [])
+        maps = [{"image": m} if isinstance(m, str) else dict(m) for m in data]
+        root = entrada.parent
+
+    jobs: List[Job] = []
+    nomes: Dict[str, int] = {}
+    for m in maps:
+        image = Path(str(m["image"]))
+        if not image.is_absolute() and not image.exists():
+            image = root / image
+        nome = str(m.get("name") or image.stem)
+        # nomes repetidos ganham sufixo para não sobrescrever as saídas
+        n = nomes.get(nome, 0)
+        nomes[nome] = n + 1
+        if n:
+            nome = f"{nome}_{n}"
+        job = {**base, **m, "image": str(image), "name": nome}
+        job.setdefault("start_id", None)
+        job.setdefault("goal_id", None)
+        jobs.append(job)
+    return jobs
+
+
+# Algoritmos internos
+def _init_worker(mem_limit_mb: int | None) -> None:
+    # cada processo usa uma thread; o paralelismo vem do pool
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ["OPENBLAS_NUM_THREADS"] = "1"
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    if mem_limit_mb and resource is not None:
+        limite = mem_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+
+def _executar_job(job: Job, out_root: str) -> Dict:
+    global _pico_do_job
+    if not PROCESSO_POR_JOB:
+        _pico_do_job = _zerar_pico_rss()
+    import cv2
+    cv2.setNumThreads(1)
+    import main
+
+    out_dir = Path(out_root) / str(job["name"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    kwargs = {k: job[k] for k in JOB_KEYS if k in job}
+    t0 = time.perf_counter()
+    with open(out_dir / "log.txt", "w", encoding="utf-8") as log, redirect_stdout(log):
+        try:
+            resumo = main.executar_pipeline(
+                image_src=str(job["image"]), out_dir=out_dir, registrar=False, **kwargs
+            )
+        except MemoryError:
+            return _linha(job, "sem memória", time.perf_counter() - t0)
+        except Exception as exc:
+            traceback.print_exc(file=log)
+            return _linha(job, "erro", time.perf_counter() - t0, erro=f"{type(exc).__name__}: {exc}")
+    return _linha(job, "ok", time.perf_counter() - t0, resumo=resumo)
+
+
+def _linha(job: Job, status: str, seconds: float, resumo: Dict | None = None, erro: str = "") -> Dict:
+    resumo = resumo or {}
+    arrived = resumo.get("arrived", {})
+    return {
+        "name": job["name"],
+        "image": job["image"],
+        "status": status,
+        "seconds": round(seconds, 3),
+        "grid": resumo.get("grid"),
+        "nodes": resumo.get("nodes"),
+        "edges": resumo.get("edges"),
+        "start": resumo.get("start"),
+        "goal": resumo.get("goal"),
+        "route_len": resumo.get("route_len", {}).get("manhattan"),
+        "arrived": sum(arrived.values()) if arrived else None,
+        "peak_rss_mb": _pico_rss_mb(),
+        "out_dir": resumo.get("out_dir"),
+        "error": erro,
+    }
+
+
+def _zerar_pico_rss() -> bool:
+    """Zera o pico de RSS do processo (Linux: "5" em clear_refs zera VmHWM/ru_maxrss)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _pico_rss_mb() -> float | None:
+    """Pico de RSS do job atual; None se não dá para separá-lo dos jobs anteriores do worker."""
+    if resource is None or not _pico_do_job:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux devolve KiB, macOS bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _registrar(rows: List[Dict]) -> None:
+    """Grava as métricas no histórico a partir do pai (SQLite não gosta de escritores concorrentes)."""
+    import metrics_store
+    for row in rows:
+        if row["status"] != "ok":
+            continue
+        metrics_file = Path(row["out_dir"]) / "json/metrics.json"
+        metrics = json.loads(metrics_file.read_text(encoding="utf-8"))
+        metrics_store.record_run(
+            metrics,
+            grid_size=int(row["grid"]),
+            ticks=int(metrics["simulation"]["ticks"]),
+            source=f"batch:{row['name']}",
+        )
+
+
+def _gravar_resumo(rows: List[Dict], out_root: Path, wall: float, workers: int) -> None:
+    cols = ("name", "status", "seconds", "nodes", "edges", "route_len", "arrived", "peak_rss_mb")
+    print()
+    print(f"{'mapa':<20} | {'status':<11} | {'s':>7} | {'nós':>6} | {'arestas':>7} | {'rota':>5} | {'chegaram':>8} | {'RSS MB':>7}")
+    print("-" * 94)
+    for r in rows:
+        vals = ["–" if r[c] is None else r[c] for c in cols]
+        print(f"{vals[0]:<20} | {vals[1]:<11} | {vals[2]:>7} | {vals[3]:>6} | {vals[4]:>7} | {vals[5]:>5} | {vals[6]:>8} | {vals[7]:>7}")
+
+    ok = sum(r["status"] == "ok" for r in rows)
+    cpu = sum(r["seconds"] for r in rows)
+    print(f"\n{ok}/{len(rows)} ok em {wall:.1f}s com {workers} processo(s) — "
+          f"{len(rows) / wall * 60:.1f} mapas/min, speedup {cpu / wall:.2f}x sobre serial")
+    for r in rows:
+        if r["error"]:
+            print(f"  ✗ {r['name']}: {r['error']}")
+
+    with open(out_root / "summary.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    summary = {"maps": rows, "wall_s": round(wall, 3), "workers": workers, "ok": ok}
+    (out_root / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(f"→ {out_root / 'summary.csv'}, {out_root / 'summary.json'}")
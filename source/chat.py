@@ -1,36 +1,40 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
 import re
-from dotenv import load_dotenv
-from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
-import google.generativeai as genai
-import google.api_core.exceptions as gexc
-from groq import Groq
-
-load_dotenv()
-
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_KEY2 = os.getenv("GROQ_API_KEY2")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+from providers import (
+    ChatProviderBase,
+    GeminiProvider,
+    GroqProvider,
+    GroqProvider2,
+    _env,
+    close_async_clients,
+)
+from llm_cache import CachedProvider, PromptCache
+from provider_pool import ProviderPool, groq_pool
+from pathfinder import a_star
+from dynamic_graph import PERMANENT_BLOCKS, DynamicGraph
 
 # Configuração do tabuleiro #
 GRID_ROWS = 16
 GRID_COLS = 16
 STUCK_LIMIT = 10
 PING_LIMIT = 4
+TICK_DEADLINE: float | None = 30.0  # s por tick; depois disso segue a rota ideal
 
-# Tiles permanentes bloqueados (rios, prédios…)
-PERMANENT_BLOCKS: Set[Tuple[int, int]] = {
-    (13, 2), (8, 3), (7, 3)  # exemplo
-}
 
 # Carregamento das rotas #
 _METRICS_PATH = Path("source/json/ticks_routes.json")
+START_ID = "14_3"
+GOAL_ID  = "2_14"
+# com servidor de rotas (route_server), as rotas vêm dele e não do arquivo
+ROUTE_SERVER_ENV = "ROUTE_SERVER_URL"
+_SERVER_ALGOS = {"manhattan": "astar", "euclidean": "euclidean", "dijkstra": "dijkstra"}
 
 
 """
@@ -43,6 +47,57 @@ def _parse_move(ans: str) -> Tuple[int, int] | None:
         return int(nums[0]), int(nums[1])
     return None
 
+# hífens "tipográficos" (U+2010–U+2015, U+2212) que o LLM pode trocar por "-"
+_HYPHENS = str.maketrans({c: "-" for c in "\u2010\u2011\u2012\u2013\u2014\u2015\u2212"})
+
+
+def _norm_key(key: str) -> str:
+    return key.strip().translate(_HYPHENS)
+
+
+def _batch_key(i: int) -> str:
+    """Chave ASCII do i-ésimo agente no prompt em lote (ids podem ter Unicode)."""
+    return f"a{i + 1}"
+
+
+"""
+Lê a resposta em lote: primeiro tenta um objeto JSON {"chave": [row, col]},
+depois linhas que COMEÇAM com a chave exata seguida de ":" ou "=" (assim
+"a1" não pega a linha de "a10"). Hífens tipográficos valem como "-".
+Agente ausente ou com resposta malformada recebe "" (cai na rota ideal em
+`_apply_answer`).
+"""
+def _parse_batch(ans: str, keys: List[str]) -> Dict[str, str]:
+    out = {k: "" for k in keys}
+    norm = {_norm_key(k): k for k in keys}
+
+    ini, fim = ans.find("{"), ans.rfind("}")
+    if ini != -1 and fim > ini:
+        try:
+            data = json.loads(ans[ini:fim + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            for chave, valor in data.items():
+                k = norm.get(_norm_key(str(chave)))
+                if k is not None:
+                    out[k] = json.dumps(valor)
+
+    for line in ans.splitlines():
+        m = re.match(r"""\s*["']?([^"':=]+?)["']?\s*[:=](.*)""", line)
+        if m is None:
+            continue
+        k = norm.get(_norm_key(m.group(1)))
+        if k is not None and out[k] == "":
+            out[k] = m.group(2)
+    return out
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira (≈ 4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+
 def _load_routes() -> Dict[str, List[str]]:
     """Lê rotas do arquivo de métricas; falha se não existir ou formato errado."""
     if not _METRICS_PATH.exists():
@@ -56,7 +111,104 @@ def _load_routes() -> Dict[str, List[str]]:
     return routes  # type: ignore[return-value]
 
 
-ROUTES: Dict[str, List[str]] = _load_routes()
+def _fetch_routes(url: str) -> Dict[str, List[str]]:
+    """Pede ao servidor de rotas as mesmas três rotas do arquivo de métricas."""
+    from route_client import RouteClient
+
+    routes: Dict[str, List[str]] = {}
+    with RouteClient(url) as client:
+        for name, algo in _SERVER_ALGOS.items():
+            path = client.route(START_ID, GOAL_ID, algo)
+            if not path:
+                raise ValueError(f"Servidor {url} sem rota {START_ID} → {GOAL_ID}")
+            routes[name] = path
+    print(f"✔  Rotas obtidas do servidor {url}")
+    return routes
+
+
+_ROUTES: Dict[str, List[str]] | None = None
+
+def get_routes(server: str | None = None) -> Dict[str, List[str]]:
+    """
+    Rotas carregadas no primeiro uso (importar o módulo não lê o JSON).
+    Com `server` (ou a variável ROUTE_SERVER_URL) vêm do servidor de rotas.
+    """
+    global _ROUTES
+    if _ROUTES is None:
+        server = server or os.environ.get(ROUTE_SERVER_ENV)
+        _ROUTES = _fetch_routes(server) if server else _load_routes()
+    return _ROUTES
+
+
+def __getattr__(name: str):
+    # mantém `chat.ROUTES` funcionando sem carregar o arquivo no import
+    if name == "ROUTES":
+        return get_routes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+"""
+Quando o agente pode decidir sozinho (sem LLM).
+    • ping_threshold: com tantos "A B A" seguidos (loop ABAB) o LLM é chamado.
+    • block_cooldown: ticks após bater num bloqueio em que o LLM é chamado.
+    • ambiguity_margin: vizinhos até `best + margem` passos do objetivo contam
+      como empate.
+    • resolve_ties: empate que a rota ideal não desfaz fica com o próximo passo
+      do A*; com False esse empate vai para o LLM.
+"""
+class GateConfig:
+    def __init__(
+        self,
+        ping_threshold: int = 2,
+        block_cooldown: int = 2,
+        ambiguity_margin: int = 0,
+        resolve_ties: bool = True,
+    ) -> None:
+        self.ping_threshold = ping_threshold
+        self.block_cooldown = block_cooldown
+        self.ambiguity_margin = ambiguity_margin
+        self.resolve_ties = resolve_ties
+
+
+_GRID_GRAPH: DynamicGraph | None = None
+_PLANS: Dict[Tuple[str, str], List[str] | None] = {}
+
+def _grid_graph() -> DynamicGraph:
+    """
+    Grafo local do tabuleiro (4-vizinhança), começando com os
+    PERMANENT_BLOCKS fechados. Fechar/reabrir células nele descarta as rotas
+    memorizadas.
+    """
+    global _GRID_GRAPH
+    if _GRID_GRAPH is None:
+        pos = {f"{r}_{c}": (r, c) for r in range(GRID_ROWS) for c in range(GRID_COLS)}
+        adj = {
+            nid: {f"{nr}_{nc}" for nr, nc in neighbors(r, c)}
+            for nid, (r, c) in pos.items()
+        }
+        _GRID_GRAPH = DynamicGraph(pos, adj, closed=PERMANENT_BLOCKS)
+        _GRID_GRAPH.subscribe(lambda _version, _nodes: _PLANS.clear())
+    return _GRID_GRAPH
+
+
+def blocked_cells() -> Set[Tuple[int, int]]:
+    """Células fechadas agora (bloqueios permanentes + interdições)."""
+    return _grid_graph().closed_cells
+
+
+def _local_plan(cell: Tuple[int, int], goal: Tuple[int, int]) -> List[str] | None:
+    """Rota A* de `cell` até `goal` (memorizada até a topologia mudar)."""
+    key = (f"{cell[0]}_{cell[1]}", f"{goal[0]}_{goal[1]}")
+    if key not in _PLANS:
+        graph = _grid_graph()
+        ok = graph.is_open(key[0]) and graph.is_open(key[1])
+        _PLANS[key] = a_star(key[0], key[1], graph.pos, graph.adj) if ok else None
+    return _PLANS[key]
+
+
+def _goal_distance(cell: Tuple[int, int], goal: Tuple[int, int]) -> int | None:
+    path = _local_plan(cell, goal)
+    return len(path) - 1 if path else None
+
 
 # Utilidades gerais #
 def node_to_coord(node_id: str) -> Tuple[int, int]:
@@ -71,68 +223,6 @@ def neighbors(r: int, c: int) -> List[Tuple[int, int]]:
     return [p for p in cand if 0 <= p[0] < GRID_ROWS and 0 <= p[1] < GRID_COLS]
 
 
-# Interface de provedores de chat 
-class ChatProviderBase(ABC):
-    @abstractmethod
-    def ask(self, prompt: str) -> str:
-        ...
-
-
-# Google Gemini Provider #
-class GeminiProvider(ChatProviderBase):
-    def __init__(self, model: str = "gemini-2.0-flash") -> None:
-
-        if not GEMINI_API_KEY:
-            raise EnvironmentError("Defina GEMINI_API_KEY nas variáveis de ambiente.")
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(model)
-
-    def ask(self, prompt: str) -> str:
-        while True:
-            try:
-                resp = self.model.generate_content(prompt, safety_settings={})
-                return resp.text.strip()
-            except gexc.ResourceExhausted as e:
-                # lê o retry_delay sugerido pela API
-                delay = getattr(e, "retry_delay", 10)
-                print(f"[Gemini] quota — aguardando {delay} s…")
-                time.sleep(delay)
-
-
-# Groq LLM Provider
-class GroqProvider(ChatProviderBase):
-    def __init__(self, model: str = "deepseek-r1-distill-llama-70b") -> None:
-
-        if not GROQ_API_KEY:
-            raise EnvironmentError("Defina GROQ_API_KEY nas variáveis de ambiente.")
-        self.client = Groq(api_key=GROQ_API_KEY)
-        self.model = model
-
-    def ask(self, prompt: str) -> str:
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        return resp.choices[0].message.content.strip()
-
-# Groq LLM Provider #
-class GroqProvider2(ChatProviderBase):
-    def __init__(self, model: str = "llama-3.3-70b-versatile") -> None:
-
-        if not GROQ_API_KEY2:
-            raise EnvironmentError("Defina GROQ_API_KEY2 nas variáveis de ambiente.")
-        self.client = Groq(api_key=GROQ_API_KEY2)
-        self.model = model
-
-    def ask(self, prompt: str) -> str:
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-        )
-        return resp.choices[0].message.content.strip()
-
 # Agente móvel
 class ChatControlledAgent:
     def __init__(
@@ -140,9 +230,12 @@ class ChatControlledAgent:
         agent_id: str,
         route: List[str],
         provider: ChatProviderBase,
+        gate: GateConfig | None = None,  # None = GateConfig() padrão (um por agente)
+        use_gate: bool = True,           # False = consulta o LLM todo tick
     ) -> None:
 
         self.id = agent_id
+        self.gate = (gate if gate is not None else GateConfig()) if use_gate else None
         self.route_ids = route[:]
         self.provider = provider
         self.cur_idx = 0
@@ -153,22 +246,127 @@ class ChatControlledAgent:
         self._hist: list[Tuple[int, int]] = []
         self._ping = 0
         self._last_block: Tuple[int, int] | None = None 
+        self._last_block_tick = -1
+
+        # métricas de uso do LLM
+        self.llm_calls = 0
+        self.llm_tokens = 0
+        self.gated_moves = 0   # decisões tomadas pelo planner (chamadas poupadas)
 
     # Passo único #
     def step(self, current_tick: int) -> None:
-        if self.finished:
+        if self.finished or self.decide_locally(current_tick):
             return
-        
-        prev_pos = self.pos # posição antes de tentar mover
 
+        prompt = self._build_prompt()
+        try:
+            answer = self.provider.ask(prompt)
+        except Exception as exc:
+            print(f"[{self.id}] erro no provedor: {exc}. Avançando pela rota ideal.")
+            answer = "" # Fallback para rota ideal
+
+        self._count_call(prompt, answer)
+        self._apply_answer(answer, current_tick)
+
+    async def step_async(self, current_tick: int, deadline: float | None = None) -> None:
+        """Igual a `step`, mas sem bloquear; estourando `deadline` segue a rota ideal."""
+        if self.finished or self.decide_locally(current_tick):
+            return
+
+        prompt = self._build_prompt()
+        try:
+            answer = await asyncio.wait_for(self.provider.ask_async(prompt), deadline)
+        except asyncio.TimeoutError:
+            print(f"[{self.id}] sem resposta em {deadline} s. Avançando pela rota ideal.")
+            answer = ""
+        except Exception as exc:
+            print(f"[{self.id}] erro no provedor: {exc}. Avançando pela rota ideal.")
+            answer = "" # Fallback para rota ideal
+
+        self._count_call(prompt, answer)
+        self._apply_answer(answer, current_tick)
+
+    def decide_locally(self, current_tick: int) -> bool:
+        """
+        Resolve o tick sem LLM quando o estado é determinístico (ver
+        GateConfig). Devolve True se o agente já se moveu.
+        """
+        if self.gate is None:
+            return False
+        if self._ping >= self.gate.ping_threshold:
+            return False
+        if 0 <= self._last_block_tick and current_tick - self._last_block_tick <= self.gate.block_cooldown:
+            return False
+
+        # voltou para a rota ideal mais adiante? retoma dali
+        here = f"{self.pos[0]}_{self.pos[1]}"
+        if here in self.route_ids[self.cur_idx + 1:]:
+            self.cur_idx = self.route_ids.index(here, self.cur_idx + 1)
+
+        goal = node_to_coord(self.route_ids[-1])
+        blocked = blocked_cells()
+        ideal = (
+            node_to_coord(self.route_ids[self.cur_idx + 1])
+            if self.cur_idx + 1 < len(self.route_ids) else None
+        )
+        if ideal in blocked:
+            return False  # rota ideal bloqueada: situação para o LLM
+
+        dists = {}
+        for p in neighbors(*self.pos):
+            if p in blocked:
+                continue
+            d = _goal_distance(p, goal)
+            if d is not None:
+                dists[p] = d
+        if not dists:
+            return False
+        best = min(dists.values())
+        tied = [p for p, d in dists.items() if d <= best + self.gate.ambiguity_margin]
+
+        if ideal in tied:
+            move = ideal
+        elif len(tied) == 1:
+            move = tied[0]
+        elif self.gate.resolve_ties:
+            plan = _local_plan(self.pos, goal)
+            hop = node_to_coord(plan[1]) if plan and len(plan) > 1 else None
+            move = hop if hop in tied else min(tied)
+        else:
+            return False  # empate: ambíguo
+
+        self.gated_moves += 1
+        if move == ideal:
+            self.cur_idx += 1
+        self._apply_answer(f"({move[0]},{move[1]})", current_tick)
+        return True
+
+    def _count_call(self, prompt: str, answer: str) -> None:
+        self.llm_calls += 1
+        self.llm_tokens += estimate_tokens(prompt) + estimate_tokens(answer)
+
+    def _batch_line(self, key: str) -> str:
+        """Estado do agente numa linha do prompt em lote (`key`: chave ASCII da resposta)."""
+        goal = node_to_coord(self.route_ids[-1])
+        blocked = blocked_cells()
+        nbrs_valid = [p for p in neighbors(*self.pos) if p not in blocked]
+        line = (
+            f"agente {key} | posição {self.pos} | objetivo {goal} "
+            f"| vizinhos livres {nbrs_valid}"
+        )
+        if self._last_block:
+            line += f" | bloqueado {self._last_block}"
+        return line
+
+    def _build_prompt(self) -> str:
         goal = node_to_coord(self.route_ids[-1])
-        nbrs = neighbors(*self.pos)
-        nbrs_valid = [p for p in nbrs if p not in PERMANENT_BLOCKS]
+        blocked = blocked_cells()
+        nbrs_valid = [p for p in neighbors(*self.pos) if p not in blocked]
 
-        prompt = (
+        return (
             f"Você está controlando o agente {self.id} em um grid {GRID_ROWS}×{GRID_COLS}.\n"
             f"Posição atual: {self.pos}.  Objetivo final: {goal}.\n"
-            f"Células permanentes bloqueadas: {sorted(PERMANENT_BLOCKS)}.\n"
+            f"Células permanentes bloqueadas: {sorted(blocked)}.\n"
             + (
                 f"Atenção: a célula {self._last_block} está bloqueada. "
                 f"Escolha uma das células LIVRES adjacentes listadas abaixo.\n"
@@ -178,11 +376,12 @@ class ChatControlledAgent:
             + "Responda somente com a próxima célula (row,col) onde mover o agente."
         )
 
-        try:
-            answer = self.provider.ask(prompt)
-        except Exception as exc:
-            print(f"[{self.id}] erro no provedor: {exc}. Avançando pela rota ideal.")
-            answer = "" # Fallback para rota ideal
+    def _apply_answer(self, answer: str, current_tick: int) -> None:
+        prev_pos = self.pos # posição antes de tentar mover
+
+        goal = node_to_coord(self.route_ids[-1])
+        blocked = blocked_cells()
+        nbrs_valid = [p for p in neighbors(*self.pos) if p not in blocked]
 
         move: Tuple[int, int] | None = None
 
@@ -194,10 +393,11 @@ class ChatControlledAgent:
             move = None  # parser nunca deve lançar, mas garantimos
 
         # 1)  tentativa com resposta do LLM 
-        if move in PERMANENT_BLOCKS:
+        if move in blocked:
             print(f"[{self.id}] {move} é bloqueado — voltando para {prev_pos}")
             self.pos = prev_pos
             self._last_block = move
+            self._last_block_tick = current_tick
         elif move in nbrs_valid:
             self.pos = move
         else:
@@ -206,10 +406,11 @@ class ChatControlledAgent:
             # pula todos os passos bloqueados consecutivamente
             while next_idx < len(self.route_ids):
                 cand = node_to_coord(self.route_ids[next_idx])
-                if cand in PERMANENT_BLOCKS:
+                if cand in blocked:
                     # registra e **pula** o tile bloqueado
                     print(f"[{self.id}] rota ideal bateu em {cand} — pulando")
                     self._last_block = cand
+                    self._last_block_tick = current_tick
                     next_idx += 1
                     continue
                 break  # encontrou um passo livre
@@ -254,27 +455,139 @@ class ChatControlledAgent:
         return f"{self.id}: {self.pos}{' ✔' if self.finished else ''}"
 
 # Simulação #
-def run_simulation(max_ticks: int = 100) -> None:
-    agents = [
-        ChatControlledAgent("van‑manhattan", ROUTES["manhattan"], GroqProvider()),
-        ChatControlledAgent("van‑euclidean", ROUTES["euclidean"], GeminiProvider()),
-        ChatControlledAgent("van‑dijkstra", ROUTES["dijkstra"], GroqProvider2()),
+def _default_agents(cache: PromptCache | None = None) -> List[ChatControlledAgent]:
+    def wrap(provider: ChatProviderBase) -> ChatProviderBase:
+        return CachedProvider(provider, cache) if cache is not None else provider
+
+    # com chave(s) Groq no ambiente, as duas vans Groq dividem um pool (cota por
+    # chave, rodízio e hedge) em vez de cada uma presa a uma chave
+    if _env("GROQ_API_KEY") or _env("GROQ_API_KEY2"):
+        groq_a = groq_b = groq_pool()
+    else:
+        groq_a, groq_b = GroqProvider(), GroqProvider2()
+
+    routes = get_routes()
+    return [
+        ChatControlledAgent("van‑manhattan", routes["manhattan"], wrap(groq_a)),
+        ChatControlledAgent("van‑euclidean", routes["euclidean"], wrap(GeminiProvider())),
+        ChatControlledAgent("van‑dijkstra", routes["dijkstra"], wrap(groq_b)),
     ]
 
-    print("Tick |     Manhattan     |     Euclidiana     |      Dijkstra")
-    print("-----+-------------------+--------------------+--------------")
+
+def run_simulation(
+    max_ticks: int = 100,
+    agents: List[ChatControlledAgent] | None = None,
+    concurrent: bool = True,
+    tick_deadline: float | None = TICK_DEADLINE,
+    use_cache: bool = True,
+    batch_provider: ChatProviderBase | None = None,
+) -> None:
+    """
+    `concurrent=True` dispara os agentes de cada tick em paralelo (asyncio),
+    então a latência do tick é a do agente mais lento, não a soma.
+    `use_cache` só vale para os agentes padrão (respostas em `llm_cache`).
+    Com `batch_provider`, cada tick faz UMA chamada descrevendo todos os
+    agentes pendentes (os provedores individuais são ignorados).
+    """
+    cache = None
+    if agents is None:
+        cache = PromptCache() if use_cache else None
+        agents = _default_agents(cache)
+    try:
+        asyncio.run(_simulate(agents, max_ticks, concurrent, tick_deadline, batch_provider))
+    finally:
+        if cache is not None:
+            cache.close()
+    _print_provider_stats(agents, batch_provider)
+
+
+def _print_provider_stats(
+    agents: List[ChatControlledAgent],
+    batch_provider: ChatProviderBase | None = None,
+) -> None:
+    pools: List[ProviderPool] = []
+    for ag in agents:
+        provider = ag.provider
+        if isinstance(provider, CachedProvider):
+            st = provider.stats()
+            print(
+                f"{ag.id:<15}: cache {st['hit_rate']:.0%} "
+                f"(mem {st['hits_mem']}, disco {st['hits_disk']}, miss {st['misses']})"
+            )
+            provider = provider.inner
+        if isinstance(provider, ProviderPool) and provider not in pools:
+            pools.append(provider)
+    if isinstance(batch_provider, CachedProvider):
+        batch_provider = batch_provider.inner
+    if isinstance(batch_provider, ProviderPool) and batch_provider not in pools:
+        pools.append(batch_provider)
+
+    # uso de cota e latência por chave
+    for pool in pools:
+        print(f"Pool ({pool.hedges} hedges):")
+        for name, st in pool.stats().items():
+            p50 = f"{st['p50_s']:.2f}s" if st["p50_s"] is not None else "–"
+            p90 = f"{st['p90_s']:.2f}s" if st["p90_s"] is not None else "–"
+            print(
+                f"  {name:<35} req {st['requests']:>4}  usadas {st['wins']:>4}  "
+                f"erros {st['errors']:>3}  p50 {p50}  p90 {p90}"
+            )
+
+
+async def _simulate(
+    agents: List[ChatControlledAgent],
+    max_ticks: int,
+    concurrent: bool,
+    tick_deadline: float | None,
+    batch_provider: ChatProviderBase | None = None,
+) -> None:
+    try:
+        await _run_ticks(agents, max_ticks, concurrent, tick_deadline, batch_provider)
+    finally:
+        # os clientes assíncronos morrem com este loop (asyncio.run)
+        await close_async_clients()
+
+
+async def _run_ticks(
+    agents: List[ChatControlledAgent],
+    max_ticks: int,
+    concurrent: bool,
+    tick_deadline: float | None,
+    batch_provider: ChatProviderBase | None,
+) -> None:
+    print("Tick | " + " | ".join(f"{ag.id:^17}" for ag in agents))
+    print("-----+" + "+".join("-" * 19 for _ in agents))
 
     last_positions = [ag.pos for ag in agents]
     stuck_counter  = 0
+    tick_times: List[float] = []
+    batch_calls = batch_tokens = 0
+    batch_decisions = 0   # agentes decididos por respostas em lote
 
     for tick in range(max_ticks):
-        row_out = []
-        for ag in agents:
-            if not ag.finished:
+        t0 = time.perf_counter()
+        pending = [ag for ag in agents if not ag.finished]
+        if batch_provider is not None:
+            # só vai para o lote quem o planner não resolveu sozinho
+            pending = [ag for ag in pending if not ag.decide_locally(tick)]
+            if pending:
+                prompt, answer = await _ask_batch(batch_provider, pending, tick_deadline)
+                batch_calls += 1
+                batch_decisions += len(pending)
+                batch_tokens += estimate_tokens(prompt) + estimate_tokens(answer)
+                keys = [_batch_key(i) for i in range(len(pending))]
+                answers = _parse_batch(answer, keys)
+                for key, ag in zip(keys, pending):
+                    ag._apply_answer(answers[key], tick)
+        elif concurrent:
+            await asyncio.gather(*(ag.step_async(tick, tick_deadline) for ag in pending))
+        else:
+            for ag in pending:
                 ag.step(tick)
-            row_out.append(f"{ag.pos[0]}_{ag.pos[1]}")
+        tick_times.append(time.perf_counter() - t0)
 
-        print(f"{tick:4d} | {row_out[0]:^17} | {row_out[1]:^19} | {row_out[2]:^15}")
+        row_out = [f"{ag.pos[0]}_{ag.pos[1]}" for ag in agents]
+        print(f"{tick:4d} | " + " | ".join(f"{p:^17}" for p in row_out))
 
         #  verificação de progresso 
         cur_positions = [ag.pos for ag in agents]
@@ -304,6 +617,49 @@ def run_simulation(max_ticks: int = 100) -> None:
         else:
             print(f"{ag.id:<15}: Não chegou em {max_ticks} ticks")
 
+    if tick_times:
+        print(
+            f"Latência por tick: média {sum(tick_times) / len(tick_times):.3f}s, "
+            f"máx {max(tick_times):.3f}s"
+        )
+        calls  = batch_calls + sum(ag.llm_calls for ag in agents)
+        tokens = batch_tokens + sum(ag.llm_tokens for ag in agents)
+        print(
+            f"Chamadas ao LLM: {calls} ({calls / len(tick_times):.2f}/tick), "
+            f"tokens ≈ {tokens} ({tokens / len(tick_times):.0f}/tick)"
+        )
+        gated = sum(ag.gated_moves for ag in agents)
+        decisions = gated + batch_decisions + sum(ag.llm_calls for ag in agents)
+        if decisions:
+            print(
+                f"Decisões pelo planner: {gated}/{decisions} "
+                f"({gated / decisions:.0%} de chamadas poupadas)"
+            )
+
+
+async def _ask_batch(
+    provider: ChatProviderBase,
+    agents: List[ChatControlledAgent],
+    deadline: float | None,
+) -> Tuple[str, str]:
+    """Faz a chamada em lote; devolve (prompt, resposta crua)."""
+    prompt = (
+        f"Você controla {len(agents)} agentes em um grid {GRID_ROWS}×{GRID_COLS}.\n"
+        f"Células permanentes bloqueadas: {sorted(blocked_cells())}.\n"
+        + "\n".join(ag._batch_line(_batch_key(i)) for i, ag in enumerate(agents))
+        + "\nPara CADA agente escolha um dos vizinhos livres. Responda somente com um "
+        'JSON no formato {"a1": [row, col], ...}, usando a chave de cada agente.'
+    )
+    try:
+        answer = await asyncio.wait_for(provider.ask_async(prompt), deadline)
+    except asyncio.TimeoutError:
+        print(f"[lote] sem resposta em {deadline} s. Todos seguem a rota ideal.")
+        answer = ""
+    except Exception as exc:
+        print(f"[lote] erro no provedor: {exc}. Todos seguem a rota ideal.")
+        answer = ""
+    return prompt, answer
+
 
 def main() -> None:
     start = time.perf_counter()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import io
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from control import ControlAgent
+
+MAGIC = b"SIMCKPT1"     # cabeçalho + pickle comprimido com zlib
+
+Cenario = Callable[[ControlAgent], None]
+
+
+"""
+Checkpoint da simulação inteira a partir do ControlAgent: relógio, alertas
+(TTLs) e geradores aleatórios (o `random.Random`/`random` global do modelo
+antigo ou o gerador do TrafficEngine), agentes com posição, objetivos, rota,
+histórico, métricas e buscas em andamento, o grafo compartilhado (com os
+fechamentos), os campos de distância e o EventScheduler.
+
+    • `snapshot`/`restore`: bytes (pickle + zlib), para disco ou para outros
+      processos; `save`/`load` gravam e leem arquivos.
+    • `fork`: cópias em memória, sem compressão (aquecer uma vez e testar
+      vários cenários a partir do mesmo ponto).
+    • `ramificar`: roda cenários a partir de um checkpoint, em paralelo.
+
+Com o `random` global (ControlAgent sem `seed`), restaurar também restaura o
+estado dele; cópias que rodam juntas no mesmo processo então dividem o
+gerador. Para cópias independentes use `seed` ou o TrafficEngine.
+"""
+def snapshot(ctrl: ControlAgent, level: int = 6) -> bytes:
+    return MAGIC + zlib.compress(pickle.dumps(ctrl, protocol=pickle.HIGHEST_PROTOCOL), level)
+
+
+# Interface pública
+def restore(blob: bytes) -> ControlAgent:
+    if not blob.startswith(MAGIC):
+        raise ValueError("Checkpoint inválido (cabeçalho desconhecido)")
+    ctrl = pickle.loads(zlib.decompress(blob[len(MAGIC):]))
+    if not isinstance(ctrl, ControlAgent):
+        raise ValueError("Checkpoint não contém um ControlAgent")
+    return ctrl
+
+
+def save(ctrl: ControlAgent, path: str | Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(snapshot(ctrl))
+    return path
+
+
+def load(path: str | Path) -> ControlAgent:
+    return restore(Path(path).read_bytes())
+
+
+def fork(ctrl: ControlAgent, n: int = 1) -> List[ControlAgent]:
+    """`n` cópias independentes do estado atual (um pickle, `n` leituras)."""
+    raw = pickle.dumps(ctrl, protocol=pickle.HIGHEST_PROTOCOL)
+    return [pickle.loads(raw) for _ in range(n)]
+
+
+def avancar(ctrl: ControlAgent, n_ticks: int) -> None:
+    """Continua a simulação pelo escalonador (se houver) ou por `ctrl.step`."""
+    if ctrl.scheduler is not None:
+        ctrl.scheduler.run(n_ticks)
+        return
+    for _ in range(n_ticks):
+        ctrl.step()
+
+
+def resumo(ctrl: ControlAgent) -> Dict:
+    agentes = {}
+    for ag in ctrl._agents:
+        agentes[ag.id] = {
+            "pos": ag.pos_id,
+            "arrived": ag.finished,
+            "delivered": len(ag.delivered),
+            "steps": len(ag.history) - 1,
+            "replans": ag.replan_count,
+            "planning_ms": round(ag.total_planning_time * 1000, 2),
+        }
+    return {"tick": ctrl.tick, "traffic": len(ctrl.traffic_cells()), "agents": agentes}
+
+
+def ramificar(
+    blob: bytes,
+    cenarios: Dict[str, Cenario],
+    n_ticks: int,
+    workers: int | None = None,
+) -> Dict[str, Dict]:
+    """
+    Cada cenário restaura `blob`, aplica a sua mudança (função de módulo,
+    para caber no pickle) e roda `n_ticks`. Com `workers` > 1 cada cenário
+    vai para um processo; a saída dos agentes é descartada.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(cenarios)))
+    if workers == 1:
+        return {nome: _rodar_cenario(blob, fn, n_ticks) for nome, fn in cenarios.items()}
+
+    # spawn: mesmo motivo do batch (processos limpos)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=mp.get_context("spawn"), initializer=_init_worker
+    ) as pool:
+        futures = {nome: pool.submit(_rodar_cenario, blob, fn, n_ticks) for nome, fn in cenarios.items()}
+        return {nome: fut.result() for nome, fut in futures.items()}
+
+
+# Cenários de exemplo (what-if)
+def base(ctrl: ControlAgent) -> None:
+    """Nada muda: referência."""
+
+
+def obra(ctrl: ControlAgent) -> None:
+    """Fecha a célula no meio da rota restante do primeiro agente em trânsito."""
+    for ag in ctrl._agents:
+        resto = ag.path[1:-1]
+        if resto:
+            ag.graph.close_cells([resto[len(resto) // 2]])
+            return
+
+
+def pico(ctrl: ControlAgent) -> None:
+    """Três vezes mais alertas simultâneos."""
+    ctrl.max_alerts *= 3
+    if ctrl.engine is not None:
+        ctrl.engine.max_alerts = ctrl.max_alerts
+
+
+def pedagio(ctrl: ControlAgent) -> None:
+    """Tráfego custa o triplo."""
+    ctrl.penalty *= 3
+
+
+CENARIOS: Dict[str, Cenario] = {"base": base, "obra": obra, "pico": pico, "pedagio": pedagio}
+
+
+def main(
+    graph_json: str | Path | None = None,
+    aquecimento: int = 10,
+    n_ticks: int = 40,
+    workers: int | None = None,
+    seed: int | None = None,
+    out: str | Path | None = None,
+) -> Dict[str, Dict]:
+    """Aquece a simulação do main.py uma vez e compara os CENARIOS a partir dali."""
+    import main as pipeline
+
+    with redirect_stdout(io.StringIO()):
+        ctrl, _ = pipeline.simular(graph_json or pipeline.GRAPH_JSON, aquecimento, seed=seed)
+
+    t0 = time.perf_counter()
+    blob = snapshot(ctrl)
+    t1 = time.perf_counter()
+    print(f"Checkpoint no tick {ctrl.tick}: {len(blob) / 1024:.1f} KiB em {(t1 - t0) * 1000:.1f}ms")
+    if out is not None:
+        print(f"→ {save(ctrl, out)}")
+
+    resultados = ramificar(blob, CENARIOS, n_ticks, workers)
+    print(f"{len(resultados)} cenários × {n_ticks} ticks em {time.perf_counter() - t1:.2f}s")
+    print(f"{'cenário':<10} | {'agente':<10} | {'chegou':^6} | {'passos':>6} | {'replans':>7} | {'plan ms':>8}")
+    print("-----------+------------+--------+--------+---------+---------")
+    for nome, r in resultados.items():
+        for aid, a in r["agents"].items():
+            print(
+                f"{nome:<10} | {aid:<10} | {'sim' if a['arrived'] else 'não':^6} | "
+                f"{a['steps']:>6} | {a['replans']:>7} | {a['planning_ms']:>8.2f}"
+            )
+    return resultados
+
+
+# Algoritmos internos
+def _init_worker() -> None:
+    os.environ["OMP_NUM_THREADS"] = "1"
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def _rodar_cenario(blob: bytes, cenario: Cenario, n_ticks: int) -> Dict:
+    with redirect_stdout(io.StringIO()):
+        ctrl = restore(blob)
+        cenario(ctrl)
+        avancar(ctrl, n_ticks)
+    return resumo(ctrl)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import json
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+PATTERNS = ("grid", "irregular", "radial")
+
+Grid = Tuple[np.ndarray, np.ndarray, np.ndarray]   # (road, right, down), arrays bool (rows, cols)
+
+
+"""
+Gerador procedural de cidades em grade, para testar planejadores e a
+simulação em tamanhos reais sem depender de imagem.
+
+    • `pattern`:
+        - "grid": quarteirões regulares de `block` células e ruas de `street`;
+        - "irregular": espaçamento sorteado entre block/2 e 2·block e trechos
+          de rua removidos com probabilidade `drop` (ruas sem saída, desvios);
+        - "radial": anéis a cada `block` células e avenidas radiais a partir
+          do centro.
+    • `obstacles`: fração das células de rua fechadas ao acaso (obras, etc.).
+    • `connected`: mantém só a maior componente (4-vizinhança), para que
+      qualquer par origem/destino tenha rota.
+    • `seed`: mesma semente, mesma cidade.
+
+Tudo é vetorizado em NumPy; milhões de células levam segundos. As arestas
+ligam células de rua vizinhas (direita/baixo), como em `construir_grafo`.
+"""
+def gerar_cidade(
+    rows: int,
+    cols: int | None = None,
+    pattern: str = "grid",
+    block: int = 6,
+    street: int = 1,
+    obstacles: float = 0.0,
+    drop: float = 0.15,
+    seed: int | None = None,
+    connected: bool = True,
+) -> Grid:
+
+    cols = cols or rows
+    if pattern not in PATTERNS:
+        raise ValueError(f"Padrão '{pattern}' desconhecido (use {', '.join(PATTERNS)})")
+    if rows < 2 or cols < 2 or block < 1 or street < 1:
+        raise ValueError("rows/cols >= 2, block >= 1 e street >= 1")
+    rng = np.random.default_rng(seed)
+
+    if pattern == "grid":
+        road = _grade(rows, cols, block, street)
+    elif pattern == "irregular":
+        road = _irregular(rows, cols, block, street, drop, rng)
+    else:
+        road = _radial(rows, cols, block, street)
+
+    if obstacles > 0:
+        road &= rng.random((rows, cols)) >= obstacles
+    if connected:
+        road = maior_componente(road)
+    return (road, *arestas(road))
+
+
+# Interface pública
+def arestas(road: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Arestas entre células de rua vizinhas: (para a direita, para baixo)."""
+    right = np.zeros_like(road, dtype=bool)
+    down = np.zeros_like(road, dtype=bool)
+    right[:, :-1] = road[:, :-1] & road[:, 1:]
+    down[:-1, :] = road[:-1, :] & road[1:, :]
+    return right, down
+
+
+def maior_componente(road: np.ndarray) -> np.ndarray:
+    """Só a maior componente 4-conexa das ruas."""
+    import cv2
+
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(road.astype(np.uint8), connectivity=4)
+    if n <= 1:
+        return road.copy()
+    maior = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    return labels == maior
+
+
+def salvar(grid: Grid, path: str | Path) -> Path:
+    """Grava em .npz (rápido) ou no esquema de `image_graph.json`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    road, right, down = grid
+    if path.suffix == ".npz":
+        with open(path, "wb") as f:   # sem compressão: carregar é o gargalo
+            np.savez(f, road=road, right=right, down=down)
+    else:
+        _salvar_json(road, right, down, path)
+    return path
+
+
+def carregar_grade(path: str | Path) -> Grid:
+    """Lê .npz ou JSON (esquema de `image_graph.json`) como arrays (road, right, down)."""
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as z:
+            return z["road"].astype(bool), z["right"].astype(bool), z["down"].astype(bool)
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    rows = 1 + max(n["row"] for n in data["nodes"])
+    cols = 1 + max(n["col"] for n in data["nodes"])
+    road = np.zeros((rows, cols), dtype=bool)
+    pos = {}
+    for n in data["nodes"]:
+        pos[n["id"]] = (n["row"], n["col"])
+        road[n["row"], n["col"]] = bool(n["is_road"])
+    right = np.zeros_like(road)
+    down = np.zeros_like(road)
+    for a, b in data["edges"]:
+        (r1, c1), (r2, c2) = sorted((pos[a], pos[b]))
+        if (r2, c2) == (r1, c1 + 1):
+            right[r1, c1] = True
+        elif (r2, c2) == (r1 + 1, c1):
+            down[r1, c1] = True
+        else:
+            raise ValueError(f"Aresta {a}-{b} não liga vizinhos da grade")
+    return road, right, down
+
+
+def converter(src: str | Path, dst: str | Path) -> Path:
+    """JSON <-> .npz (o formato sai da extensão de `dst`)."""
+    return salvar(carregar_grade(src), dst)
+
+
+def resumo(grid: Grid) -> dict:
+    road, right, down = grid
+    return {
+        "rows": road.shape[0],
+        "cols": road.shape[1],
+        "cells": int(road.size),
+        "roads": int(road.sum()),
+        "edges": int(right.sum() + down.sum()),
+        "road_fraction": round(float(road.mean()), 4),
+    }
+
+
+def main(
+    rows: int,
+    cols: int | None = None,
+    out: str | Path = "source/json/city.npz",
+    **kwargs,
+) -> Path:
+    t0 = time.perf_counter()
+    grid = gerar_cidade(rows, cols, **kwargs)
+    t1 = time.perf_counter()
+    path = salvar(grid, out)
+    t2 = time.perf_counter()
+    info = resumo(grid)
+    print(
+        f"{info['rows']}×{info['cols']}: {info['roads']} ruas ({info['road_fraction']:.0%}), "
+        f"{info['edges']} arestas — gerado em {t1 - t0:.2f}s, gravado em {t2 - t1:.2f}s"
+    )
+    print(f"→ {path}")
+    return path
+
+
+# Algoritmos internos
+def _salvar_json(road: np.ndarray, right: np.ndarray, down: np.ndarray, path: Path) -> None:
+    """Escreve em blocos de linhas, sem montar o dicionário inteiro na memória."""
+    rows, cols = road.shape
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n  "nodes": [\n')
+        for r in range(rows):
+            linha = road[r].astype(np.uint8).tolist()
+            f.write(",\n".join(
+                f'    {{"id": "{r}_{c}", "row": {r}, "col": {c}, "is_road": {v}}}'
+                for c, v in enumerate(linha)
+            ))
+            f.write(",\n" if r + 1 < rows else "\n")
+        f.write('  ],\n  "edges": [\n')
+        sep = ""
+        for r in range(rows):
+            # arestas que saem da linha r (direita e para baixo), uma linha por vez
+            partes = [f'    ["{r}_{c}", "{r}_{c + 1}"]' for c in np.flatnonzero(right[r]).tolist()]
+            partes += [f'    ["{r}_{c}", "{r + 1}_{c}"]' for c in np.flatnonzero(down[r]).tolist()]
+            if partes:
+                f.write(sep + ",\n".join(partes))
+                sep = ",\n"
+        f.write("\n  ]\n}\n")
+
+
+def _grade(rows: int, cols: int, block: int, street: int) -> np.ndarray:
+    periodo = block + street
+    r = np.arange(rows)[:, None] % periodo < street
+    c = np.arange(cols)[None, :] % periodo < street
+    return r | c
+
+
+def _posicoes(n: int, block: int, street: int, rng: np.random.Generator) -> np.ndarray:
+    """Início de cada rua ao longo de um eixo, com quarteirões de tamanho sorteado."""
+    lo, hi = max(1, block // 2), max(2, block * 2)
+    passos = rng.integers(lo, hi + 1, size=n // lo + 2) + street
+    inicio = np.concatenate(([0], np.cumsum(passos)))
+    return inicio[inicio < n]
+
+
+def _irregular(rows: int, cols: int, block: int, street: int, drop: float, rng: np.random.Generator) -> np.ndarray:
+    ruas_r = _posicoes(rows, block, street, rng)
+    ruas_c = _posicoes(cols, block, street, rng)
+    faixa_r = np.zeros(rows, dtype=bool)
+    faixa_c = np.zeros(cols, dtype=bool)
+    for s in range(street):
+        faixa_r[np.minimum(ruas_r + s, rows - 1)] = True
+        faixa_c[np.minimum(ruas_c + s, cols - 1)] = True
+
+    # trecho de rua = rua × intervalo entre duas ruas perpendiculares
+    rua_de_r = np.searchsorted(ruas_r, np.arange(rows), side="right") - 1
+    rua_de_c = np.searchsorted(ruas_c, np.arange(cols), side="right") - 1
+    fica_h = rng.random((ruas_r.size, ruas_c.size)) >= drop   # trechos horizontais
+    fica_v = rng.random((ruas_r.size, ruas_c.size)) >= drop   # trechos verticais
+
+    horiz = faixa_r[:, None] & fica_h[rua_de_r[:, None], rua_de_c[None, :]]
+    vert = faixa_c[None, :] & fica_v[rua_de_r[:, None], rua_de_c[None, :]]
+    cruzamento = faixa_r[:, None] & faixa_c[None, :]
+    return horiz | vert | cruzamento
+
+
+def _radial(rows: int, cols: int, block: int, street: int) -> np.ndarray:
+    r = np.arange(rows)[:, None] - (rows - 1) / 2
+    c = np.arange(cols)[None, :] - (cols - 1) / 2
+    dist = np.hypot(r, c)
+    meia = street / 2 + 0.5          # garante traçado 4-conexo
+
+    periodo = block + street
+    aneis = np.abs(dist - np.round(dist / periodo) * periodo) < meia
+
+    # uma avenida radial a cada ~periodo de circunferência no anel externo
+    n_raios = max(8, int(2 * np.pi * min(rows, cols) / 2 / (4 * periodo)))
+    theta = np.arctan2(r, c)
+    passo = 2 * np.pi / n_raios
+    desvio = np.abs((theta + passo / 2) % passo - passo / 2)   # ângulo até o raio mais próximo
+    raios = dist * np.sin(desvio) < meia
+    return aneis | raios
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+"""
+Ponto de entrada único:
+
+    python source/cli.py pipeline            # imagem → grafo → rotas → simulação
+    python source/cli.py batch mapas/        # pipeline de vários mapas em paralelo
+    python source/cli.py simulate --ticks 50 # só a simulação (grafo já gerado)
+    python source/cli.py assign --orders 40  # lote de pedidos distribuído entre vans
+    python source/cli.py citygen 500        # cidade procedural 500×500 (.npz)
+    python source/cli.py whatif              # checkpoint + cenários a partir dele
+    python source/cli.py serve               # servidor local de rotas (HTTP)
+    python source/cli.py loadgen             # carga no servidor: latência e vazão
+    python source/cli.py chat --fake         # agentes LLM (FakeProvider sem rede)
+    python source/cli.py metrics             # gráficos de métricas
+    python source/cli.py startup             # mede o cold start de cada subcomando
+
+Cada subcomando importa apenas os módulos de que precisa.
+"""
+
+SUBCOMMANDS = ("pipeline", "batch", "simulate", "assign", "citygen", "whatif", "serve", "loadgen", "chat", "metrics")
+
+# módulos importados por cada subcomando (usado também pelo `startup`)
+_IMPORTS = {
+    "pipeline": "import main, cv2, numpy, PIL.Image, rota_mapa",
+    "batch":    "import batch",
+    "simulate": "import main",
+    "assign":   "import main, assignment",
+    "citygen":  "import citygen, cv2",
+    "whatif":   "import checkpoint, main",
+    "serve":    "import route_server",
+    "loadgen":  "import route_client",
+    "chat":     "import chat",
+    "metrics":  "import metrics_graphs, metrics_store, matplotlib.pyplot",
+}
+
+
+def _pipeline(args: argparse.Namespace) -> None:
+    import main
+    main.main()
+
+
+def _batch(args: argparse.Namespace) -> None:
+    import batch
+    defaults = {"grid": args.grid, "n_ticks": args.ticks}
+    batch.executar_lote(args.entrada, args.out, args.workers, args.mem_mb, defaults)
+
+
+def _simulate(args: argparse.Namespace) -> None:
+    import main
+    main.simular(args.graph, args.ticks, args.budget, args.budget_us, frota=args.fleet)
+
+
+def _assign(args: argparse.Namespace) -> None:
+    import main
+    main.simular_pedidos(args.graph, args.vans, args.orders, args.ticks, args.seed)
+
+
+def _citygen(args: argparse.Namespace) -> None:
+    import citygen
+    citygen.main(
+        args.rows, args.cols, args.out, pattern=args.pattern, block=args.block, street=args.street,
+        obstacles=args.obstacles, drop=args.drop, seed=args.seed,
+    )
+
+
+def _whatif(args: argparse.Namespace) -> None:
+    import checkpoint
+    checkpoint.main(args.graph, args.warmup, args.ticks, args.workers, args.seed, args.out)
+
+
+def _serve(args: argparse.Namespace) -> None:
+    import route_server
+    route_server.main(args.graph, args.host, args.port, args.workers, args.verbose, penalty=args.penalty)
+
+
+def _loadgen(args: argparse.Namespace) -> None:
+    import route_client
+    route_client.main(
+        args.url, clientes=args.clients, requisicoes=args.requests, lote=args.batch,
+        destinos=args.goals, traffic_every=args.traffic_every, algo=args.algo, seed=args.seed,
+    )
+
+
+def _chat(args: argparse.Namespace) -> None:
+    import chat
+    if args.server:
+        chat.get_routes(args.server)
+    agents = None
+    if args.fake:
+        from providers import FakeProvider
+        routes = chat.get_routes()
+        agents = [
+            chat.ChatControlledAgent(f"van-{name}", route, FakeProvider(latency=args.latency))
+            for name, route in routes.items()
+        ]
+    elif args.provider:
+        from providers import create_provider
+        provider = create_provider(args.provider)   # uma instância para todos (cota/pool comuns)
+        agents = [
+            chat.ChatControlledAgent(f"van-{name}", route, provider)
+            for name, route in chat.get_routes().items()
+        ]
+    batch = None
+    if args.batch:
+        from providers import FakeProvider, create_provider
+        batch = FakeProvider(latency=args.latency) if args.fake else create_provider(args.provider or "pool")
+    start = time.perf_counter()
+    chat.run_simulation(max_ticks=args.ticks, agents=agents, batch_provider=batch)
+    print(f"Duração total: {time.perf_counter() - start:.2f}s")
+
+
+def _metrics(args: argparse.Namespace) -> None:
+    import metrics_graphs
+    metrics_graphs.main()
+
+
+def _startup(args: argparse.Namespace) -> None:
+    """Cold start (processo novo) de cada subcomando, só a parte de imports."""
+    here = Path(__file__).resolve().parent
+    print(f"{'subcomando':<10} | {'cold start':>10}")
+    print("-----------+-----------")
+    for name in SUBCOMMANDS:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(here)!r}); {_IMPORTS[name]}"],
+                capture_output=True,
+            )
+            dt = time.perf_counter() - t0
+            if proc.returncode != 0:
+                best = float("nan")
+                break
+            best = min(best, dt)
+        print(f"{name:<10} | {best * 1000:8.0f}ms")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Path-Finding Map Pipeline")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("pipeline", help="pipeline completo a partir da imagem").set_defaults(fn=_pipeline)
+
+    p = sub.add_parser("batch", help="pipeline de vários mapas (pasta ou manifesto JSON)")
+    p.add_argument("entrada", help="pasta de imagens ou manifesto .json")
+    p.add_argument("--out", default="source/batch", help="uma subpasta por mapa")
+    p.add_argument("--workers", type=int, default=None, help="processos simultâneos (padrão: núcleos)")
+    p.add_argument("--mem-mb", type=int, default=None, help="limite de memória por processo (MB)")
+    p.add_argument("--grid", type=int, default=16)
+    p.add_argument("--ticks", type=int, default=100)
+    p.set_defaults(fn=_batch)
+
+    p = sub.add_parser("simulate", help="simulação com o grafo já gerado")
+    p.add_argument("--graph", default="source/json/image_graph.json")
+    p.add_argument("--ticks", type=int, default=100)
+    p.add_argument("--budget", type=int, default=None, help="expansões por agente por tick (anytime)")
+    p.add_argument("--budget-us", type=float, default=None, help="µs por agente por tick (anytime)")
+    p.add_argument("--fleet", type=int, default=0, help="vans extras no mesmo destino (flow field)")
+    p.set_defaults(fn=_simulate)
+
+    p = sub.add_parser("assign", help="distribui um lote de pedidos entre vans")
+    p.add_argument("--graph", default="source/json/image_graph.json")
+    p.add_argument("--vans", type=int, default=3)
+    p.add_argument("--orders", type=int, default=30)
+    p.add_argument("--ticks", type=int, default=100)
+    p.add_argument("--seed", type=int, default=None)
+    p.set_defaults(fn=_assign)
+
+    p = sub.add_parser("citygen", help="gera uma cidade procedural (.npz ou .json)")
+    p.add_argument("rows", type=int)
+    p.add_argument("--cols", type=int, default=None, help="padrão: igual a rows")
+    p.add_argument("--pattern", choices=("grid", "irregular", "radial"), default="grid")
+    p.add_argument("--block", type=int, default=6, help="tamanho do quarteirão (células)")
+    p.add_argument("--street", type=int, default=1, help="largura das ruas (células)")
+    p.add_argument("--obstacles", type=float, default=0.0, help="fração de ruas fechadas")
+    p.add_argument("--drop", type=float, default=0.15, help="trechos removidos (irregular)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--out", default="source/json/city.npz", help="extensão define o formato")
+    p.set_defaults(fn=_citygen)
+
+    p = sub.add_parser("whatif", help="aquece a simulação e compara cenários a partir de um checkpoint")
+    p.add_argument("--graph", default="source/json/image_graph.json")
+    p.add_argument("--warmup", type=int, default=10, help="ticks antes do checkpoint")
+    p.add_argument("--ticks", type=int, default=40, help="ticks de cada cenário")
+    p.add_argument("--workers", type=int, default=None, help="processos (padrão: núcleos)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--out", default=None, help="grava o checkpoint (.ckpt)")
+    p.set_defaults(fn=_whatif)
+
+    p = sub.add_parser("serve", help="servidor local de rotas (grafo, cache e campos quentes)")
+    p.add_argument("--graph", default="source/json/image_graph.json")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, default=4, help="requisições processadas ao mesmo tempo")
+    p.add_argument("--penalty", type=int, default=3, help="custo extra de célula com tráfego")
+    p.add_argument("--verbose", action="store_true", help="loga cada requisição")
+    p.set_defaults(fn=_serve)
+
+    p = sub.add_parser("loadgen", help="gerador de carga para o servidor de rotas")
+    p.add_argument("--url", default="http://127.0.0.1:8765")
+    p.add_argument("--clients", type=int, default=4)
+    p.add_argument("--requests", type=int, default=100, help="requisições por cliente")
+    p.add_argument("--batch", type=int, default=16, help="rotas por requisição")
+    p.add_argument("--goals", type=int, default=None, help="destinos distintos (padrão: qualquer nó)")
+    p.add_argument("--traffic-every", type=int, default=None, help="atualiza o tráfego a cada N lotes")
+    p.add_argument("--algo", choices=("astar", "euclidean", "dijkstra"), default="astar")
+    p.add_argument("--seed", type=int, default=None)
+    p.set_defaults(fn=_loadgen)
+
+    p = sub.add_parser("chat", help="agentes controlados por LLM")
+    p.add_argument("--ticks", type=int, default=200)
+    p.add_argument("--fake", action="store_true", help="usa FakeProvider (sem rede)")
+    p.add_argument("--latency", type=float, default=0.0, help="latência do FakeProvider (s)")
+    p.add_argument("--batch", action="store_true", help="uma chamada por tick para todos")
+    p.add_argument("--provider", default=None,
+                   help="provedor de todas as vans (ex.: pool, groq2); padrão: vans Groq no pool")
+    p.add_argument("--server", default=None, help="URL do servidor de rotas (senão lê ticks_routes.json)")
+    p.set_defaults(fn=_chat)
+
+    sub.add_parser("metrics", help="gráficos de métricas").set_defaults(fn=_metrics)
+
+    p = sub.add_parser("startup", help="mede o cold start de cada subcomando")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(fn=_startup)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
 from __future__ import annotations
 import random
-from typing import Dict, List, Tuple
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple
+
+from spatial import SpatialIndex
+
+if TYPE_CHECKING:
+    from traffic import TrafficEngine
+    from flowfield import FlowFieldService
 
 Coord = Tuple[int, int] # (row, col)
 
 """
 Orquestra o ambiente global.
-    • Gere/expira alertas de tráfego.
+    • Gere/expira alertas de tráfego (dicionário + `random`, ou o
+      `TrafficEngine` vetorizado, só em ruas e com semente própria).
     • Publica essas mudanças a todos os DeliveryAgents registrados.
-    • (opcional) Pode redistribuir entregas, coletar métricas etc.
+    • Distribui lotes de pedidos entre os agentes (`assign_orders`).
+    • Mantém os campos de distância compartilhados (`flow_fields`) e os
+      repara só nas células que ganharam/perderam alerta (`traffic_changes`).
+    • Com `seed`, o modelo antigo sorteia com um `random.Random` próprio;
+      sem, usa o `random` global (como sempre). Os dois entram no checkpoint
+      (`checkpoint.snapshot`).
+    • Indexa a posição dos agentes (`spatial`): `nearest_agents` e
+      `agents_within` respondem "quem está perto" sem varrer todos.
 """
 class ControlAgent:
 
@@ -18,7 +33,10 @@ class ControlAgent:
         cols: int,
         ttl_alert: int = 4,        # quantos “ticks” dura cada alerta
         max_alerts: int = 2,       # quantos bloq. simultâneos
-        traffic_penalty: int = 3   # custo extra que o DeliveryAgent deve somar
+        traffic_penalty: int = 3,  # custo extra que o DeliveryAgent deve somar
+        engine: TrafficEngine | None = None,  # modelo vetorizado (ttl/max_alerts vêm dele)
+        seed: int | None = None,   # gerador próprio para o modelo antigo (None = `random` global)
+        spatial_cell: int = 16,    # lado dos baldes do índice espacial (células)
     ) -> None:
 
         self.rows      = rows
@@ -26,39 +44,173 @@ class ControlAgent:
         self.ttl_alert = ttl_alert
         self.max_alerts= max_alerts
         self.penalty   = traffic_penalty
+        self.engine    = engine
+        self.rng       = random.Random(seed) if seed is not None else random
+        if engine is not None:
+            self.ttl_alert  = engine.ttl
+            self.max_alerts = engine.max_alerts
 
         # estado interno
         self._traffic: Dict[Coord,int] = {}       # célula -> TTL restante
+        self._changed: Set[Coord] = set()        # ganharam/perderam alerta no último passo
         self._agents : List = []                 # referências aos agentes inscritos
         self.tick = 0
+        self.last_assignment = None              # último lote de `assign_orders`
+        self.scheduler = None                    # EventScheduler que conduz o loop, se houver
+        self._flow: Dict[int, FlowFieldService] = {}   # id(grafo) -> serviço de campos
+        self.spatial = SpatialIndex(spatial_cell)   # agente -> posição (atualizado a cada passo)
 
     # Interface pública
     def register(self, agent) -> None:
         """Associa um DeliveryAgent a este controle."""
         self._agents.append(agent)
-        agent.on_traffic_update(set(self._traffic))
+        self.spatial.insert(agent, agent.pos_table[agent.pos_id])
+        agent.on_traffic_update(self.traffic_cells())
+
+    def agent_moved(self, agent) -> None:
+        """Chamado pelo agente quando muda de célula (mantém o índice espacial)."""
+        if agent in self.spatial:
+            self.spatial.move(agent, agent.pos_table[agent.pos_id])
+
+    def nearest_agents(
+        self,
+        cell: Coord,
+        k: int = 1,
+        by_road: bool = False,
+        max_dist: int | None = None,
+        where: Callable | None = None,   # filtro por agente (ex.: sem fila de pedidos)
+    ) -> List[Tuple[object, int]]:
+        """
+        Os `k` agentes mais perto de `cell` com a distância: de grade
+        (Manhattan) ou, com `by_road`, o custo atual de cada um até `cell`
+        pela malha (tráfego incluído).
+        """
+        if not by_road or not self._agents:
+            return self.spatial.nearest(cell, k, max_dist, where)
+        ref = self._agents[0]   # todos compartilham o mesmo grafo e o mesmo custo
+        return self.spatial.nearest_by_road(
+            cell, k, ref.adj, ref.graph.node_at, ref._cost, max_cost=max_dist, where=where
+        )
+
+    def agents_within(self, cell: Coord, radius: int) -> List[Tuple[object, int]]:
+        """Agentes a até `radius` células (Manhattan) de `cell`, do mais perto ao mais longe."""
+        return self.spatial.within(cell, radius)
+
+    def wake(self, agent) -> None:
+        """Agente ganhou trabalho novo (objetivos): volta ao loop do escalonador."""
+        if self.scheduler is not None:
+            self.scheduler.wake(agent)
 
     def get_penalty(self, cell: Coord) -> int:
         """Quanto custa atravessar `cell` agora."""
-        return self.penalty if cell in self._traffic else 0
+        alertas = self._traffic if self.engine is None else self.engine   # engine: olha o ttl_grid
+        return self.penalty if cell in alertas else 0
+
+    def traffic_cells(self) -> Set[Coord]:
+        """Células com alerta agora (conjunto novo a cada passo)."""
+        if self.engine is not None:
+            return self.engine.cells()
+        return set(self._traffic)
+
+    def traffic_changes(self) -> Set[Coord]:
+        """Células que ganharam ou perderam alerta no último passo."""
+        if self.engine is not None:
+            return self.engine.changes()
+        return self._changed
+
+    def forecast(self, horizon: int) -> List[Set[Coord]]:
+        """
+        Células com alerta já conhecido em cada um dos próximos `horizon`
+        ticks (índice 0 = agora). Alertas novos são aleatórios e não entram.
+        """
+        if self.engine is not None:
+            return self.engine.forecast(horizon)
+        return [
+            {cell for cell, ttl in self._traffic.items() if ttl > d}
+            for d in range(horizon)
+        ]
+
+    def flow_fields(self, graph) -> FlowFieldService:
+        """Serviço de campos de distância do grafo (criado no primeiro uso)."""
+        service = self._flow.get(id(graph))
+        if service is None:
+            from flowfield import FlowFieldService
+
+            service = FlowFieldService(graph, partial(_custo_entrada, self, graph.pos))
+            self._flow[id(graph)] = service
+        return service
+
+    def assign_orders(self, orders: List[str], agents: List | None = None) -> Dict:
+        """
+        Atribui um lote de pedidos (NodeIds) aos agentes (padrão: todos os
+        registrados), partindo da posição atual de cada um, e entrega a cada
+        agente sua sequência de objetivos. Devolve o relatório da atribuição
+        (pedidos/s, comprimento total das rotas, ...).
+        """
+        from assignment import assign  # numpy só quando há atribuição
+
+        agents = self._agents if agents is None else agents
+        if not agents:
+            raise ValueError("assign_orders: nenhum agente disponível")
+        ref = agents[0]   # todos compartilham o mesmo grafo e o mesmo custo
+        result = assign({ag.id: ag.pos_id for ag in agents}, orders, ref.adj, ref._cost)
+        for ag in agents:
+            ag.set_goals(result.routes[ag.id])
+        self.last_assignment = result
+        return result.report()
+
+    # checkpoint (pickle)
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        if self.rng is random:
+            # o módulo não é serializável: guarda o estado do gerador global
+            state["rng"] = ("global", random.getstate())
+        state["_flow"] = list(self._flow.values())
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        rng = state["rng"]
+        if isinstance(rng, tuple) and rng[0] == "global":
+            random.setstate(rng[1])
+            state["rng"] = random
+        state["_flow"] = {id(s.graph): s for s in state["_flow"]}   # ids mudam na cópia
+        self.__dict__.update(state)
 
     # Loop de simulação
     def step(self) -> None:
         """Avança UM passo na simulação."""
-        self.tick += 1
-        self._decair_alertas()
-        self._gerar_novos_alertas()
+        self.advance_traffic()
 
         # notifica todo mundo de uma só vez (pub-sub simples)
-        atual = set(self._traffic)
+        atual, mudou = self.traffic_cells(), self.traffic_changes()
         for ag in self._agents:
-            ag.on_traffic_update(atual)
+            ag.on_traffic_update(atual, mudou)
 
         # deixa cada agente agir depois da atualização
         for ag in self._agents:
             ag.next_step()
 
+    def advance_traffic(self) -> None:
+        """Só a parte do ambiente de um passo: relógio e alertas (sem agentes)."""
+        self.tick += 1
+        if self.engine is not None:
+            self.engine.step()
+        else:
+            antes = set(self._traffic)
+            self._decair_alertas()
+            self._gerar_novos_alertas()
+            self._changed = antes.symmetric_difference(self._traffic)
+        if self._flow:
+            self._repair_flow_fields()
+
     # Algoritmos internos
+    def _repair_flow_fields(self) -> None:
+        """Só as células que ganharam ou perderam alerta mudam de custo."""
+        mudou = self.traffic_changes()
+        if mudou:
+            for service in self._flow.values():
+                service.on_traffic_change(mudou)
+
     def _decair_alertas(self) -> None:
         """Reduz TTL de cada alerta; remove os expirados."""
         expirar = [cell for cell, ttl in self._traffic.items() if ttl <= 1]
@@ -74,9 +226,14 @@ class ControlAgent:
         """
         faltam = self.max_alerts - len(self._traffic)
         while faltam > 0:
-            r = random.randint(0, self.rows - 1)
-            c = random.randint(0, self.cols - 1)
+            r = self.rng.randint(0, self.rows - 1)
+            c = self.rng.randint(0, self.cols - 1)
             cell = (r, c)
             if cell not in self._traffic: # evita duplicar
                 self._traffic[cell] = self.ttl_alert
                 faltam -= 1
+
+
+def _custo_entrada(control: ControlAgent, pos: Dict, a, b) -> int:
+    """Custo de entrar em `b` (mesmo dos DeliveryAgents); função de módulo para caber no pickle."""
+    return 1 + control.get_penalty(pos[b])
@@ -1,15 +1,26 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Set, Tuple, Dict
+from collections import deque
+from typing import Deque, List, Set, Tuple, Dict
 import time
 import heapq
 
-from pathfinder import dijkstra, load_graph
+from pathfinder import dijkstra, dijkstra_all
+from dynamic_graph import DynamicGraph
 from control import ControlAgent
+from hpa import HierarchicalGraph
+from anytime import AnytimePlanner
+from trajectory import Trajectory
+from flowfield import DistanceField
 
 NodeId = str
 Coord  = Tuple[int, int]
 
+
+def _sem_heuristica(_a: NodeId, _b: NodeId) -> int:
+    return 0
+
+
 class DeliveryAgent:
     def __init__(
         self,
@@ -20,7 +31,15 @@ class DeliveryAgent:
         control: ControlAgent,
         strategy: str = "astar",
         heuristic: str = "manhattan",
-        permanent_blocks: set[Coord] | None = None,
+        permanent_blocks: set[Coord] | None = None,   # fechados no grafo (sem custo extra)
+        cluster_size: int = 4,     # só para strategy="hpa"
+        hpa_hops: int = 2,         # saltos de cluster refinados por plano
+        horizon: int = 8,          # só para strategy="timed": ticks de previsão
+        history_maxlen: int | None = None,  # limita o histórico (ring buffer)
+        graph: DynamicGraph | None = None,  # grafo compartilhado (senão lê `graph_json`)
+        plan_budget: int | None = None,     # expansões por tick (modo anytime, astar/dijkstra)
+        plan_budget_us: float | None = None,  # µs por tick (modo anytime)
+        anytime_w0: float = 2.5,            # peso inicial do ARA*
     ) -> None:
 
         # estado geral
@@ -30,52 +49,208 @@ class DeliveryAgent:
         self.control   = control
         self.strategy  = strategy.lower()
         self.heuristic = heuristic.lower()
-        self.permanent_blocks = set(permanent_blocks or [])
+        self.hpa_hops  = hpa_hops
+        self.horizon   = horizon
+
+        # planejamento com orçamento por tick (ARA*): só para astar/dijkstra
+        self.plan_budget    = plan_budget
+        self.plan_budget_us = plan_budget_us
+        self.anytime_w0     = anytime_w0
+        self.anytime = (
+            (plan_budget is not None or plan_budget_us is not None)
+            and self.strategy in ("astar", "dijkstra")
+        )
+        self._planner: AnytimePlanner | None = None
+        self._slice_tick = -1
+
+        # grafo (células fechadas somem de `adj`)
+        self.graph = graph if graph is not None else DynamicGraph.from_json(graph_json)
+        if permanent_blocks:
+            self.graph.close_cells(permanent_blocks)
+        self.pos_table, self.adj, self.is_road = self.graph.pos, self.graph.adj, self.graph.is_road
+        self.hierarchy: HierarchicalGraph | None = None
+        if self.strategy == "hpa":
+            self.hierarchy = HierarchicalGraph(
+                self.pos_table, self.adj, self._cost, cluster_size=cluster_size
+            )
 
-        # grafo
-        self.pos_table, self.adj, self.is_road = load_graph(graph_json)
+        # histórico de posições (corridas compactas; lê-se como lista de NodeIds)
+        self.history = Trajectory(start_id, self.pos_table, maxlen=history_maxlen, node_at=self.graph.node_at)
 
-        # histórico de posições
-        self.history: List[NodeId] = [start_id]
+        # próximos objetivos (atribuídos pelo ControlAgent) e já atendidos
+        self.goal_queue: Deque[NodeId] = deque()
+        self.delivered:  List[NodeId] = []
 
         # métricas
         self.replan_count: int = 0
         self.total_planning_time: float = 0.0
         self.initial_plan_time: float | None = None
+        self.bound: float = 1.0            # limite de subotimalidade da rota atual
+        self.plan_expansions: int = 0      # modo anytime
+        self.budget_ticks: int = 0         # ticks com fatia de busca
+        self.budget_use: float = 0.0       # soma da fração do orçamento usada
+        self.budget_exhausted: int = 0     # fatias que pararam por orçamento
 
         self.traffic: Set[Coord] = set()
         self.path:   List[NodeId] = []
+
+        # strategy="flowfield": campo compartilhado do objetivo atual (ControlAgent)
+        self._field: DistanceField | None = None
+
+        # previsão usada no último plano "timed" (índice = ticks desde o plano)
+        self._forecast: List[Set[Coord]] = []
+        self._plan_tick = 0
         self._plan_route() # rota inicial
+        self.graph.subscribe(self.on_topology_change)
 
     # callbacks / integração
-    def on_traffic_update(self, traffic_cells: Set[Coord]) -> None:
+    def on_traffic_update(self, traffic_cells: Set[Coord], changed: Set[Coord] | None = None) -> None:
+        if self.anytime and changed is None:
+            changed = self.traffic ^ traffic_cells
+        self.sync_traffic(traffic_cells, changed)
+        if self.strategy == "flowfield":
+            return  # o ControlAgent já reparou o campo
+        if self.strategy == "timed" and not self._forecast_missed(traffic_cells):
+            return  # o plano já contava com este tráfego
+        if self.anytime and self._planner is not None and not self._path_hits(traffic_cells):
+            node_at = self.graph.node_at
+            if self._planner.touches(node_at[c] for c in changed if c in node_at):
+                # g já calculados usaram o custo antigo: o limite da busca
+                # deixaria de valer. Recomeça, seguindo a rota atual enquanto isso.
+                self._new_planner()
+            return
+        self._plan_route()
+
+    def sync_traffic(self, traffic_cells: Set[Coord], changed: Set[Coord] | None = None) -> None:
+        """
+        Atualiza o tráfego conhecido sem replanejar. `changed` (o que mudou
+        desde a última sincronização, se quem chama souber) evita comparar os
+        dois conjuntos inteiros.
+        """
+        if self.hierarchy is not None:
+            # só os clusters cujo custo mudou precisam ser recalculados
+            self.hierarchy.invalidate(self.traffic ^ traffic_cells if changed is None else changed)
         self.traffic = traffic_cells
+
+    def on_topology_change(self, version: int, nodes: Set[NodeId]) -> None:
+        """
+        Célula/aresta fechada ou reaberta: atualiza a hierarquia e replaneja
+        (se a célula fechada for a do próprio agente, o plano é sair dela).
+        """
+        if self.hierarchy is not None:
+            self.hierarchy.update_topology(nodes)
+        self._plan_route()
+
+    def detach(self) -> None:
+        """Agente sai de cena: para de ouvir o grafo e devolve o campo compartilhado."""
+        self.graph.unsubscribe(self.on_topology_change)
+        if self._field is not None:
+            self.control.flow_fields(self.graph).release(self._field.goal)
+            self._field = None
+
+    def set_goals(self, goals: List[NodeId]) -> None:
+        """Substitui o objetivo atual por uma sequência de objetivos."""
+        self.control.wake(self)
+        if not goals:
+            self.goal_queue.clear()
+            return
+        self.goal_id = goals[0]
+        self.goal_queue = deque(goals[1:])
+        if self.goal_id == self.pos_id:
+            self.delivered.append(self.goal_id)
         self._plan_route()
 
     def next_step(self) -> None:
         if self.pos_id == self.goal_id:
-            return
+            # objetivo atendido: segue para o próximo da fila
+            while self.pos_id == self.goal_id:
+                if not self.goal_queue:
+                    return
+                self.goal_id = self.goal_queue.popleft()
+                if self.goal_id == self.pos_id:
+                    self.delivered.append(self.goal_id)
+            self._plan_route()
 
-        # replaneja se necessário
-        if len(self.path) <= 1 or self._coord(self.path[1]) in self.traffic:
+        # replaneja se necessário ("timed" já planejou esperas/desvios)
+        if self.anytime:
+            if self._planner is None or (self._planner.done and len(self.path) <= 1):
+                self._plan_route()      # sem rota (ou saindo de célula fechada): tenta de novo
+            self._plan_slice()
+        elif self.strategy == "flowfield":
+            self.path = self._field_hop()   # O(1): próximo salto do campo
+        elif len(self.path) <= 1 or (
+            self.strategy != "timed" and self._coord(self.path[1]) in self.traffic
+        ):
             self._plan_route()
 
-        # move 1 passo
+        # move 1 passo (no modo "timed", repetir o nó = esperar)
         if len(self.path) > 1:
-            self.pos_id = self.path.pop(1)
+            nxt = self.path.pop(1)
+            if nxt == self.pos_id:
+                print(f"[{self.id}] aguarda em {self.pos_id}")
+            else:
+                print(f"[{self.id}] -> {nxt}")
+                self.pos_id = nxt
+                self.control.agent_moved(self)
             self.history.append(self.pos_id)
-            print(f"[{self.id}] -> {self.pos_id}")
+            if nxt == self.goal_id:
+                self.delivered.append(nxt)
+
+    # estado para o escalonador
+    @property
+    def finished(self) -> bool:
+        """No objetivo e sem fila: nada a fazer até receber novos objetivos."""
+        return self.pos_id == self.goal_id and not self.goal_queue
+
+    @property
+    def stranded(self) -> bool:
+        """
+        Sem rota. Tráfego só muda custos, então o agente continua sem rota até
+        a topologia ou os objetivos mudarem (no modo anytime a busca ainda
+        consome fatias, então não conta).
+        """
+        return not self.anytime and not self.path and not self.finished
 
     # planejamento 
     def _plan_route(self) -> None:
         t0 = time.perf_counter()
+        cost = self._cost
+
+        if self.strategy != "flowfield" and not self.graph.is_open(self.pos_id) and self.pos_id != self.goal_id:
+            # a célula fechou com o agente nela: `adj` não tem mais saída
+            # (no flowfield quem cuida disso é `_field_hop`)
+            self._planner = None
+            self.path = self._exit_route()
+            self._update_metrics(time.perf_counter() - t0)
+            return
+
+        if self.anytime:
+            # nova busca; até a primeira solução o agente espera
+            self.path = [self.pos_id]
+            self._new_planner()
+            self._plan_slice()
+            return
+
+        if self.strategy == "flowfield":
+            # um campo por objetivo, compartilhado por todos que vão para ele
+            if self._field is None or self._field.goal != self.goal_id:
+                service = self.control.flow_fields(self.graph)
+                if self._field is not None:
+                    service.release(self._field.goal)
+                self._field = service.acquire(self.goal_id)
+            self.path = self._field_hop()
+            self._update_metrics(time.perf_counter() - t0)
+            return
+
+        if self.strategy == "hpa":
+            self.path = self.hierarchy.plan(self.pos_id, self.goal_id, hops=self.hpa_hops) or []
+            self._update_metrics(time.perf_counter() - t0)
+            return
 
-        # custo dinâmico (tráfego + blocos permanentes)
-        def cost(a: NodeId, b: NodeId) -> int:
-            r, c = self._coord(b)
-            if (r, c) in self.permanent_blocks:
-                return 1_000_000_000
-            return 1 + self.control.get_penalty((r, c))
+        if self.strategy == "timed":
+            self.path = self._plan_time_expanded()
+            self._update_metrics(time.perf_counter() - t0)
+            return
 
         if self.strategy == "dijkstra":
             self.path = dijkstra(self.pos_id, self.goal_id, self.adj, cost_fn=cost) or []
@@ -106,6 +281,125 @@ class DeliveryAgent:
         self.path = []
         self._update_metrics(time.perf_counter() - t0)
 
+    def _plan_time_expanded(self) -> List[NodeId]:
+        """
+        A* sobre (célula, t) usando a previsão do ControlAgent: entrar numa
+        célula no passo t custa a penalidade prevista para t; esperar custa 1.
+        Depois de `horizon` passos a previsão acaba e o tempo deixa de contar.
+        """
+        H = self.horizon
+        self._forecast = self.control.forecast(H)
+        self._plan_tick = self.control.tick
+        penalty = self.control.penalty
+
+        def step_cost(b: NodeId, t: int) -> int:
+            return 1 + (penalty if t < H and self._coord(b) in self._forecast[t] else 0)
+
+        start = (self.pos_id, 0)
+        open_heap: List[Tuple[float, int, NodeId]] = [(0, 0, self.pos_id)]
+        g: Dict[Tuple[NodeId, int], int] = {start: 0}
+        came: Dict[Tuple[NodeId, int], Tuple[NodeId, int]] = {}
+
+        while open_heap:
+            _, t, cur = heapq.heappop(open_heap)
+            state = (cur, t)
+            if cur == self.goal_id:
+                path = [state]
+                while path[-1] in came:
+                    path.append(came[path[-1]])
+                return [nid for nid, _ in reversed(path)]
+
+            nt = min(t + 1, H)
+            moves = [(nxt, step_cost(nxt, t)) for nxt in self.adj[cur]]
+            if t < H:
+                moves.append((cur, 1))  # esperar só faz sentido dentro da previsão
+            for nxt, w in moves:
+                tentative = g[state] + w
+                key = (nxt, nt)
+                if key not in g or tentative < g[key]:
+                    g[key] = tentative
+                    came[key] = state
+                    heapq.heappush(open_heap, (tentative + self._heuristic(nxt, self.goal_id), nt, nxt))
+        return []
+
+    def _new_planner(self) -> None:
+        if self.strategy == "astar":
+            # "obstacles" superestima: a busca roda, mas o limite fica desconhecido
+            h, admissible = self._heuristic, self.heuristic != "obstacles"
+        else:
+            h, admissible = _sem_heuristica, True
+        self._planner = AnytimePlanner(
+            self.pos_id, self.goal_id, self.adj, self._cost, h, w0=self.anytime_w0, admissible=admissible
+        )
+        self.bound = float("inf")
+        self.replan_count += 1
+
+    def _plan_slice(self) -> None:
+        """Uma fatia de ARA* por tick, dentro do orçamento."""
+        planner = self._planner
+        if planner is None or planner.done or self._slice_tick == self.control.tick:
+            return
+        self._slice_tick = self.control.tick
+
+        t0 = time.perf_counter()
+        used = planner.run(self.plan_budget, self.plan_budget_us)
+        dt = time.perf_counter() - t0
+
+        self.total_planning_time += dt
+        if self.initial_plan_time is None:
+            self.initial_plan_time = dt
+        self.plan_expansions += used
+        self.budget_ticks += 1
+        fracs = []
+        if self.plan_budget:
+            fracs.append(used / self.plan_budget)
+        if self.plan_budget_us:
+            fracs.append(dt * 1e6 / self.plan_budget_us)
+        self.budget_use += max(fracs, default=0.0)
+        if not planner.done:
+            self.budget_exhausted += 1
+
+        # rota melhor (ou a primeira): segue dela a partir de onde está
+        if planner.path is not None and self.pos_id in planner.path:
+            self.path = planner.path[planner.path.index(self.pos_id):]
+            self.bound = planner.bound
+
+    def _exit_route(self) -> List[NodeId]:
+        """[posição, saída]: a saída aberta mais perto do objetivo ([] se nenhuma chega lá)."""
+        exits = self.graph.exits(self.pos_id)
+        if not exits:
+            return []
+        dist = dijkstra_all(self.goal_id, self.adj, self._cost, targets=set(exits))
+        best = min((m for m in exits if m in dist), key=dist.__getitem__, default=None)
+        return [] if best is None else [self.pos_id, best]
+
+    def _field_hop(self) -> List[NodeId]:
+        """[posição, próximo salto]; [posição] no objetivo; [] sem rota."""
+        if not self._field.reachable(self.pos_id):
+            return [] if self.graph.is_open(self.pos_id) else self._exit_route()
+        nxt = self._field.next_hop(self.pos_id)
+        return [self.pos_id] if nxt is None else [self.pos_id, nxt]
+
+    def _path_hits(self, cells: Set[Coord]) -> bool:
+        return any(self._coord(nid) in cells for nid in self.path[1:])
+
+    def _forecast_missed(self, traffic_cells: Set[Coord]) -> bool:
+        """True se o tráfego real diverge da previsão em algum ponto da rota."""
+        if self.pos_id == self.goal_id:
+            return False
+        if len(self.path) <= 1:
+            return True
+        d = self.control.tick - self._plan_tick
+        expected = self._forecast[d] if d < len(self._forecast) else set()
+        surprises = traffic_cells - expected
+        if not surprises:
+            return False
+        return any(self._coord(nid) in surprises for nid in self.path[1:])
+
+    # custo dinâmico (tráfego; bloqueios já não estão em `adj`)
+    def _cost(self, a: NodeId, b: NodeId) -> int:
+        return 1 + self.control.get_penalty(self._coord(b))
+
     # métricas
     def _update_metrics(self, dt: float) -> None:
         self.replan_count += 1
@@ -0,0 +1,172 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from pathfinder import AdjTable, Coord, NodeId, PosTable, load_graph
+
+# Tiles permanentes bloqueados (rios, prédios…) — cópia única usada pela
+# simulação (main.py) e pelos agentes LLM (chat.py)
+PERMANENT_BLOCKS: Set[Coord] = {
+    (13, 2), (8, 3), (7, 3)
+}
+
+# grafo do mapa de exemplo (source/image.png), o único a que eles pertencem
+SAMPLE_GRAPH = Path(__file__).resolve().parent / "json" / "image_graph.json"
+
+def permanent_blocks(graph_path: str | Path) -> Set[Coord]:
+    """PERMANENT_BLOCKS para o grafo de exemplo; nenhum para os demais (citygen, outras imagens)."""
+    return set(PERMANENT_BLOCKS) if Path(graph_path).resolve() == SAMPLE_GRAPH else set()
+
+Edge     = Tuple[NodeId, NodeId]
+Listener = Callable[[int, Set[NodeId]], None]   # (versão, nós cujas arestas mudaram)
+
+
+"""
+Grafo de ruas com topologia mutável em tempo de execução.
+
+    • `adj` é a tabela de adjacência *viva*: fechar uma célula ou aresta
+      remove as arestas dela, então qualquer busca sobre `adj` simplesmente
+      não enxerga o trecho fechado (em vez de pagar um custo enorme).
+    • Reabrir restaura as arestas originais (as que não continuam fechadas
+      por outro motivo).
+    • Cada mudança incrementa `version` e avisa os ouvintes com os nós
+      afetados, para que hierarquias, caches de rota etc. se atualizem.
+    • Quem estava numa célula quando ela fechou sai por `exits` (ninguém
+      mais entra nela).
+"""
+class DynamicGraph:
+
+    def __init__(
+        self,
+        pos: PosTable,
+        adj: AdjTable,
+        is_road: Dict[Coord, bool] | None = None,
+        closed: Iterable[NodeId | Coord] = (),
+    ) -> None:
+
+        self.pos     = pos
+        self.adj     = adj
+        self.is_road = is_road if is_road is not None else {c: True for c in pos.values()}
+        self.node_at: Dict[Coord, NodeId] = {c: n for n, c in pos.items()}
+        self.version = 0
+
+        # estado interno
+        self._base: AdjTable = {n: set(nbrs) for n, nbrs in adj.items()}   # topologia original
+        self._road_base = dict(self.is_road)
+        self._closed_nodes: Set[NodeId] = set()
+        self._closed_edges: Set[frozenset] = set()
+        self._listeners: List[Listener] = []
+
+        self.close_cells(closed)
+        self.version = 0   # bloqueios iniciais fazem parte da versão base
+
+    @classmethod
+    def from_json(cls, json_path: str | Path, closed: Iterable[NodeId | Coord] = ()) -> "DynamicGraph":
+        pos, adj, is_road = load_graph(json_path)
+        return cls(pos, adj, is_road, closed)
+
+    # Interface pública
+    @property
+    def closed_cells(self) -> Set[Coord]:
+        return {self.pos[n] for n in self._closed_nodes}
+
+    def is_open(self, cell: NodeId | Coord) -> bool:
+        node = self._node(cell)
+        return node is not None and node not in self._closed_nodes
+
+    def exits(self, cell: NodeId | Coord) -> List[NodeId]:
+        """Vizinhos abertos de `cell` pela topologia original, mesmo com `cell` fechada."""
+        n = self._node(cell)
+        if n is None:
+            return []
+        return [m for m in self._base[n] if m not in self._closed_nodes and frozenset((n, m)) not in self._closed_edges]
+
+    def close_cells(self, cells: Iterable[NodeId | Coord]) -> Set[NodeId]:
+        """Fecha células (obras, interdições). Devolve os nós afetados."""
+        changed: Set[NodeId] = set()
+        for cell in cells:
+            n = self._node(cell)
+            if n is None or n in self._closed_nodes:
+                continue
+            self._closed_nodes.add(n)
+            self.is_road[self.pos[n]] = False
+            for m in self.adj[n]:
+                self.adj[m].discard(n)
+                changed.add(m)
+            self.adj[n].clear()
+            changed.add(n)
+        self._bump(changed)
+        return changed
+
+    def open_cells(self, cells: Iterable[NodeId | Coord]) -> Set[NodeId]:
+        changed: Set[NodeId] = set()
+        for cell in cells:
+            n = self._node(cell)
+            if n is None or n not in self._closed_nodes:
+                continue
+            self._closed_nodes.discard(n)
+            self.is_road[self.pos[n]] = self._road_base.get(self.pos[n], True)
+            for m in self._base[n]:
+                if self._edge_open(n, m):
+                    self.adj[n].add(m)
+                    self.adj[m].add(n)
+                    changed.add(m)
+            changed.add(n)
+        self._bump(changed)
+        return changed
+
+    def close_edges(self, edges: Iterable[Edge]) -> Set[NodeId]:
+        """Fecha arestas (ex.: conversão proibida) sem fechar as células."""
+        changed: Set[NodeId] = set()
+        for a, b in edges:
+            if b not in self._base.get(a, ()):
+                continue
+            key = frozenset((a, b))
+            if key in self._closed_edges:
+                continue
+            self._closed_edges.add(key)
+            self.adj[a].discard(b)
+            self.adj[b].discard(a)
+            changed.update((a, b))
+        self._bump(changed)
+        return changed
+
+    def open_edges(self, edges: Iterable[Edge]) -> Set[NodeId]:
+        changed: Set[NodeId] = set()
+        for a, b in edges:
+            key = frozenset((a, b))
+            if key not in self._closed_edges:
+                continue
+            self._closed_edges.discard(key)
+            if self._edge_open(a, b):
+                self.adj[a].add(b)
+                self.adj[b].add(a)
+                changed.update((a, b))
+        self._bump(changed)
+        return changed
+
+    def subscribe(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # Algoritmos internos
+    def _node(self, cell: NodeId | Coord) -> NodeId | None:
+        if isinstance(cell, tuple):
+            return self.node_at.get(cell)
+        return cell if cell in self.pos else None
+
+    def _edge_open(self, a: NodeId, b: NodeId) -> bool:
+        return (
+            a not in self._closed_nodes and b not in self._closed_nodes
+            and frozenset((a, b)) not in self._closed_edges
+        )
+
+    def _bump(self, changed: Set[NodeId]) -> None:
+        if not changed:
+            return
+        self.version += 1
+        for listener in list(self._listeners):
+            listener(self.version, changed)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+import heapq
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Set
+
+from pathfinder import AdjTable, NodeId
+
+CostFn = Callable[[NodeId, NodeId], int]
+
+
+"""
+Campo de distâncias até um objetivo (flow field).
+
+Uma busca de Dijkstra reversa a partir de `goal` dá, para cada nó, o custo
+até o objetivo (`dist`) e o próximo passo da rota ótima (`succ`): qualquer
+agente indo para `goal` consulta o próximo salto em O(1).
+
+Quando custos ou arestas mudam (`repair`), só a parte afetada é refeita:
+    • nós cuja aresta da árvore piorou perdem a distância junto com a
+      subárvore que dependia deles;
+    • esses nós e os tocados pela mudança recebem o melhor valor dos vizinhos
+      ainda válidos, e a correção se propaga por Dijkstra.
+"""
+class DistanceField:
+
+    def __init__(self, goal: NodeId, adj: AdjTable, cost_fn: CostFn) -> None:
+
+        self.goal = goal
+        self.adj  = adj
+        self.cost = cost_fn
+
+        # resultado
+        self.dist: Dict[NodeId, float] = {}
+        self.succ: Dict[NodeId, NodeId] = {}
+
+        # estado interno: filhos na árvore de caminhos mínimos
+        self._children: Dict[NodeId, Set[NodeId]] = {}
+
+        # métricas
+        self.settled  = 0     # nós fixados (busca inicial + reparos)
+        self.repairs  = 0
+
+        t0 = time.perf_counter()
+        self._build()
+        self.build_time = time.perf_counter() - t0
+
+    # Interface pública
+    def next_hop(self, node: NodeId) -> NodeId | None:
+        return self.succ.get(node)
+
+    def reachable(self, node: NodeId) -> bool:
+        return node in self.dist
+
+    def path(self, node: NodeId) -> List[NodeId]:
+        """Rota completa seguindo `succ` ([] sem rota)."""
+        if node not in self.dist:
+            return []
+        path = [node]
+        while path[-1] != self.goal:
+            path.append(self.succ[path[-1]])
+        return path
+
+    def repair(self, touched: Iterable[NodeId]) -> int:
+        """
+        Refaz o campo depois de mudanças nas arestas que saem de `touched`
+        (custo ou existência). Devolve quantos nós foram fixados.
+        """
+        touched = {n for n in touched if n in self.adj}
+        if not touched:
+            return 0
+        self.repairs += 1
+        dist, succ = self.dist, self.succ
+
+        # 1) arestas da árvore que pioraram ou sumiram: a subárvore perde o valor
+        invalid: Set[NodeId] = set()
+        for u in touched:
+            s = succ.get(u)
+            if s is None or u in invalid:
+                continue
+            if s not in self.adj[u] or self.cost(u, s) + dist[s] > dist[u]:
+                self._collect_subtree(u, invalid)
+        for u in invalid:
+            del dist[u]
+            self._set_succ(u, None)
+
+        # 2) fronteira: melhor valor vindo de vizinhos válidos
+        heap: List = []
+        for u in invalid | touched:
+            if u == self.goal:
+                continue
+            best, via = dist.get(u, math.inf), None
+            for v in self.adj[u]:
+                dv = dist.get(v)
+                if dv is not None:
+                    nd = self.cost(u, v) + dv
+                    if nd < best:
+                        best, via = nd, v
+            if via is not None:
+                dist[u] = best
+                self._set_succ(u, via)
+                heapq.heappush(heap, (best, u))
+
+        # 3) propaga
+        return self._propagate(heap)
+
+    # Algoritmos internos
+    def _build(self) -> None:
+        if self.goal not in self.adj:
+            return
+        self.dist[self.goal] = 0
+        self._propagate([(0, self.goal)])
+
+    def _propagate(self, heap: List) -> int:
+        dist, adj, cost = self.dist, self.adj, self.cost
+        settled = 0
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist.get(v, math.inf):
+                continue
+            settled += 1
+            for u in adj[v]:        # aresta u -> v (grafo não direcionado)
+                nd = d + cost(u, v)
+                if nd < dist.get(u, math.inf):
+                    dist[u] = nd
+                    self._set_succ(u, v)
+                    heapq.heappush(heap, (nd, u))
+        self.settled += settled
+        return settled
+
+    def _set_succ(self, u: NodeId, v: NodeId | None) -> None:
+        old = self.succ.get(u)
+        if old is not None:
+            self._children[old].discard(u)
+        if v is None:
+            self.succ.pop(u, None)
+        else:
+            self.succ[u] = v
+            self._children.setdefault(v, set()).add(u)
+
+    def _collect_subtree(self, root: NodeId, out: Set[NodeId]) -> None:
+        stack = [root]
+        while stack:
+            n = stack.pop()
+            if n in out:
+                continue
+            out.add(n)
+            stack.extend(self._children.get(n, ()))
+
+
+"""
+Serviço de campos de distância compartilhados (um por objetivo ativo), dono
+do ControlAgent.
+
+    • `acquire(goal)` devolve o campo do objetivo, criando-o na primeira vez;
+      `release(goal)` descarta o campo quando ninguém mais o usa.
+    • Mudanças de tráfego (`on_traffic_change`) e de topologia (avisadas pelo
+      DynamicGraph) reparam todos os campos ativos de forma incremental.
+
+O custo de planejamento cresce com o número de objetivos distintos, não com
+o número de agentes.
+"""
+class FlowFieldService:
+
+    def __init__(self, graph, cost_fn: CostFn) -> None:
+
+        self.graph = graph
+        self.adj   = graph.adj
+        self.cost  = cost_fn
+
+        # estado interno
+        self._fields: Dict[NodeId, DistanceField] = {}
+        self._refs: Dict[NodeId, int] = {}
+
+        # métricas
+        self.builds = 0
+        self.build_time  = 0.0
+        self.repair_time = 0.0
+
+        graph.subscribe(self.on_topology_change)
+
+    # Interface pública
+    def acquire(self, goal: NodeId, built: DistanceField | None = None) -> DistanceField:
+        """`built`: campo de `goal` já montado por `build` (ignorado se já houver um)."""
+        field = self._fields.get(goal)
+        if field is None:
+            field = self._fields[goal] = built if built is not None else self.build(goal)
+            self.build_time += field.build_time
+            self.builds += 1
+        self._refs[goal] = self._refs.get(goal, 0) + 1
+        return field
+
+    def build(self, goal: NodeId) -> DistanceField:
+        """Monta o campo de `goal` sem registrá-lo (quem chama segura o grafo parado)."""
+        return DistanceField(goal, self.adj, self.cost)
+
+    def release(self, goal: NodeId) -> None:
+        n = self._refs.get(goal, 0) - 1
+        if n > 0:
+            self._refs[goal] = n
+            return
+        self._refs.pop(goal, None)
+        self._fields.pop(goal, None)
+
+    def on_traffic_change(self, cells: Iterable) -> None:
+        """Células cujo custo de entrada mudou: refaz as arestas que chegam nelas."""
+        node_at = self.graph.node_at
+        touched: Set[NodeId] = set()
+        for cell in cells:
+            n = node_at.get(cell)
+            if n is not None:
+                touched.update(self.adj[n])
+        self._repair(touched)
+
+    def on_topology_change(self, version: int, nodes: Set[NodeId]) -> None:
+        self._repair(nodes)
+
+    @property
+    def goals(self) -> int:
+        return len(self._fields)
+
+    def report(self) -> Dict[str, float | int]:
+        return {
+            "goals": self.goals,
+            "agents": sum(self._refs.values()),
+            "builds": self.builds,
+            "build_s": round(self.build_time, 4),
+            "repair_s": round(self.repair_time, 4),
+            "settled": sum(f.settled for f in self._fields.values()),
+        }
+
+    # Algoritmos internos
+    def _repair(self, touched: Set[NodeId]) -> None:
+        if not touched or not self._fields:
+            return
+        t0 = time.perf_counter()
+        for field in self._fields.values():
+            field.repair(touched)
+        self.repair_time += time.perf_counter() - t0
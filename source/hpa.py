@@ -0,0 +1,237 @@
+from __future__ import annotations
+import heapq
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+NodeId   = str
+Coord    = Tuple[int, int]
+Cluster  = Tuple[int, int]  # (linha, coluna) do cluster
+AdjTable = Dict[NodeId, Set[NodeId]]
+PosTable = Dict[NodeId, Coord]
+CostFn   = Callable[[NodeId, NodeId], int]
+
+"""
+Camada hierárquica (HPA*) sobre o grafo em grade.
+
+    • Divide a grade em clusters `k × k`.
+    • Cada aresta que cruza a borda entre clusters vira um par de entradas.
+    • Pré-calcula distâncias entrada→entrada dentro de cada cluster.
+    • Planeja primeiro no grafo abstrato (só entradas) e refina em células
+      apenas os próximos `hops` saltos de cluster.
+
+Mudanças de custo (tráfego) e de topologia (`update_topology`) só sujam os
+clusters afetados, que são recalculados na próxima consulta.
+"""
+class HierarchicalGraph:
+
+    def __init__(
+        self,
+        pos: PosTable,
+        adj: AdjTable,
+        cost_fn: CostFn,
+        cluster_size: int = 4,
+    ) -> None:
+
+        self.pos     = pos
+        self.adj     = adj
+        self.cost_fn = cost_fn
+        self.k       = cluster_size
+
+        # estado interno
+        self._members: Dict[Cluster, Set[NodeId]] = {}
+        self._entrances: Dict[Cluster, Set[NodeId]] = {}
+        self._inter: Dict[NodeId, Set[NodeId]] = {}           # arestas entre clusters
+        self._intra: Dict[Cluster, Dict[NodeId, Dict[NodeId, int]]] = {}
+        self._dirty: Set[Cluster] = set()
+
+        self._build()
+
+    # Interface pública
+    def cluster_of(self, node: NodeId) -> Cluster:
+        r, c = self.pos[node]
+        return r // self.k, c // self.k
+
+    def invalidate(self, cells: Iterable[Coord]) -> None:
+        """Marca como sujos os clusters que contêm `cells` (custo mudou)."""
+        for r, c in cells:
+            cl = (r // self.k, c // self.k)
+            if cl in self._members:
+                self._dirty.add(cl)
+
+    def update_topology(self, nodes: Iterable[NodeId]) -> None:
+        """
+        Arestas de `nodes` mudaram (célula/aresta fechada ou reaberta): refaz
+        as entradas desses nós e suja os clusters deles.
+        """
+        for a in nodes:
+            ca = self.cluster_of(a)
+            cross = {b for b in self.adj[a] if self.cluster_of(b) != ca}
+            if cross:
+                self._inter[a] = cross
+                self._entrances[ca].add(a)
+            else:
+                self._inter.pop(a, None)
+                self._entrances[ca].discard(a)
+            self._dirty.add(ca)
+
+    def plan(self, start: NodeId, goal: NodeId, hops: int = 2) -> List[NodeId] | None:
+        """
+        Rota de `start` até `goal`. Só os primeiros `hops` saltos de cluster
+        vêm refinados em células; o caminho devolvido termina numa entrada
+        (ou no próprio `goal`, se ele estiver ao alcance).
+        """
+        if start == goal:
+            return [start]
+        self._refresh()
+
+        c_start, c_goal = self.cluster_of(start), self.cluster_of(goal)
+
+        # mesmo cluster: tenta a busca local antes de subir de nível
+        if c_start == c_goal:
+            local = self._local_path(start, goal, c_start)
+            if local is not None:
+                return local
+
+        abstract = self._abstract_search(start, goal, c_start, c_goal)
+        if abstract is None:
+            return None
+        return self._refine(abstract, hops)
+
+    # Construção
+    def _build(self) -> None:
+        for nid in self.pos:
+            self._members.setdefault(self.cluster_of(nid), set()).add(nid)
+        for cl in self._members:
+            self._entrances[cl] = set()
+
+        # toda aresta que cruza a borda vira um par de entradas: clusters podem
+        # ser internamente desconexos, então descartar cruzamentos quebraria rotas
+        for a, nbrs in self.adj.items():
+            ca = self.cluster_of(a)
+            for b in nbrs:
+                if self.cluster_of(b) != ca:
+                    self._entrances[ca].add(a)
+                    self._inter.setdefault(a, set()).add(b)
+
+        self._dirty = set(self._members)
+
+    def _refresh(self) -> None:
+        """Recalcula as tabelas entrada→entrada dos clusters sujos."""
+        for cl in self._dirty:
+            table: Dict[NodeId, Dict[NodeId, int]] = {}
+            ents = self._entrances[cl]
+            for e in ents:
+                dist, _ = self._local_search(e, cl)
+                table[e] = {o: dist[o] for o in ents if o != e and o in dist}
+            self._intra[cl] = table
+        self._dirty.clear()
+
+    # Buscas
+    def _local_search(
+        self,
+        src: NodeId,
+        cluster: Cluster,
+        target: NodeId | None = None,
+        reverse: bool = False,
+    ) -> Tuple[Dict[NodeId, int], Dict[NodeId, NodeId]]:
+        """Dijkstra restrito a `cluster` (reverse=True mede custo *até* src)."""
+        members = self._members[cluster]
+        dist: Dict[NodeId, int] = {src: 0}
+        came: Dict[NodeId, NodeId] = {}
+        open_heap: List[Tuple[int, NodeId]] = [(0, src)]
+
+        while open_heap:
+            g, cur = heapq.heappop(open_heap)
+            if g > dist[cur]:
+                continue
+            if cur == target:
+                break
+            for nxt in self.adj[cur]:
+                if nxt not in members:
+                    continue
+                step = self.cost_fn(nxt, cur) if reverse else self.cost_fn(cur, nxt)
+                ng = g + step
+                if nxt not in dist or ng < dist[nxt]:
+                    dist[nxt] = ng
+                    came[nxt] = cur
+                    heapq.heappush(open_heap, (ng, nxt))
+        return dist, came
+
+    def _local_path(self, a: NodeId, b: NodeId, cluster: Cluster) -> List[NodeId] | None:
+        dist, came = self._local_search(a, cluster, target=b)
+        if b not in dist:
+            return None
+        path = [b]
+        while path[-1] != a:
+            path.append(came[path[-1]])
+        path.reverse()
+        return path
+
+    def _abstract_search(
+        self,
+        start: NodeId,
+        goal: NodeId,
+        c_start: Cluster,
+        c_goal: Cluster,
+    ) -> List[NodeId] | None:
+        # conecta start/goal temporariamente às entradas do próprio cluster
+        d_start, _ = self._local_search(start, c_start)
+        d_goal, _  = self._local_search(goal, c_goal, reverse=True)
+        from_start = {e: d_start[e] for e in self._entrances[c_start] if e in d_start}
+        to_goal    = {e: d_goal[e] for e in self._entrances[c_goal] if e in d_goal}
+
+        goal_pos = self.pos[goal]
+
+        def h(n: NodeId) -> int:
+            r, c = self.pos[n]
+            return abs(r - goal_pos[0]) + abs(c - goal_pos[1])
+
+        g: Dict[NodeId, int] = {start: 0}
+        came: Dict[NodeId, NodeId] = {}
+        open_heap: List[Tuple[int, NodeId]] = [(h(start), start)]
+
+        while open_heap:
+            f, cur = heapq.heappop(open_heap)
+            if cur == goal:
+                path = [cur]
+                while cur in came:
+                    cur = came[cur]
+                    path.append(cur)
+                path.reverse()
+                return path
+            if f - h(cur) > g[cur]:
+                continue
+
+            if cur == start:
+                succ = list(from_start.items())
+                succ += [(n, self.cost_fn(cur, n)) for n in self._inter.get(cur, ())]
+            else:
+                succ = list(self._intra[self.cluster_of(cur)].get(cur, {}).items())
+                succ += [(n, self.cost_fn(cur, n)) for n in self._inter.get(cur, ())]
+                if cur in to_goal:
+                    succ.append((goal, to_goal[cur]))
+
+            for nxt, w in succ:
+                tentative = g[cur] + w
+                if nxt not in g or tentative < g[nxt]:
+                    g[nxt] = tentative
+                    came[nxt] = cur
+                    heapq.heappush(open_heap, (tentative + h(nxt), nxt))
+        return None
+
+    def _refine(self, abstract: List[NodeId], hops: int) -> List[NodeId] | None:
+        """Troca os primeiros `hops` saltos de cluster por células."""
+        path = [abstract[0]]
+        crossed = 0
+        for a, b in zip(abstract, abstract[1:]):
+            ca, cb = self.cluster_of(a), self.cluster_of(b)
+            if ca != cb:
+                if crossed >= hops:
+                    break
+                path.append(b)  # aresta entre clusters: vizinhos diretos
+                crossed += 1
+                continue
+            seg = self._local_path(a, b, ca)
+            if seg is None:
+                return None
+            path.extend(seg[1:])
+        return path
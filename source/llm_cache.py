@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Tuple
+from providers import ChatProviderBase
+
+CACHE_DB = Path("source/json/llm_cache.sqlite")
+
+"""
+Cache de respostas em dois níveis.
+    • memória: LRU com até `max_mem` entradas;
+    • disco:   SQLite com até `max_disk` linhas (remove as menos usadas).
+Entradas mais velhas que `ttl` segundos valem como ausentes nos dois níveis.
+"""
+class PromptCache:
+
+    def __init__(
+        self,
+        db_path: str | Path | None = CACHE_DB,  # None = só memória
+        max_mem: int = 4096,
+        max_disk: int = 200_000,
+        ttl: float | None = 7 * 24 * 3600,
+    ) -> None:
+
+        self.max_mem  = max_mem
+        self.max_disk = max_disk
+        self.ttl      = ttl
+
+        # estado interno
+        self._mem: OrderedDict[str, Tuple[str, float]] = OrderedDict()  # key -> (resposta, criado_em)
+        self._lock = threading.Lock()  # ask_async roda o provedor em threads
+        self._puts = 0
+        self._db: sqlite3.Connection | None = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, answer TEXT NOT NULL,"
+                " created REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # Interface pública
+    def get(self, key: str) -> Tuple[str | None, str]:
+        """Devolve (resposta, nível) com nível em {"mem", "disk", "miss"}."""
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                answer, created = hit
+                if not self._expired(created, now):
+                    self._mem.move_to_end(key)
+                    return answer, "mem"
+                del self._mem[key]
+
+            if self._db is None:
+                return None, "miss"
+            row = self._db.execute(
+                "SELECT answer, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                return None, "miss"
+            self._db.execute("UPDATE cache SET used = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            return row[0], "disk"
+
+    def put(self, key: str, answer: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer, now)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, answer, created, used) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now),
+            )
+            self._puts += 1
+            if self._puts % 256 == 0:
+                self._evict_disk(now)
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    # Algoritmos internos
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key: str, answer: str, created: float) -> None:
+        self._mem[key] = (answer, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_mem:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk,),
+        )
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Colapsa espaços para que variações de formatação não mudem a chave."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+# Provedor com cache #
+class CachedProvider(ChatProviderBase):
+    def __init__(self, inner: ChatProviderBase, cache: PromptCache) -> None:
+
+        self.inner = inner
+        self.cache = cache
+        model = getattr(inner, "model_name", None) or getattr(inner, "model", "")
+        self.namespace = f"{type(inner).__name__}|{model}"
+
+        # métricas
+        self.hits_mem = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def ask(self, prompt: str) -> str:
+        key = self._key(prompt)
+        answer = self._lookup(key)
+        if answer is None:
+            answer = self.inner.ask(prompt)
+            self._store(key, answer)
+        return answer
+
+    async def ask_async(self, prompt: str) -> str:
+        key = self._key(prompt)
+        answer = self._lookup(key)
+        if answer is None:
+            answer = await self.inner.ask_async(prompt)
+            self._store(key, answer)
+        return answer
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits_mem + self.hits_disk + self.misses
+        return {
+            "hits_mem": self.hits_mem,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_mem + self.hits_disk) / total if total else 0.0,
+        }
+
+    # util
+    def _key(self, prompt: str) -> str:
+        raw = f"{self.namespace}|{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> str | None:
+        answer, level = self.cache.get(key)
+        if level == "mem":
+            self.hits_mem += 1
+        elif level == "disk":
+            self.hits_disk += 1
+        else:
+            self.misses += 1
+        return answer
+
+    def _store(self, key: str, answer: str) -> None:
+        if answer:  # resposta vazia = falha do provedor; não vale guardar
+            self.cache.put(key, answer)
@@ -1,15 +1,19 @@
+from __future__ import annotations
 import json
+import random
 import time
-import numpy as np
-import cv2
-import json
-from PIL import Image
 from pathlib import Path
-from typing import Sequence
-import rota_mapa as rm
+from typing import TYPE_CHECKING, List, Sequence, Tuple
 from pathfinder import load_graph, a_star, dijkstra
 from control import ControlAgent
 from delivery import DeliveryAgent
+from dynamic_graph import DynamicGraph, permanent_blocks
+from scheduler import EventScheduler
+from traffic import TrafficEngine
+
+# numpy / cv2 / PIL só são importados pelas etapas que processam imagem
+if TYPE_CHECKING:
+    import numpy as np
 
 # Configurações do pipeline
 grid_size = 16
@@ -34,18 +38,35 @@ GOAL_ID  = "2_14"
 # Número de passos na simulação
 ticks = 100
 
-def desenhar_rota(base_img: np.ndarray, coords: Sequence[tuple[int, int]]) -> np.ndarray:
-
+# Processamento em faixas para mapas muito grandes: None = automático (faixas de
+# FAIXA_AUTO linhas acima de PIXELS_SEM_FAIXA pixels), 0 = imagem inteira sempre
+ALTURA_FAIXA: int | None = None
+FAIXA_AUTO       = 1024
+PIXELS_SEM_FAIXA = 4096 * 4096
+LADO_PREVIA      = 2048      # maior lado das imagens desenhadas no modo em faixas
+MASK_NPY      = src_dir / "json/mask.npy"
+RESULTADO_NPY = src_dir / "json/resultado.npy"
+
+def desenhar_rota(
+    base_img: np.ndarray,
+    coords: Sequence[tuple[int, int]] | np.ndarray,
+    grid: int | None = None,
+) -> np.ndarray:
+    import cv2
+    import numpy as np
+
+    grid = grid or grid_size
     img = base_img.copy()
     h, w = img.shape[:2]
-    cell_h = h // grid_size
-    cell_w = w // grid_size
+    cell_h = h // grid
+    cell_w = w // grid
 
-    # Computa centros dos tiles do percurso
-    centers = [
-        (c * cell_w + cell_w // 2, r * cell_h + cell_h // 2)
-        for r, c in coords
-    ]
+    # Computa centros dos tiles do percurso (aceita o array de Trajectory.coords)
+    rc = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    centers = list(zip(
+        (rc[:, 1] * cell_w + cell_w // 2).tolist(),
+        (rc[:, 0] * cell_h + cell_h // 2).tolist(),
+    ))
 
     # Desenha linhas vermelhas conectando o percurso
     for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
@@ -63,53 +84,257 @@ def desenhar_rota(base_img: np.ndarray, coords: Sequence[tuple[int, int]]) -> np
 
 
 
-def main():
+def simular(
+    graph_json: str | Path = GRAPH_JSON,
+    n_ticks: int = ticks,
+    plan_budget: int | None = None,
+    plan_budget_us: float | None = None,
+    start_id: str = START_ID,
+    goal_id: str = GOAL_ID,
+    grid: int | None = None,
+    seed: int | None = None,
+    frota: int = 0,
+) -> Tuple[ControlAgent, List[DeliveryAgent]]:
+    """
+    Etapa 6 isolada: só precisa do grafo em JSON (sem OpenCV/PIL).
+    Com `plan_budget` (expansões) e/ou `plan_budget_us` (µs) os agentes
+    planejam em modo anytime, com orçamento por tick. Sem `seed`, a semente
+    do tráfego sai do `random` global (random.seed continua reproduzindo tudo).
+    `frota` acrescenta vans "flowfield" saindo de ruas sorteadas para o mesmo
+    destino: todas seguem um único campo de distâncias.
+    """
+    print(f"[6/7] Simulando {n_ticks} ticks...")
+
+    # um só grafo para todos; os bloqueios permanentes (do mapa de exemplo) saem da topologia
+    graph = DynamicGraph.from_json(graph_json, closed=permanent_blocks(graph_json))
+    rows, cols = (grid, grid) if grid else _dimensoes(graph)
+    if not (graph.is_open(start_id) and graph.is_open(goal_id)):
+        # grafos gerados (citygen) não têm os IDs do mapa de exemplo
+        start_id, goal_id = _extremos(graph.adj)
+        print(f"→ origem/destino escolhidos automaticamente: {start_id}, {goal_id}")
+
+    # tráfego só nas ruas
+    seed = random.getrandbits(32) if seed is None else seed
+    engine = TrafficEngine.from_roads(graph.is_road, rows, cols, ttl=4, max_alerts=3, seed=seed)
+    ctrl = ControlAgent(rows=rows, cols=cols, traffic_penalty=3, engine=engine)
+
+    orcamento = dict(plan_budget=plan_budget, plan_budget_us=plan_budget_us)
+
+    agent1     = DeliveryAgent("van-01", heuristic="manhattan", start_id=start_id, goal_id=goal_id, graph_json=graph_json, control=ctrl, graph=graph, **orcamento)
+    agent2     = DeliveryAgent("van-02", heuristic="euclidean", start_id=start_id, goal_id=goal_id, graph_json=graph_json, control=ctrl, graph=graph, **orcamento)
+    agent_dijk = DeliveryAgent("van-dijk", strategy="dijkstra", start_id=start_id, goal_id=goal_id, graph_json=graph_json, control=ctrl, graph=graph, **orcamento)
+
+    ctrl.register(agent1)
+    ctrl.register(agent2)
+    ctrl.register(agent_dijk)
+    agents = [agent1, agent2, agent_dijk]
+
+    ruas = sorted(n for n in graph.pos if graph.is_open(n))
+    rng = random.Random(seed)
+    for i in range(frota):
+        van = DeliveryAgent(f"van-ff{i + 1:02d}", rng.choice(ruas), goal_id, graph_json, control=ctrl, graph=graph, strategy="flowfield")
+        ctrl.register(van)
+        agents.append(van)
+    # DEBUG: veja quem está no controle
+    print("Agentes registrados →", [ag.id for ag in ctrl._agents])
+    
+    # mesmo resultado de ctrl.step(), mas quem já chegou sai do loop
+    sched = EventScheduler(ctrl)
+    start = time.perf_counter()
+    duracoes = []
+    for _ in range(n_ticks):
+        t0 = time.perf_counter()
+        sched.step()
+        duracoes.append(time.perf_counter() - t0)
+    print(f"Simulação em {time.perf_counter()-start:.2f}s")
+    if duracoes:
+        print(f"Tick: média {sum(duracoes) / len(duracoes) * 1000:.2f}ms, máx {max(duracoes) * 1000:.2f}ms")
+    if frota:
+        info = ctrl.flow_fields(graph).report()
+        chegaram = sum(ag.pos_id == goal_id for ag in agents[3:])
+        print(
+            f"Flow field: {frota} vans, {info['builds']} busca(s) inicial(is), "
+            f"reparos em {info['repair_s'] * 1000:.1f}ms — {chegaram}/{frota} no destino"
+        )
+    return ctrl, agents
+
+
+def simular_pedidos(
+    graph_json: str | Path = GRAPH_JSON,
+    n_vans: int = 3,
+    n_pedidos: int = 30,
+    n_ticks: int = ticks,
+    seed: int | None = None,
+) -> Tuple[ControlAgent, dict]:
+    """
+    Sorteia `n_pedidos` nós de rua, distribui o lote entre `n_vans` vans
+    (ControlAgent.assign_orders) e simula `n_ticks` ticks.
+    """
+    rng = random.Random(seed)
+    graph = DynamicGraph.from_json(graph_json, closed=permanent_blocks(graph_json))
+    rows, cols = _dimensoes(graph)
+    engine = TrafficEngine.from_roads(graph.is_road, rows, cols, ttl=4, max_alerts=3, seed=seed)
+    ctrl = ControlAgent(rows=rows, cols=cols, traffic_penalty=3, engine=engine)
+    ruas = sorted(n for n in graph.pos if graph.is_open(n))
+
+    for i in range(n_vans):
+        inicio = rng.choice(ruas)
+        ctrl.register(DeliveryAgent(f"van-{i + 1:02d}", inicio, inicio, graph_json, control=ctrl, graph=graph))
+
+    relatorio = ctrl.assign_orders(rng.sample(ruas, min(n_pedidos, len(ruas))))
+    print(
+        f"Atribuição ({relatorio['method']}): {relatorio['assigned']}/{relatorio['orders']} pedidos "
+        f"em {relatorio['seconds'] * 1000:.1f}ms ({relatorio['orders_per_s']:.0f} pedidos/s), "
+        f"comprimento total {relatorio['total_route_len']:.0f}"
+    )
+
+    sched = EventScheduler(ctrl)
+    sched.run(n_ticks)
+    entregues = sum(len(ag.delivered) for ag in ctrl._agents)
+    percorrido = sum(len(ag.history) - 1 for ag in ctrl._agents)
+    print(f"Entregues em {n_ticks} ticks: {entregues}/{relatorio['assigned']} — {percorrido} passos percorridos")
+    print(f"Escalonador: {sched.agent_steps} ações de agente, {sched.skipped} evitadas")
+    return ctrl, relatorio
+
+
+def _dimensoes(graph: DynamicGraph) -> Tuple[int, int]:
+    """Linhas e colunas da grade do grafo (JSON do pipeline ou .npz do citygen)."""
+    rows = 1 + max(r for r, _ in graph.is_road)
+    cols = 1 + max(c for _, c in graph.is_road)
+    return rows, cols
+
+
+def _extremos(adj: dict) -> Tuple[str, str]:
+    """Par de nós bem distantes na maior componente (duas buscas em largura)."""
+    from collections import deque
+
+    def bfs(origem: str) -> dict:
+        dist = {origem: 0}
+        fila = deque([origem])
+        while fila:
+            cur = fila.popleft()
+            for nxt in adj[cur]:
+                if nxt not in dist:
+                    dist[nxt] = dist[cur] + 1
+                    fila.append(nxt)
+        return dist
+
+    vistos: set = set()
+    maior: dict = {}
+    for nid in sorted(adj):
+        if nid not in vistos:
+            comp = bfs(nid)
+            vistos.update(comp)
+            if len(comp) > len(maior):
+                maior = comp
+    if not maior:
+        raise ValueError("Grafo sem ruas")
+    a = max(sorted(maior), key=maior.get)
+    dist_a = bfs(a)
+    b = max(sorted(dist_a), key=dist_a.get)
+    return a, b
+
+
+def executar_pipeline(
+    image_src: str | Path = IMAGE_SRC,
+    out_dir: str | Path = src_dir,
+    grid: int = grid_size,
+    start_id: str | None = START_ID,   # None (ou fora do grafo) = escolhe automaticamente
+    goal_id: str | None = GOAL_ID,
+    n_ticks: int = ticks,
+    altura_faixa: int | None = ALTURA_FAIXA,
+    registrar: bool = True,            # grava a execução em metrics_store
+    origem: str = "main",
+    plan_budget: int | None = None,
+    plan_budget_us: float | None = None,
+) -> dict:
+    """
+    Pipeline completo de um mapa, com todas as saídas em `out_dir`
+    (imgs/, imgs/rotas/, json/). Devolve um resumo da execução.
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image
+    import rota_mapa as rm
+
+    t_inicio = time.perf_counter()
+    out_dir = Path(out_dir)
+    (out_dir / "imgs/rotas").mkdir(parents=True, exist_ok=True)
+    (out_dir / "json").mkdir(parents=True, exist_ok=True)
+    image_lines     = out_dir / "imgs/1_image_linhas.png"
+    grid_img        = out_dir / "imgs/2_image_grid.png"
+    grid_labels_img = out_dir / "imgs/3_image_grid_labels.png"
+    graph_json      = out_dir / "json/image_graph.json"
+    route_man_png   = out_dir / "imgs/rotas/1_image_route_manhattan.png"
+    route_euc_png   = out_dir / "imgs/rotas/2_image_route_euclid.png"
+    route_dij_png   = out_dir / "imgs/rotas/3_image_route_dijk.png"
+
     # 1) Remoção de fundo e máscara
     print("[1/7] Removendo fundo...")
-    resultado, mask = rm.remover_fundo(str(IMAGE_SRC))
-    cv2.imwrite(str(IMAGE_LINES), resultado)
-    print(f"→ {IMAGE_LINES}")
+    if altura_faixa is None:
+        h, w = rm.dimensoes(image_src)
+        altura_faixa = FAIXA_AUTO if h * w > PIXELS_SEM_FAIXA else 0
+    if altura_faixa:
+        # resultado/máscara em resolução cheia ficam só nos .npy; as imagens
+        # (linhas, grid, labels, rotas) são desenhadas numa prévia reduzida
+        resultado_npy = out_dir / "json/resultado.npy"
+        resultado, mask = rm.remover_fundo_em_faixas(
+            image_src, out_dir / "json/mask.npy", resultado_npy,
+            altura_faixa=altura_faixa,
+        )
+        resultado = rm.previa(resultado, LADO_PREVIA, altura_faixa)
+        print(f"→ {resultado_npy} (resolução cheia; imagens em prévia {resultado.shape[1]}×{resultado.shape[0]})")
+        mask_grid = resultado          # aplicar_grid só usa o formato da máscara
+    else:
+        resultado, mask = rm.remover_fundo(str(image_src))
+        mask_grid = mask
+    cv2.imwrite(str(image_lines), resultado)
+    print(f"→ {image_lines}")
 
     # 2) Grid
     print("[2/7] Aplicando grid...")
-    img_grid = rm.aplicar_grid(resultado, mask, linhas=grid_size, colunas=grid_size)
+    img_grid = rm.aplicar_grid(resultado, mask_grid, linhas=grid, colunas=grid)
     if isinstance(img_grid, np.ndarray):
-        cv2.imwrite(str(GRID_IMG), img_grid)
+        cv2.imwrite(str(grid_img), img_grid)
     else:
-        Image.fromarray(img_grid).save(str(GRID_IMG))
-    print(f"→ {GRID_IMG}")
+        Image.fromarray(img_grid).save(str(grid_img))
+    print(f"→ {grid_img}")
 
     # 3) Labels
     print("[3/7] Anotando tiles...")
-    img_labels = rm.anotar_tiles(img_grid, linhas=grid_size, colunas=grid_size)
+    img_labels = rm.anotar_tiles(img_grid, linhas=grid, colunas=grid)
     if isinstance(img_labels, np.ndarray):
-        cv2.imwrite(str(GRID_LABELS_IMG), img_labels)
+        cv2.imwrite(str(grid_labels_img), img_labels)
     else:
-        img_labels.save(str(GRID_LABELS_IMG))
-    print(f"→ {GRID_LABELS_IMG}")
+        img_labels.save(str(grid_labels_img))
+    print(f"→ {grid_labels_img}")
 
     # 4) Grafo
     print("[4/7] Construindo grafo...")
-    grafo = rm.construir_grafo(mask, linhas=grid_size, colunas=grid_size)
-    GRAPH_JSON.write_text(json.dumps(grafo, indent=2), encoding="utf-8")
-    print(f"→ {GRAPH_JSON}")
+    grafo = rm.construir_grafo(mask, linhas=grid, colunas=grid)
+    graph_json.write_text(json.dumps(grafo, indent=2), encoding="utf-8")
+    print(f"→ {graph_json}")
 
     # 5) A*
-    print(f"[5/7] A* {START_ID}→{GOAL_ID}...")
-    positions, adj, is_road = load_graph(GRAPH_JSON)
+    positions, adj, is_road = load_graph(graph_json)
+    if start_id not in positions or goal_id not in positions:
+        livre = DynamicGraph(positions, {n: set(v) for n, v in adj.items()}, closed=permanent_blocks(graph_json))
+        start_id, goal_id = _extremos(livre.adj)
+        print(f"→ origem/destino escolhidos automaticamente: {start_id}, {goal_id}")
+    print(f"[5/7] A* {start_id}→{goal_id}...")
 
     # 5a) Rota Manhattan (como antes)
-    path_ids_man = a_star(START_ID, GOAL_ID, positions, adj, heuristic="manhattan")
+    path_ids_man = a_star(start_id, goal_id, positions, adj, heuristic="manhattan")
 
     # 5b) Rota Euclidiana
-    path_ids_euc = a_star(START_ID, GOAL_ID, positions, adj, heuristic="euclidean")
+    path_ids_euc = a_star(start_id, goal_id, positions, adj, heuristic="euclidean")
 
     # 5c) Dijkstra
-    path_ids_dij = dijkstra(START_ID, GOAL_ID, adj)
+    path_ids_dij = dijkstra(start_id, goal_id, adj)
 
 
     if path_ids_man is None or path_ids_euc is None or path_ids_dij is None:
-        raise SystemExit("X Sem rota viável")
+        raise ValueError("X Sem rota viável")
 
 
     # Converte IDs "r_c" → (r, c)
@@ -120,49 +345,34 @@ def main():
 
 
     # 6) Simulação (histórico opcional)
-    print(f"[6/7] Simulando {ticks} ticks...")
-    ctrl = ControlAgent(rows=grid_size, cols=grid_size, ttl_alert=4, max_alerts=3, traffic_penalty=3)
-
-    PERM_BLOCKS = {(13, 2), (8, 3), (7, 3)}
-
-    agent1     = DeliveryAgent("van-01", heuristic="manhattan", start_id=START_ID, goal_id=GOAL_ID, graph_json=GRAPH_JSON, control=ctrl, permanent_blocks=PERM_BLOCKS)
-    agent2     = DeliveryAgent("van-02", heuristic="euclidean", start_id=START_ID, goal_id=GOAL_ID, graph_json=GRAPH_JSON, control=ctrl, permanent_blocks=PERM_BLOCKS)
-    agent_dijk = DeliveryAgent("van-dijk", strategy="dijkstra", start_id=START_ID, goal_id=GOAL_ID, graph_json=GRAPH_JSON, control=ctrl, permanent_blocks=PERM_BLOCKS)
-
-    ctrl.register(agent1)
-    ctrl.register(agent2)
-    ctrl.register(agent_dijk)
-
-
-    # DEBUG: veja quem está no controle
-    print("Agentes registrados →", [ag.id for ag in ctrl._agents])
-    
     start = time.perf_counter()
-    for _ in range(ticks): ctrl.step()
-    print(f"Simulação em {time.perf_counter()-start:.2f}s")
+    _ctrl, (agent1, agent2, agent_dijk) = simular(
+        graph_json, n_ticks, plan_budget=plan_budget, plan_budget_us=plan_budget_us,
+        start_id=start_id, goal_id=goal_id, grid=grid,
+    )
 
     
 
     # 7) Rotas
     print("[7/7] Desenhando rota...")
-    base = cv2.imread(str(GRID_IMG))
+    base = cv2.imread(str(grid_img))
     # — Manhattan em vermelho (default)
-    img_route_man = desenhar_rota(base, path_coords_man)# type: ignore
-    cv2.imwrite(str(ROUTE_IMG), img_route_man)
+    img_route_man = desenhar_rota(base, path_coords_man, grid)# type: ignore
+    cv2.imwrite(str(route_man_png), img_route_man)
 
     # 7.5) Desenha o caminho real que cada agente percorreu (histórico)
-    coords_man = [tuple(map(int, nid.split("_"))) for nid in agent1.history]
-    coords_euc = [tuple(map(int, nid.split("_"))) for nid in agent2.history]
-    coords_dij = [tuple(map(int, nid.split("_"))) for nid in agent_dijk.history]
+    coords_man = agent1.history.coords()
+    coords_euc = agent2.history.coords()
+    coords_dij = agent_dijk.history.coords()
 
-    img_hist_man = desenhar_rota(base, coords_man)
-    cv2.imwrite(str(src_dir / "imgs/rotas/4_rota_real_manhattan.png"), img_hist_man)
+    img_hist_man = desenhar_rota(base, coords_man, grid)
+    cv2.imwrite(str(out_dir / "imgs/rotas/4_rota_real_manhattan.png"), img_hist_man)
 
-    img_hist_euc = desenhar_rota(base, coords_euc)
-    cv2.imwrite(str(src_dir / "imgs/rotas/5_rota_real_euclidiana.png"), img_hist_euc)
+    img_hist_euc = desenhar_rota(base, coords_euc, grid)
+    cv2.imwrite(str(out_dir / "imgs/rotas/5_rota_real_euclidiana.png"), img_hist_euc)
 
-    img_hist_dij = desenhar_rota(base, coords_dij)
-    cv2.imwrite(str(src_dir / "imgs/rotas/6_rota_real_dijkstra.png"), img_hist_dij)
+    img_hist_dij = desenhar_rota(base, coords_dij, grid)
+    cv2.imwrite(str(out_dir / "imgs/rotas/6_rota_real_dijkstra.png"), img_hist_dij)
 
     print("-> rota_real_manhattan.png, rota_real_euclidiana.png, rota_real_dijkstra.png geradas")
 
@@ -172,7 +382,7 @@ def main():
         azul = (255, 0, 0)
         img = img_base.copy()
         h, w = img.shape[:2]
-        cell_h, cell_w = h // grid_size, w // grid_size
+        cell_h, cell_w = h // grid, w // grid
         centers = [(c*cell_w+cell_w//2, r*cell_h+cell_h//2) for r, c in coords]
         for p, q in zip(centers, centers[1:]):
             cv2.line(img, p, q, azul, 2)
@@ -183,7 +393,7 @@ def main():
     def desenhar_rota_cor(img_base, coords, cor_bgr):
         img = img_base.copy()
         h, w = img.shape[:2]
-        cell_h, cell_w = h // grid_size, w // grid_size
+        cell_h, cell_w = h // grid, w // grid
         centers = [(c*cell_w+cell_w//2, r*cell_h+cell_h//2) for r, c in coords]
         for p, q in zip(centers, centers[1:]):
             cv2.line(img, p, q, cor_bgr, 2)
@@ -192,14 +402,14 @@ def main():
         return img
     
     img_route_euc = desenhar_rota_azul(base, path_coords_euc)
-    cv2.imwrite(str(IMG_ROUTE_EUC), img_route_euc)
+    cv2.imwrite(str(route_euc_png), img_route_euc)
 
     img_route_dij = desenhar_rota_cor(base, path_coords_dij, (255,255,0))     # ciano
-    cv2.imwrite(str(IMG_ROUTE_DIJ), img_route_dij)
+    cv2.imwrite(str(route_dij_png), img_route_dij)
 
-    print(f"-> {ROUTE_IMG}  (Manhattan)")
-    print(f"-> {IMG_ROUTE_EUC} (Euclidiana)")
-    print(f"-> {IMG_ROUTE_DIJ} (Dijkstra)")
+    print(f"-> {route_man_png}  (Manhattan)")
+    print(f"-> {route_euc_png} (Euclidiana)")
+    print(f"-> {route_dij_png} (Dijkstra)")
 
 
     # 8) Mostrar histórico de cada tick lado a lado
@@ -207,12 +417,13 @@ def main():
     print("-------+---------------+---------------+--------------")
 
     # o primeiro elemento de history é o start_id (tick 0)
-    max_ticks = max(len(a.history) for a in (agent1, agent2, agent_dijk))
+    hist_man, hist_euc, hist_dij = (a.history.nodes() for a in (agent1, agent2, agent_dijk))
+    max_ticks = max(len(h) for h in (hist_man, hist_euc, hist_dij))
 
     for t in range(max_ticks):
-        m = agent1.history[t] if t < len(agent1.history) else "–"
-        e = agent2.history[t] if t < len(agent2.history) else "–"
-        d = agent_dijk.history[t] if t < len(agent_dijk.history) else "–"
+        m = hist_man[t] if t < len(hist_man) else "–"
+        e = hist_euc[t] if t < len(hist_euc) else "–"
+        d = hist_dij[t] if t < len(hist_dij) else "–"
         print(f"{t:4d} | {m:^13} | {e:^13} | {d:^13}")
 
 
@@ -226,6 +437,11 @@ def main():
             "planned_path_len":  len(planned),
             "actual_steps":      len(ag.history)-1,
             "history_len":       len(ag.history),
+            "history_bytes":     ag.history.nbytes,
+            "suboptimality_bound": ag.bound if ag.bound != float("inf") else None,   # None = desconhecido
+            "plan_expansions":   ag.plan_expansions,
+            "budget_use":        ag.budget_use / ag.budget_ticks if ag.budget_ticks else None,
+            "budget_exhausted_ticks": ag.budget_exhausted,
         }
 
     coletar(agent1,     "manhattan", path_coords_man)
@@ -233,19 +449,25 @@ def main():
     coletar(agent_dijk, "dijkstra",  path_coords_dij)
 
     metrics["simulation"] = {
-        "ticks": ticks,
+        "ticks": n_ticks,
         "duration_s": round(simulation_time, 4),
     }
 
     # gravação
-    with open(src_dir/"json/metrics.json", "w", encoding="utf-8") as f:
+    with open(out_dir/"json/metrics.json", "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=2)
 
-    print(f"[9/9] Métricas salvas em {src_dir/'json/metrics.json'}")
+    print(f"[9/9] Métricas salvas em {out_dir/'json/metrics.json'}")
+
+    # histórico de execuções (para comparar entre commits)
+    if registrar:
+        import metrics_store
+        run_id = metrics_store.record_run(metrics, grid_size=grid, ticks=n_ticks, source=origem)
+        print(f"→ execução #{run_id} registrada em {metrics_store.STORE_DB}")
 
 
     # 8.5) Exporta ticks + rotas em JSON
-    json_dir = src_dir / "json"
+    json_dir = out_dir / "json"
     json_dir.mkdir(parents=True, exist_ok=True)
 
     # tabela de ticks
@@ -253,9 +475,9 @@ def main():
     for t in range(max_ticks):
         ticks_out.append({
             "tick": t,
-            "manhattan": agent1.history[t] if t < len(agent1.history) else None,
-            "euclidean": agent2.history[t] if t < len(agent2.history) else None,
-            "dijkstra":  agent_dijk.history[t] if t < len(agent_dijk.history) else None,
+            "manhattan": hist_man[t] if t < len(hist_man) else None,
+            "euclidean": hist_euc[t] if t < len(hist_euc) else None,
+            "dijkstra":  hist_dij[t] if t < len(hist_dij) else None,
         })
 
     # percursos planejados completos (IDs “r_c”)
@@ -276,6 +498,29 @@ def main():
 
     print(f"✔  Ticks + rotas exportados em {ticks_file}")
 
+    return {
+        "image": str(image_src),
+        "out_dir": str(out_dir),
+        "grid": grid,
+        "nodes": len(positions),
+        "edges": sum(len(v) for v in adj.values()) // 2,
+        "start": start_id,
+        "goal": goal_id,
+        "route_len": {n: len(p) for n, p in routes_out.items()},
+        "arrived": {
+            n: ag.pos_id == goal_id
+            for n, ag in (("manhattan", agent1), ("euclidean", agent2), ("dijkstra", agent_dijk))
+        },
+        "seconds": round(time.perf_counter() - t_inicio, 4),
+    }
+
+
+def main():
+    try:
+        executar_pipeline()
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
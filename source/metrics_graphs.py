@@ -1,14 +1,10 @@
 import json
-import matplotlib.pyplot as plt
 from pathlib import Path
 
 
 SRC          = Path("source/json/metrics.json")   # ajuste se necessário
 OUT_DIR      = Path("source/imgs/metrics")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-data         = json.loads(SRC.read_text(encoding="utf-8"))
-algs         = ["manhattan", "euclidean", "dijkstra"]
 metrics      = [
     "initial_plan_time_s",
     "total_plan_time_s",
@@ -16,14 +12,59 @@ metrics      = [
     "planned_path_len",
     "actual_steps"
 ]
+TREND_METRIC = "total_plan_time_s"   # regressões de tempo de planejamento
 
-for m in metrics:
-    vals = [data[a][m] for a in algs]
-    plt.figure()
-    plt.bar(algs, vals)
-    plt.ylabel(m)
-    plt.title(m.replace("_", " ").title())
-    plt.tight_layout()
-    plt.savefig(OUT_DIR / f"{m}.png", dpi=120)
-    plt.close()
-print(f"Gráficos salvos em {OUT_DIR}")
+
+def main() -> None:
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import metrics_store as ms
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    cols = ms.load_columns(metrics)
+    if cols["value"].size == 0 and SRC.exists():
+        # histórico vazio: importa a execução única do metrics.json
+        data = json.loads(SRC.read_text(encoding="utf-8"))
+        sim = data.get("simulation", {})
+        ms.record_run(data, grid_size=0, ticks=sim.get("ticks", 0), source=str(SRC))
+        cols = ms.load_columns(metrics)
+    if cols["value"].size == 0:
+        raise SystemExit(f"Sem execuções em {ms.STORE_DB} nem em {SRC}")
+
+    # uma passada: mediana e p10/p90 de todas as métricas × estratégias
+    agg = ms.aggregate(cols, by=("metric", "strategy"), stats=("median", "p10", "p90"))
+    tr  = ms.trend(cols, TREND_METRIC)
+    n_runs = np.unique(cols["run_id"]).size
+
+    fig, axes = plt.subplots(2, 3, figsize=(15, 8))
+    for ax, m in zip(axes.flat, metrics):
+        sel = agg["metric"] == m
+        algs = agg["strategy"][sel]
+        med  = agg["median"][sel]
+        err  = np.vstack([med - agg["p10"][sel], agg["p90"][sel] - med])
+        ax.bar(algs, med, yerr=err if n_runs > 1 else None, capsize=4)
+        ax.set_ylabel(m)
+        ax.set_title(m.replace("_", " ").title())
+
+    # tendência por execução (mediana por estratégia)
+    ax = axes.flat[len(metrics)]
+    for alg in np.unique(tr["strategy"]):
+        sel = tr["strategy"] == alg
+        x, y = tr["run_id"][sel], tr["median"][sel]
+        order = np.argsort(x)
+        ax.plot(x[order], y[order], marker="o", label=alg)
+    ax.set_xlabel("run_id")
+    ax.set_ylabel(TREND_METRIC)
+    ax.set_title("Tendência: " + TREND_METRIC.replace("_", " "))
+    ax.legend()
+
+    fig.suptitle(f"{n_runs} execução(ões) — barras = mediana, erro = p10–p90")
+    fig.tight_layout()
+    fig.savefig(OUT_DIR / "metrics.png", dpi=120)
+    plt.close(fig)
+    print(f"Gráficos salvos em {OUT_DIR / 'metrics.png'}")
+
+
+if __name__ == "__main__":
+    main()
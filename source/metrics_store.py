@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import sqlite3
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+STORE_DB = Path("source/json/metrics_runs.sqlite")
+
+# Estatísticas aceitas por `aggregate`: nome -> percentil (None = média)
+STATS: Dict[str, float | None] = {
+    "min": 0.0, "p10": 10.0, "p25": 25.0, "median": 50.0,
+    "p75": 75.0, "p90": 90.0, "p99": 99.0, "max": 100.0, "mean": None,
+}
+
+"""
+Histórico de execuções (append-only) em SQLite.
+
+    runs    : uma linha por execução (quando, commit, grid, ticks, origem)
+    results : formato longo (run_id, strategy, metric, value)
+
+Nada é atualizado nem apagado; cada `record_run` só acrescenta linhas.
+"""
+
+
+def _connect(db_path: str | Path) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path))
+    con.executescript(
+        "CREATE TABLE IF NOT EXISTS runs ("
+        " run_id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL,"
+        " git_commit TEXT, grid_size INTEGER, ticks INTEGER, source TEXT);"
+        "CREATE TABLE IF NOT EXISTS results ("
+        " run_id INTEGER NOT NULL REFERENCES runs(run_id),"
+        " strategy TEXT NOT NULL, metric TEXT NOT NULL, value REAL);"
+        "CREATE INDEX IF NOT EXISTS results_metric ON results(metric, strategy);"
+    )
+    return con
+
+
+def current_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def record_run(
+    metrics: Dict[str, Dict[str, float]],
+    grid_size: int,
+    ticks: int,
+    commit: str | None = None,
+    source: str = "main",
+    db_path: str | Path = STORE_DB,
+) -> int:
+    """Acrescenta uma execução (formato de `metrics.json`); devolve o run_id."""
+    rows = [
+        (strategy, metric, float(value))
+        for strategy, values in metrics.items()
+        for metric, value in values.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    con = _connect(db_path)
+    with con:
+        cur = con.execute(
+            "INSERT INTO runs (ts, git_commit, grid_size, ticks, source) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), commit or current_commit(), grid_size, ticks, source),
+        )
+        run_id = cur.lastrowid
+        con.executemany(
+            "INSERT INTO results (run_id, strategy, metric, value) VALUES (?, ?, ?, ?)",
+            [(run_id, *r) for r in rows],
+        )
+    con.close()
+    return run_id
+
+
+def load_columns(
+    metrics: Iterable[str] | None = None,
+    db_path: str | Path = STORE_DB,
+) -> Dict[str, np.ndarray]:
+    """Todas as linhas (opcionalmente só de `metrics`) como colunas NumPy."""
+    sql = (
+        "SELECT r.run_id, r.ts, COALESCE(r.git_commit, ''), COALESCE(r.grid_size, 0),"
+        " x.strategy, x.metric, x.value"
+        " FROM results x JOIN runs r USING (run_id)"
+    )
+    params: list = []
+    if metrics is not None:
+        metrics = list(metrics)
+        sql += f" WHERE x.metric IN ({','.join('?' * len(metrics))})"
+        params = metrics
+    con = _connect(db_path)
+    rows = con.execute(sql + " ORDER BY r.run_id", params).fetchall()
+    con.close()
+
+    names = ("run_id", "ts", "commit", "grid_size", "strategy", "metric", "value")
+    if not rows:
+        return {n: np.array([]) for n in names}
+    cols = list(zip(*rows))
+    return {
+        "run_id":    np.asarray(cols[0], dtype=np.int64),
+        "ts":        np.asarray(cols[1], dtype=np.float64),
+        "commit":    np.asarray(cols[2], dtype=str),
+        "grid_size": np.asarray(cols[3], dtype=np.int64),
+        "strategy":  np.asarray(cols[4], dtype=str),
+        "metric":    np.asarray(cols[5], dtype=str),
+        "value":     np.asarray(cols[6], dtype=np.float64),
+    }
+
+
+def aggregate(
+    cols: Dict[str, np.ndarray],
+    by: Sequence[str] = ("metric", "strategy"),
+    stats: Sequence[str] = ("median", "p10", "p90"),
+) -> Dict[str, np.ndarray]:
+    """
+    Agrega `value` por grupo numa só passada vetorizada: ordena por
+    (grupo, valor) e interpola os percentis de todos os grupos de uma vez.
+    Devolve as colunas-chave de `by`, "count" e uma coluna por estatística.
+    """
+    values = cols["value"]
+    if values.size == 0:
+        return {**{k: np.array([]) for k in by}, "count": np.array([]),
+                **{s: np.array([]) for s in stats}}
+
+    # id de grupo a partir das colunas-chave
+    keys = np.stack([cols[k].astype(str) for k in by], axis=1)
+    uniq, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.ravel()
+
+    order  = np.lexsort((values, group))
+    sorted_vals = values[order]
+    counts = np.bincount(group, minlength=len(uniq))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    out: Dict[str, np.ndarray] = {k: uniq[:, i] for i, k in enumerate(by)}
+    out["count"] = counts
+    for name in stats:
+        q = STATS[name]
+        if q is None:
+            out[name] = np.bincount(group, weights=values) / counts
+            continue
+        # percentil linear (mesmo critério de np.percentile) por grupo
+        pos  = starts + (counts - 1) * (q / 100.0)
+        lo   = np.floor(pos).astype(np.int64)
+        hi   = np.minimum(lo + 1, starts + counts - 1)
+        frac = pos - lo
+        out[name] = sorted_vals[lo] * (1 - frac) + sorted_vals[hi] * frac
+    return out
+
+
+def trend(
+    cols: Dict[str, np.ndarray],
+    metric: str,
+    by: str = "run_id",
+) -> Dict[str, np.ndarray]:
+    """Mediana de `metric` por estratégia ao longo das execuções (ou commits)."""
+    mask = cols["metric"] == metric
+    sub = {k: v[mask] for k, v in cols.items()}
+    agg = aggregate(sub, by=("strategy", by), stats=("median",))
+    if by in ("run_id", "ts", "grid_size") and agg[by].size:
+        agg[by] = agg[by].astype(np.float64)
+    return agg
@@ -2,7 +2,6 @@ from __future__ import annotations
 import json
 import heapq
 import math
-import cv2
 from pathlib import Path
 from typing import Dict, List, Set, Tuple, Callable
 
@@ -12,8 +11,10 @@ NodeId   = str
 AdjTable = Dict[NodeId, Set[NodeId]]
 PosTable = Dict[NodeId, Coord]
 
-def load_graph(json_path: str | Path) -> Tuple[PosTable, AdjTable]:
-    # Lê o arquivo JSON gerado pelo seu pipeline e devolve:
+def load_graph(json_path: str | Path) -> Tuple[PosTable, AdjTable, Dict[Coord, bool]]:
+    # Lê o arquivo JSON gerado pelo seu pipeline (ou o .npz do citygen) e devolve:
+    if Path(json_path).suffix == ".npz":
+        return _load_npz(json_path)
     data = json.loads(Path(json_path).read_text(encoding="utf-8"))
 
     # Tabela de posições (somente ruas)
@@ -36,6 +37,51 @@ def load_graph(json_path: str | Path) -> Tuple[PosTable, AdjTable]:
     return positions, adj, is_road
 
 
+"""
+Formato binário (.npz) para grafos em grade grandes: três arrays (rows, cols)
+de bool — `road` (célula é rua), `right` (aresta para (r, c+1)) e `down`
+(aresta para (r+1, c)). Mesmas posições e arestas do JSON equivalente; em
+`is_road` só entram as ruas (ausente = não é rua).
+"""
+def _load_npz(npz_path: str | Path) -> Tuple[PosTable, AdjTable, Dict[Coord, bool]]:
+    import gc
+    import numpy as np
+
+    with np.load(npz_path) as z:
+        road, right, down = z["road"].astype(bool), z["right"].astype(bool), z["down"].astype(bool)
+    rows, cols = road.shape
+    right[:, -1] = False
+    down[-1, :] = False
+
+    # milhões de objetos pequenos: o coletor de ciclos só atrasaria
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        rr, cc = np.nonzero(road)
+        coords = list(zip(rr.tolist(), cc.tolist()))
+        ids = [f"{r}_{c}" for r, c in coords]
+        positions: PosTable = dict(zip(ids, coords))
+        adj: AdjTable = {nid: set() for nid in ids}
+
+        # índice achatado -> posição em `ids`
+        idx = np.full(rows * cols, -1, dtype=np.int64)
+        idx[rr * cols + cc] = np.arange(len(ids))
+        flat = road.ravel()
+        for mask, step in ((right & road, 1), (down & road, cols)):
+            a = np.flatnonzero(mask)
+            b = a + step
+            ok = flat[b]
+            for i, j in zip(idx[a[ok]].tolist(), idx[b[ok]].tolist()):
+                adj[ids[i]].add(ids[j])
+                adj[ids[j]].add(ids[i])
+
+        is_road = dict.fromkeys(coords, True)
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return positions, adj, is_road
+
+
 # A* (grade – custo uniforme 1 por passo)
 def manhattan(a: Coord, b: Coord) -> int:
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
@@ -147,6 +193,38 @@ def dijkstra(
     return None
 
 
+# Dijkstra um-para-muitos: distâncias a partir de `start` (para quando
+# todos os `targets` forem fixados, se dados). `weights[a][b]`, se dado,
+# substitui `cost_fn` (custos já calculados para várias buscas no mesmo grafo).
+def dijkstra_all(
+        start: NodeId,
+        adj: AdjTable,
+        cost_fn: Callable[[NodeId, NodeId], int] = lambda _a, _b: 1,
+        targets: Set[NodeId] | None = None,
+        weights: Dict[NodeId, Dict[NodeId, int]] | None = None,
+    ) -> Dict[NodeId, int]:
+
+    dist: Dict[NodeId, int] = {start: 0}
+    open_heap: List[Tuple[int, NodeId]] = [(0, start)]
+    faltam = set(targets) if targets is not None else None
+
+    while open_heap:
+        g, cur = heapq.heappop(open_heap)
+        if g > dist[cur]:
+            continue
+        if faltam is not None:
+            faltam.discard(cur)
+            if not faltam:
+                break
+        w = weights[cur] if weights is not None else None
+        for nxt in adj[cur]:
+            ng = g + (w[nxt] if w is not None else cost_fn(cur, nxt))
+            if ng < dist.get(nxt, math.inf):
+                dist[nxt] = ng
+                heapq.heappush(open_heap, (ng, nxt))
+    return dist
+
+
     """
     Desenha a rota (lista de NodeIds) por cima da imagem de grade gerada
     anteriormente e salva em `out_path`.
@@ -158,6 +236,8 @@ def draw_path_on_grid(
         out_path: str | Path
     ):
 
+    import cv2  # só quem desenha paga o import do OpenCV
+
     img = cv2.imread(str(img_path))
     if img is None:
         raise FileNotFoundError(img_path)
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Collection, Deque, Dict, List, Tuple
+from providers import ChatProviderBase, GroqProvider, _env, resposta_gulosa
+
+# Limites dos baldes do histograma de latência (ms)
+HIST_BOUNDS_MS = [50, 100, 200, 400, 800, 1600, 3200, 6400]
+
+
+# Balde de fichas (limite de requisições por chave) #
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate     = rate        # fichas repostas por segundo
+        self.capacity = capacity    # rajada máxima
+        self.tokens   = capacity
+        self.used     = 0           # fichas consumidas desde o início
+        self._stamp   = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def try_acquire(self, n: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            self.used += n
+            return True
+
+    def wait_time(self, n: float = 1.0) -> float:
+        """Segundos até haver `n` fichas."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (n - self.tokens) / self.rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+
+# Histograma + janela de amostras para percentis #
+class LatencyStats:
+
+    def __init__(self, window: int = 256) -> None:
+        self.counts = [0] * (len(HIST_BOUNDS_MS) + 1)
+        self._window: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(HIST_BOUNDS_MS, ms)] += 1
+            self._window.append(seconds)
+
+    @property
+    def samples(self) -> int:
+        return len(self._window)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            if not self._window:
+                return None
+            ordered = sorted(self._window)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def histogram(self) -> Dict[str, int]:
+        labels = [f"<{b}ms" for b in HIST_BOUNDS_MS] + [f">={HIST_BOUNDS_MS[-1]}ms"]
+        return dict(zip(labels, self.counts))
+
+
+class PoolMember:
+
+    def __init__(self, name: str, provider: ChatProviderBase, bucket: TokenBucket) -> None:
+        self.name     = name
+        self.provider = provider
+        self.bucket   = bucket
+        self.latency  = LatencyStats()
+
+        # métricas
+        self.requests = 0
+        self.errors   = 0
+        self.wins     = 0   # respostas que foram de fato usadas
+
+
+"""
+Pool de provedores (chaves/modelos) atrás de uma interface única.
+
+    • Cada membro tem seu balde de fichas; o pedido vai para o membro com
+      ficha disponível, em rodízio.
+    • Hedge: se a resposta não chega até o percentil `hedge_percentile` da
+      latência observada daquele membro, dispara o mesmo prompt em outro
+      membro e fica com a primeira resposta.
+    • Se todos os pedidos em voo falham, tenta o próximo membro ainda não
+      usado nesse prompt; só propaga o erro quando não sobra nenhum.
+"""
+class ProviderPool(ChatProviderBase):
+
+    def __init__(
+        self,
+        members: List[PoolMember],
+        hedge_percentile: float = 0.9,
+        hedge_min_samples: int = 8,       # antes disso usa `hedge_default`
+        hedge_default: float | None = None,
+        max_workers: int = 16,
+    ) -> None:
+
+        if not members:
+            raise ValueError("ProviderPool precisa de ao menos um membro")
+        self.members = members
+        self.hedge_percentile  = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default     = hedge_default
+        self.model = "+".join(m.name for m in members)
+
+        # estado interno
+        self._next  = 0
+        self._lock  = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.hedges = 0
+
+    # Interface pública
+    def ask(self, prompt: str) -> str:
+        first = self._acquire()
+        tried = [first]
+        running = {self._executor.submit(self._call, first, prompt): first}
+
+        delay = self._hedge_delay(first)
+        if delay is not None:
+            done, _ = wait(running, timeout=delay)
+            if not done:
+                second = self._acquire(exclude=tried, block=False)
+                if second is not None:
+                    self.hedges += 1
+                    tried.append(second)
+                    running[self._executor.submit(self._call, second, prompt)] = second
+
+        error: Exception | None = None
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in done:
+                member = running.pop(f)
+                try:
+                    answer = f.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                member.wins += 1
+                return answer
+            if not running and len(tried) < len(self.members):
+                nxt = self._acquire(exclude=tried)
+                tried.append(nxt)
+                running[self._executor.submit(self._call, nxt, prompt)] = nxt
+        raise error  # type: ignore[misc]
+
+    async def ask_async(self, prompt: str) -> str:
+        first = await self._acquire_async()
+        tried = [first]
+        running = {asyncio.ensure_future(self._call_async(first, prompt)): first}
+
+        delay = self._hedge_delay(first)
+        if delay is not None:
+            done, _ = await asyncio.wait(running, timeout=delay)
+            if not done:
+                second = self._acquire(exclude=tried, block=False)
+                if second is not None:
+                    self.hedges += 1
+                    tried.append(second)
+                    running[asyncio.ensure_future(self._call_async(second, prompt))] = second
+
+        error: Exception | None = None
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    member = running.pop(t)
+                    if t.exception() is not None:
+                        error = t.exception()
+                        continue
+                    member.wins += 1
+                    return t.result()
+                if not running and len(tried) < len(self.members):
+                    nxt = await self._acquire_async(exclude=tried)
+                    tried.append(nxt)
+                    running[asyncio.ensure_future(self._call_async(nxt, prompt))] = nxt
+        finally:
+            for t in running:  # a requisição perdedora não precisa terminar
+                t.cancel()
+        raise error  # type: ignore[misc]
+
+    def stats(self) -> Dict[str, Dict]:
+        out = {}
+        for m in self.members:
+            out[m.name] = {
+                "requests": m.requests,
+                "wins": m.wins,
+                "errors": m.errors,
+                "quota_used": m.bucket.used,
+                "p50_s": m.latency.percentile(0.5),
+                "p90_s": m.latency.percentile(0.9),
+                "histogram": m.latency.histogram(),
+            }
+        return out
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Algoritmos internos
+    def _hedge_delay(self, member: PoolMember) -> float | None:
+        if len(self.members) < 2:
+            return None
+        if member.latency.samples >= self.hedge_min_samples:
+            return member.latency.percentile(self.hedge_percentile)
+        return self.hedge_default
+
+    def _pick(self, exclude: Collection[PoolMember]) -> PoolMember | None:
+        """Próximo membro (rodízio) fora de `exclude` que conseguir uma ficha agora."""
+        with self._lock:
+            n = len(self.members)
+            for i in range(n):
+                m = self.members[(self._next + i) % n]
+                if m in exclude:
+                    continue
+                if m.bucket.try_acquire():
+                    self._next = (self._next + i + 1) % n
+                    return m
+        return None
+
+    def _min_wait(self, exclude: Collection[PoolMember]) -> float:
+        return min(m.bucket.wait_time() for m in self.members if m not in exclude)
+
+    def _acquire(self, exclude: Collection[PoolMember] = (), block: bool = True) -> PoolMember | None:
+        while True:
+            m = self._pick(exclude)
+            if m is not None or not block:
+                return m
+            time.sleep(self._min_wait(exclude))
+
+    async def _acquire_async(self, exclude: Collection[PoolMember] = ()) -> PoolMember:
+        while True:
+            m = self._pick(exclude)
+            if m is not None:
+                return m
+            await asyncio.sleep(self._min_wait(exclude))
+
+    def _count(self, member: PoolMember, error: bool = False) -> None:
+        # chamadas vêm de várias threads (hedge, to_thread): += não é atômico
+        with self._lock:
+            if error:
+                member.errors += 1
+            else:
+                member.requests += 1
+
+    def _call(self, member: PoolMember, prompt: str) -> str:
+        self._count(member)
+        t0 = time.perf_counter()
+        try:
+            answer = member.provider.ask(prompt)
+        except Exception:
+            self._count(member, error=True)
+            raise
+        member.latency.record(time.perf_counter() - t0)
+        return answer
+
+    async def _call_async(self, member: PoolMember, prompt: str) -> str:
+        self._count(member)
+        t0 = time.perf_counter()
+        try:
+            answer = await member.provider.ask_async(prompt)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._count(member, error=True)
+            raise
+        member.latency.record(time.perf_counter() - t0)
+        return answer
+
+
+def groq_pool(
+    models: Tuple[str, ...] = ("llama-3.3-70b-versatile",),
+    key_envs: Tuple[str, ...] = ("GROQ_API_KEY", "GROQ_API_KEY2"),
+    rpm: float = 30.0,
+    **pool_kwargs,
+) -> ProviderPool:
+    """Um membro por (chave, modelo) definido no ambiente; `rpm` por chave."""
+    members = []
+    for env in key_envs:
+        if not _env(env):
+            continue
+        # o balde é por chave: modelos da mesma chave dividem a cota
+        bucket = TokenBucket(rate=rpm / 60.0, capacity=max(1.0, rpm / 10.0))
+        for model in models:
+            provider = GroqProvider(model, api_key_env=env)
+            members.append(PoolMember(f"{env}:{model}", provider, bucket))
+    return ProviderPool(members, **pool_kwargs)
+
+
+# Servidor local que imita /chat/completions (testes sem rede) #
+def start_standin_server(
+    latency: Callable[[], float] | float = 0.0,
+    responder: Callable[[str], str] = resposta_gulosa,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Sobe o servidor numa thread; devolve (servidor, base_url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency() if callable(latency) else latency)
+            content = responder(body["messages"][-1]["content"])
+            data = json.dumps({
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *_args) -> None:  # silencia o log por requisição
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
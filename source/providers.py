@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import os
+import re
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Tuple
+
+# SDKs (google, groq, httpx, dotenv) são importados só quando um provedor
+# que precisa deles é criado: importar este módulo é barato.
+
+_ENV_LOADED = False
+
+def _env(name: str) -> str | None:
+    """os.getenv, carregando o `.env` na primeira chamada."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _ENV_LOADED = True
+    return os.getenv(name)
+
+
+# Registro de provedores: nome -> "módulo:Classe", importado sob demanda
+PROVIDERS: Dict[str, str] = {
+    "gemini": "providers:GeminiProvider",
+    "groq":   "providers:GroqProvider",
+    "groq2":  "providers:GroqProvider2",
+    "http":   "providers:HttpChatProvider",
+    "fake":   "providers:FakeProvider",
+    "pool":   "provider_pool:groq_pool",
+}
+
+def register_provider(name: str, target: str) -> None:
+    """Registra um provedor externo como "módulo:fábrica"."""
+    PROVIDERS[name] = target
+
+def create_provider(name: str, **kwargs: Any) -> "ChatProviderBase":
+    if name not in PROVIDERS:
+        raise ValueError(f"Provedor '{name}' desconhecido (opções: {sorted(PROVIDERS)})")
+    module, attr = PROVIDERS[name].split(":")
+    return getattr(importlib.import_module(module), attr)(**kwargs)
+
+
+# Interface de provedores de chat
+class ChatProviderBase(ABC):
+    @abstractmethod
+    def ask(self, prompt: str) -> str:
+        ...
+
+    async def ask_async(self, prompt: str) -> str:
+        """Padrão: roda `ask` numa thread para não travar o event loop."""
+        return await asyncio.to_thread(self.ask, prompt)
+
+
+# Google Gemini Provider #
+class GeminiProvider(ChatProviderBase):
+    def __init__(self, model: str = "gemini-2.0-flash") -> None:
+
+        import google.generativeai as genai
+
+        api_key = _env("GEMINI_API_KEY")
+        if not api_key:
+            raise EnvironmentError("Defina GEMINI_API_KEY nas variáveis de ambiente.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+        self.model_name = model
+
+    def ask(self, prompt: str) -> str:
+        import google.api_core.exceptions as gexc
+
+        while True:
+            try:
+                resp = self.model.generate_content(prompt, safety_settings={})
+                return resp.text.strip()
+            except gexc.ResourceExhausted as e:
+                # lê o retry_delay sugerido pela API
+                delay = getattr(e, "retry_delay", 10)
+                print(f"[Gemini] quota — aguardando {delay} s…")
+                time.sleep(delay)
+
+    async def ask_async(self, prompt: str) -> str:
+        import google.api_core.exceptions as gexc
+
+        while True:
+            try:
+                resp = await self.model.generate_content_async(prompt, safety_settings={})
+                return resp.text.strip()
+            except gexc.ResourceExhausted as e:
+                # backoff sem travar os outros agentes do tick
+                delay = getattr(e, "retry_delay", 10)
+                print(f"[Gemini] quota — aguardando {delay} s…")
+                await asyncio.sleep(delay)
+
+
+# Clientes assíncronos ficam presos ao event loop em que foram criados, e cada
+# run_simulation roda o seu (asyncio.run): um cliente por loop, fechado com
+# `close_async_clients` (ou descartado quando o loop é coletado).
+_LOOP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, Any]]" = weakref.WeakKeyDictionary()
+
+def _loop_client(key: Any, factory: Callable[[], Any]) -> Any:
+    clients = _LOOP_CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    if key not in clients:
+        clients[key] = factory()
+    return clients[key]
+
+
+async def close_async_clients() -> None:
+    """Fecha os clientes assíncronos criados no loop atual (chame antes de o loop acabar)."""
+    clients = _LOOP_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is not None:
+            await close()
+
+
+# Cliente síncrono reaproveitado por chave (mantém seu pool de conexões)
+_GROQ_CLIENTS: Dict[str, Any] = {}
+
+def _groq_client(api_key: str) -> Any:
+    if api_key not in _GROQ_CLIENTS:
+        from groq import Groq
+        _GROQ_CLIENTS[api_key] = Groq(api_key=api_key)
+    return _GROQ_CLIENTS[api_key]
+
+
+def _async_groq(api_key: str) -> Any:
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=api_key)
+
+
+# Groq LLM Provider
+class GroqProvider(ChatProviderBase):
+    def __init__(
+        self,
+        model: str = "deepseek-r1-distill-llama-70b",
+        api_key: str | None = None,
+        api_key_env: str = "GROQ_API_KEY",
+    ) -> None:
+
+        api_key = api_key or _env(api_key_env)
+        if not api_key:
+            raise EnvironmentError(f"Defina {api_key_env} nas variáveis de ambiente.")
+        self.client = _groq_client(api_key)
+        self.api_key = api_key
+        self.model = model
+
+    def ask(self, prompt: str) -> str:
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+        )
+        return resp.choices[0].message.content.strip()
+
+    async def ask_async(self, prompt: str) -> str:
+        aclient = _loop_client(("groq", self.api_key), lambda: _async_groq(self.api_key))
+        resp = await aclient.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+        )
+        return resp.choices[0].message.content.strip()
+
+# Groq LLM Provider (segunda chave) #
+class GroqProvider2(GroqProvider):
+    def __init__(self, model: str = "llama-3.3-70b-versatile") -> None:
+        super().__init__(model, api_key_env="GROQ_API_KEY2")
+
+
+# Qualquer endpoint compatível com OpenAI (/chat/completions) via httpx #
+class HttpChatProvider(ChatProviderBase):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: str | None = None,
+        timeout: float = 60.0,
+    ) -> None:
+
+        import httpx
+
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        # clientes persistentes: reaproveitam conexões keep-alive (o assíncrono, um por loop)
+        self.client = httpx.Client(base_url=self.base_url, headers=self.headers, timeout=timeout)
+
+    def _payload(self, prompt: str) -> Dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0,
+        }
+
+    def ask(self, prompt: str) -> str:
+        resp = self.client.post("/chat/completions", json=self._payload(prompt))
+        resp.raise_for_status()
+        return resp.json()["choices"][0]["message"]["content"].strip()
+
+    def _async_client(self) -> Any:
+        import httpx
+        return httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=self.timeout)
+
+    async def ask_async(self, prompt: str) -> str:
+        aclient = _loop_client(("http", id(self)), self._async_client)
+        resp = await aclient.post("/chat/completions", json=self._payload(prompt))
+        resp.raise_for_status()
+        return resp.json()["choices"][0]["message"]["content"].strip()
+
+
+def _mais_perto(goal: Tuple[int, int], vizinhos: str) -> Tuple[int, int] | None:
+    cands = [(int(r), int(c)) for r, c in re.findall(r"\((\d+), (\d+)\)", vizinhos)]
+    if not cands:
+        return None
+    return min(cands, key=lambda p: abs(p[0] - goal[0]) + abs(p[1] - goal[1]))
+
+
+"""
+Escolhe, entre os vizinhos livres do prompt, o mais próximo (Manhattan) do
+objetivo. Entende também o prompt em lote (uma linha "agente … |" por agente)
+e aí responde em JSON. Devolve "" se o prompt não tiver o formato esperado.
+"""
+def resposta_gulosa(prompt: str) -> str:
+    lote = re.findall(
+        r"agente (\S+) \| posição \((\d+), (\d+)\) \| objetivo \((\d+), (\d+)\) "
+        r"\| vizinhos livres \[(.*?)\]",
+        prompt,
+    )
+    if lote:
+        out = {}
+        for aid, _r, _c, gr, gc, viz in lote:
+            move = _mais_perto((int(gr), int(gc)), viz)
+            if move is not None:
+                out[aid] = list(move)
+        return json.dumps(out, ensure_ascii=False)
+
+    goal = re.search(r"Objetivo final: \((\d+), (\d+)\)", prompt)
+    nbrs = re.search(r"Vizinhos livres imediatos: \[(.*?)\]", prompt)
+    if not goal or not nbrs:
+        return ""
+    move = _mais_perto((int(goal.group(1)), int(goal.group(2))), nbrs.group(1))
+    if move is None:
+        return ""
+    return f"({move[0]},{move[1]})"
+
+
+# Provedor local (sem rede) para testes #
+class FakeProvider(ChatProviderBase):
+    def __init__(
+        self,
+        latency: float = 0.0,                              # segundos por resposta
+        responder: Callable[[str], str] = resposta_gulosa,
+        model: str = "fake",
+    ) -> None:
+
+        self.latency = latency
+        self.responder = responder
+        self.model = model
+        self.calls = 0
+
+    def ask(self, prompt: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.responder(prompt)
+
+    async def ask_async(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.responder(prompt)
@@ -1,13 +1,29 @@
+from __future__ import annotations
+import mmap
 import cv2
 import numpy as np
+from pathlib import Path
 from typing import Tuple, Dict
 
+# Alcance (em px) do OPEN + DILATE com kernel 3×3: cada faixa precisa
+# desse tanto de linhas extras acima/abaixo para sair idêntica à imagem inteira
+MARGEM_MORFOLOGIA = 3
+
 def remover_fundo(caminho_entrada: str) -> Tuple[np.ndarray, np.ndarray]:
     # 1) Carrega imagem e checa se abriu
     img = cv2.imread(caminho_entrada)
     if img is None:
         raise FileNotFoundError(f"Não foi possível abrir '{caminho_entrada}'")
 
+    # 2..5) Máscara de vias já limpa
+    mask = _mascara_vias(img)
+
+    # 6) Aplica máscara para extrair apenas as linhas
+    resultado = cv2.bitwise_and(img, img, mask=mask)
+    return resultado, mask
+
+
+def _mascara_vias(img: np.ndarray) -> np.ndarray:
     # 2) Converte pra HSV
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
 
@@ -26,12 +42,119 @@ def remover_fundo(caminho_entrada: str) -> Tuple[np.ndarray, np.ndarray]:
     kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN,   kernel, iterations=1)
     mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
-
-    # 6) Aplica máscara para extrair apenas as linhas
-    resultado = cv2.bitwise_and(img, img, mask=mask)
+    return mask
+
+
+def _abrir_imagem(caminho_entrada: str | Path) -> np.ndarray:
+    """
+    `.npy` (H×W×3 BGR) é aberto como memmap e lido sob demanda; demais
+    formatos passam pelo cv2, que precisa decodificar a imagem inteira.
+    """
+    if Path(caminho_entrada).suffix.lower() == ".npy":
+        img = np.load(str(caminho_entrada), mmap_mode="r")
+    else:
+        img = cv2.imread(str(caminho_entrada))
+    if img is None:
+        raise FileNotFoundError(f"Não foi possível abrir '{caminho_entrada}'")
+    return img
+
+
+def dimensoes(caminho_entrada: str | Path) -> Tuple[int, int]:
+    """(altura, largura) sem decodificar a imagem (cabeçalho do arquivo)."""
+    if Path(caminho_entrada).suffix.lower() == ".npy":
+        return np.load(str(caminho_entrada), mmap_mode="r").shape[:2]
+    from PIL import Image
+    with Image.open(str(caminho_entrada)) as img:
+        w, h = img.size
+    return h, w
+
+
+def _ler_faixa(img: np.ndarray, y0: int, y1: int) -> np.ndarray:
+    """
+    Cópia das linhas y0:y1. De um memmap de arquivo inteiro, lê por um
+    mapeamento só da faixa, desfeito na volta: as páginas já lidas não ficam
+    somando no RSS do processo.
+    """
+    if isinstance(img, np.memmap) and isinstance(img.base, mmap.mmap) and img.flags.c_contiguous:
+        linha = img.strides[0]
+        faixa = np.memmap(
+            img.filename, dtype=img.dtype, mode="r",
+            offset=img.offset + y0 * linha, shape=(y1 - y0,) + img.shape[1:],
+        )
+        copia = np.array(faixa)
+        del faixa
+        return copia
+    return np.ascontiguousarray(img[y0:y1])
+
+
+def _criar_npy(caminho: str | Path, shape: Tuple[int, ...], dtype=np.uint8):
+    """Arquivo `.npy` aberto para escrita sequencial (cabeçalho já gravado)."""
+    f = open(caminho, "wb")
+    np.lib.format.write_array_header_1_0(
+        f, {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+    )
+    return f
+
+
+def remover_fundo_em_faixas(
+    caminho_entrada: str | Path,
+    caminho_mask: str | Path,
+    caminho_resultado: str | Path | None = None,
+    altura_faixa: int = 1024,
+) -> Tuple[np.ndarray | None, np.ndarray]:
+    """
+    Versão em faixas de `remover_fundo` para mapas muito grandes.
+
+    Processa `altura_faixa` linhas por vez (mais `MARGEM_MORFOLOGIA` de
+    sobreposição) e grava a máscara num `.npy`, faixa a faixa. Só uma faixa
+    de HSV/máscaras fica viva por vez; o resultado é idêntico ao da versão
+    inteira. Se `caminho_resultado` for dado, a imagem filtrada também é
+    gravada; senão devolve None no lugar dela. Os dois voltam como memmaps
+    só de leitura (leia-os com `previa`/`construir_grafo`, que vão por faixas).
+    """
+    img = _abrir_imagem(caminho_entrada)
+    H, W = img.shape[:2]
+
+    f_mask = _criar_npy(caminho_mask, (H, W))
+    f_res = None if caminho_resultado is None else _criar_npy(caminho_resultado, (H, W, 3))
+    try:
+        for y0 in range(0, H, altura_faixa):
+            y1 = min(y0 + altura_faixa, H)
+            a0 = max(0, y0 - MARGEM_MORFOLOGIA)
+            a1 = min(H, y1 + MARGEM_MORFOLOGIA)
+
+            faixa = _ler_faixa(img, a0, a1)
+            m = np.ascontiguousarray(_mascara_vias(faixa)[y0 - a0 : y1 - a0])
+            f_mask.write(m.data)
+
+            if f_res is not None:
+                util = faixa[y0 - a0 : y1 - a0]
+                f_res.write(cv2.bitwise_and(util, util, mask=m).data)
+    finally:
+        f_mask.close()
+        if f_res is not None:
+            f_res.close()
+    del img
+
+    mask = np.load(str(caminho_mask), mmap_mode="r")
+    resultado = None if caminho_resultado is None else np.load(str(caminho_resultado), mmap_mode="r")
     return resultado, mask
 
 
+def previa(img: np.ndarray, lado_max: int = 2048, altura_faixa: int = 1024) -> np.ndarray:
+    """Cópia reduzida de `img` (maior lado <= `lado_max`), montada faixa a faixa."""
+    H, W = img.shape[:2]
+    f = max(1, -(-max(H, W) // lado_max))
+    h, w = max(1, H // f), max(1, W // f)
+    out = np.empty((h, w) + img.shape[2:], dtype=img.dtype)
+    passo = max(f, altura_faixa // f * f)
+    for y0 in range(0, h * f, passo):
+        y1 = min(y0 + passo, h * f)
+        faixa = _ler_faixa(img, y0, y1)[:, : w * f]
+        out[y0 // f : y1 // f] = cv2.resize(faixa, (w, (y1 - y0) // f), interpolation=cv2.INTER_AREA)
+    return out
+
+
 def aplicar_grid(
     img: np.ndarray,
     mask: np.ndarray,
@@ -67,13 +190,14 @@ def construir_grafo(
     H, W = mask.shape[:2]
     th, tw = H // linhas, W // colunas
 
-    # 1) Define quais células são via (True/False)
+    # 1) Define quais células são via (True/False), uma faixa de células por vez
+    #    (com `mask` em memmap só essa faixa é lida do disco)
     road = {}
     for r in range(linhas):
+        faixa = _ler_faixa(mask, r*th, (r+1)*th)[:, :colunas*tw]
+        cheios = np.count_nonzero(faixa.reshape(th, colunas, tw), axis=(0, 2))
         for c in range(colunas):
-            bloco = mask[r*th:(r+1)*th, c*tw:(c+1)*tw]
-            proporcao = np.count_nonzero(bloco) / (th*tw)
-            road[(r, c)] = proporcao > limiar
+            road[(r, c)] = cheios[c] / (th*tw) > limiar
 
     # 2) Monta os nós
     nodes = [
@@ -82,27 +206,26 @@ def construir_grafo(
     ]
 
     # 3) Verifica arestas entre vizinhos
+    #    A borda compartilhada é a mesma linha/coluna de pixels para os dois
+    #    lados, então basta olhar para baixo e para a direita de cada célula.
     edges = []
-    vizinhos = [(-1,0),(1,0),(0,-1),(0,1)]
-    for (r, c), ok in road.items():
-        if not ok:
+    for r in range(linhas):
+        if not any(road[(r, c)] for c in range(colunas)):
             continue
-        for dr, dc in vizinhos:
-            nr, nc = r+dr, c+dc
-            if 0 <= nr < linhas and 0 <= nc < colunas and road[(nr, nc)]:
-                # testa se há pixels de rua na borda compartilhada
-                if dr != 0:
-                    y = (r + (dr>0)) * th
-                    f1 = mask[y, c*tw:(c+1)*tw]
-                    f2 = mask[y, nc*tw:(nc+1)*tw]
-                else:
-                    x = (c + (dc>0)) * tw
-                    f1 = mask[r*th:(r+1)*th, x]
-                    f2 = mask[nr*th:(nr+1)*th, x]
-                if np.any(f1>0) and np.any(f2>0):
-                    id1, id2 = f"{r}_{c}", f"{nr}_{nc}"
-                    if [id2, id1] not in edges:
-                        edges.append([id1, id2])
+        faixa = _ler_faixa(mask, r*th, (r+1)*th)
+        borda_baixo = _ler_faixa(mask, (r+1)*th, (r+1)*th + 1)[0] if r + 1 < linhas else None
+        for c in range(colunas):
+            if not road[(r, c)]:
+                continue
+            id1 = f"{r}_{c}"
+            # baixo: primeira linha de pixels da célula de baixo
+            if borda_baixo is not None and road[(r+1, c)]:
+                if np.any(borda_baixo[c*tw:(c+1)*tw] > 0):
+                    edges.append([id1, f"{r+1}_{c}"])
+            # direita: primeira coluna de pixels da célula da direita
+            if c + 1 < colunas and road[(r, c+1)]:
+                if np.any(faixa[:, (c+1)*tw] > 0):
+                    edges.append([id1, f"{r}_{c+1}"])
 
     return {"nodes": nodes, "edges": edges}
 
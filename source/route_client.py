@@ -0,0 +1,203 @@
+from __future__ import annotations
+import http.client
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+NodeId = str
+Coord  = Tuple[int, int]
+
+
+class RouteServerError(RuntimeError):
+    """Resposta de erro (4xx/5xx) do servidor de rotas."""
+
+
+"""
+Cliente do `route_server` (só biblioteca padrão). Mantém uma conexão
+persistente; se ela cair, reconecta uma vez antes de desistir. Não é
+thread-safe: use um cliente por thread.
+"""
+class RouteClient:
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = 30.0) -> None:
+        u = urlparse(url)
+        self.url     = url
+        self.host    = u.hostname or "127.0.0.1"
+        self.port    = u.port or 80
+        self.timeout = timeout
+
+        # estado interno
+        self._conn: http.client.HTTPConnection | None = None
+
+    # Interface pública
+    def health(self) -> Dict:
+        return self._request("GET", "/health")
+
+    def stats(self) -> Dict:
+        return self._request("GET", "/stats")
+
+    def sample_nodes(self, n: int = 100, seed: int | None = None) -> List[NodeId]:
+        query = f"?sample={n}" + (f"&seed={seed}" if seed is not None else "")
+        return self._request("GET", "/nodes" + query)["nodes"]
+
+    def route(self, src: NodeId, dst: NodeId, algo: str = "astar") -> List[NodeId] | None:
+        return self.routes([(src, dst)], algo)[0]["path"]
+
+    def routes(self, pairs: Iterable[Sequence[NodeId]], algo: str = "astar") -> List[Dict]:
+        """Lote de (origem, destino) → [{"path", "cost", "version"}] na mesma ordem."""
+        return self._request("POST", "/route", {"queries": [list(p) for p in pairs], "algo": algo})["results"]
+
+    def distances(self, sources: List[NodeId], targets: List[NodeId]) -> List[List[int | None]]:
+        return self._request("POST", "/distance", {"sources": sources, "targets": targets})["matrix"]
+
+    def set_traffic(
+        self,
+        cells: Iterable[Coord] | None = None,
+        add: Iterable[Coord] = (),
+        remove: Iterable[Coord] = (),
+    ) -> int:
+        """Substitui (`cells`) ou altera o tráfego; devolve a nova versão."""
+        body: Dict = {"add": [list(c) for c in add], "remove": [list(c) for c in remove]}
+        if cells is not None:
+            body["cells"] = [list(c) for c in cells]
+        return self._request("POST", "/traffic", body)["version"]
+
+    def set_topology(self, close: Iterable = (), open: Iterable = ()) -> int:
+        body = {"close": [_jsonable(c) for c in close], "open": [_jsonable(c) for c in open]}
+        return self._request("POST", "/topology", body)["version"]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "RouteClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # Algoritmos internos
+    def _request(self, method: str, path: str, body: Dict | None = None) -> Dict:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for tentativa in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=data, headers=headers)
+                resp = self._conn.getresponse()
+                payload = json.loads(resp.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self.close()   # servidor fechou a conexão ociosa: tenta uma vez de novo
+                if tentativa:
+                    raise
+        if resp.status >= 400:
+            raise RouteServerError(f"{resp.status} {path}: {payload.get('error', payload)}")
+        return payload
+
+
+def _jsonable(cell):
+    return list(cell) if isinstance(cell, tuple) else cell
+
+
+"""
+Gerador de carga: `clientes` threads, cada uma com sua conexão, mandando
+`requisicoes` lotes de `lote` pares origem/destino sorteados entre
+`amostra` nós do servidor. Com `destinos`, os destinos saem de um conjunto
+pequeno (vários agentes indo aos mesmos depósitos). Com `traffic_every`, o
+primeiro cliente troca o tráfego a cada tantos lotes (carga mista de leitura
+e escrita). Devolve latências por requisição e vazão.
+"""
+def gerar_carga(
+    url: str = DEFAULT_URL,
+    clientes: int = 4,
+    requisicoes: int = 100,
+    lote: int = 16,
+    amostra: int = 500,
+    destinos: int | None = None,
+    traffic_every: int | None = None,
+    algo: str = "astar",
+    seed: int | None = None,
+) -> Dict[str, float]:
+
+    with RouteClient(url) as c:
+        nos = c.sample_nodes(amostra, seed)
+    if len(nos) < 2:
+        raise ValueError("Servidor com menos de 2 nós abertos")
+    alvos = nos[:destinos] if destinos else nos
+    celulas = [tuple(map(int, n.split("_"))) for n in nos if n.count("_") == 1]
+
+    latencias: List[float] = []
+    falhas = [0]
+    trava = threading.Lock()
+
+    def cliente(k: int) -> None:
+        rng = random.Random(None if seed is None else seed + k)
+        minhas: List[float] = []
+        erros = 0
+        with RouteClient(url) as c:
+            for i in range(requisicoes):
+                if traffic_every and k == 0 and i % traffic_every == 0 and celulas:
+                    c.set_traffic(rng.sample(celulas, min(len(celulas), max(1, len(celulas) // 20))))
+                pares = [(rng.choice(nos), rng.choice(alvos)) for _ in range(lote)]
+                t0 = time.perf_counter()
+                try:
+                    c.routes(pares, algo)
+                except (RouteServerError, OSError):
+                    erros += 1
+                    continue
+                minhas.append(time.perf_counter() - t0)
+        with trava:
+            latencias.extend(minhas)
+            falhas[0] += erros
+
+    threads = [threading.Thread(target=cliente, args=(k,)) for k in range(clientes)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - t0
+
+    latencias.sort()
+    def pct(p: float) -> float:
+        return latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000 if latencias else float("nan")
+
+    return {
+        "clients": clientes,
+        "requests": len(latencias),
+        "errors": falhas[0],
+        "batch": lote,
+        "seconds": round(total, 3),
+        "req_per_s": round(len(latencias) / total, 1) if total else 0.0,
+        "routes_per_s": round(len(latencias) * lote / total, 1) if total else 0.0,
+        "p50_ms": round(pct(0.50), 2),
+        "p95_ms": round(pct(0.95), 2),
+        "p99_ms": round(pct(0.99), 2),
+        "max_ms": round(latencias[-1] * 1000, 2) if latencias else float("nan"),
+    }
+
+
+def main(url: str = DEFAULT_URL, **kwargs) -> Dict[str, float]:
+    with RouteClient(url) as c:
+        antes = c.stats()
+    r = gerar_carga(url, **kwargs)
+    with RouteClient(url) as c:
+        depois = c.stats()
+    print(
+        f"{r['requests']} requisições × {r['batch']} rotas, {r['clients']} clientes, "
+        f"{r['errors']} erros em {r['seconds']:.2f}s"
+    )
+    print(f"Vazão: {r['req_per_s']:.0f} req/s, {r['routes_per_s']:.0f} rotas/s")
+    print(f"Latência: p50 {r['p50_ms']:.1f}ms, p95 {r['p95_ms']:.1f}ms, p99 {r['p99_ms']:.1f}ms, máx {r['max_ms']:.1f}ms")
+    for k in ("cache_hits", "field_hits", "searches"):
+        r[k] = depois[k] - antes[k]
+    print(f"Servidor: {r['searches']} buscas, {r['field_hits']} via campo, {r['cache_hits']} do cache")
+    return r
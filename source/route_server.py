@@ -0,0 +1,475 @@
+from __future__ import annotations
+import heapq
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from pathfinder import Coord, NodeId, dijkstra_all, euclidiana, manhattan
+from dynamic_graph import DynamicGraph, permanent_blocks
+from flowfield import DistanceField, FlowFieldService
+
+GRAPH_JSON   = Path("source/json/image_graph.json")
+DEFAULT_PORT = 8765
+ALGOS        = ("astar", "euclidean", "dijkstra")
+
+# consultas para o mesmo destino num lote a partir das quais vale um campo
+FIELD_MIN_QUERIES = 4
+
+
+"""
+Trava leitores/escritor: consultas rodam juntas, atualizações de tráfego e
+topologia esperam as consultas em andamento e bloqueiam as novas.
+"""
+class _RWLock:
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._writer = True          # novos leitores esperam a partir daqui
+            while self._readers:
+                self._cond.wait()
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+"""
+Estado quente do servidor de rotas: grafo, tráfego, cache de rotas e campos
+de distância dos destinos mais pedidos.
+
+    • Custo igual ao dos DeliveryAgents: 1 por passo + `penalty` ao entrar
+      numa célula com tráfego.
+    • `routes` agrupa o lote por destino: destinos com `FIELD_MIN_QUERIES`
+      consultas (ou que já têm campo) saem de um `DistanceField`; os demais,
+      de A*/Dijkstra. Até `max_fields` campos ficam vivos (LRU) e são
+      reparados a cada atualização.
+    • Toda mudança de tráfego ou topologia incrementa `version` e esvazia o
+      cache de rotas.
+"""
+class RouteService:
+
+    def __init__(
+        self,
+        graph_path: str | Path = GRAPH_JSON,
+        closed: Iterable[NodeId | Coord] | None = None,   # None = bloqueios do mapa de exemplo, se for ele
+        penalty: int = 3,
+        cache_size: int = 4096,
+        max_fields: int = 32,
+    ) -> None:
+
+        t0 = time.perf_counter()
+        if closed is None:
+            closed = permanent_blocks(graph_path)
+        self.graph      = DynamicGraph.from_json(graph_path, closed=closed)
+        self.graph_path = str(graph_path)
+        self.penalty    = penalty
+        self.cache_size = cache_size
+        self.max_fields = max_fields
+        self.load_time  = time.perf_counter() - t0
+
+        # estado interno
+        self.traffic: Set[Coord] = set()
+        self.version = 0
+        self._rw = _RWLock()
+        self._lock = threading.Lock()                                   # cache e campos
+        self._cache: OrderedDict[Tuple[NodeId, NodeId, str], Tuple] = OrderedDict()
+        self._fields = FlowFieldService(self.graph, self._cost)
+        self._hot: OrderedDict[NodeId, DistanceField] = OrderedDict()   # destino -> campo (LRU)
+        self._building: Dict[NodeId, Future] = {}                        # campos em construção
+
+        # métricas
+        self.queries     = 0
+        self.cache_hits  = 0
+        self.field_hits  = 0
+        self.searches    = 0
+        self.updates     = 0
+
+    # Interface pública
+    def routes(self, queries: List[Tuple[NodeId, NodeId, str]]) -> List[Dict]:
+        """Lote de (origem, destino, algoritmo) → [{"path", "cost"}] na mesma ordem."""
+        self._rw.acquire_read()
+        try:
+            por_destino: Dict[NodeId, int] = {}
+            for _, dst, _ in queries:
+                por_destino[dst] = por_destino.get(dst, 0) + 1
+            out = [self._route(src, dst, algo, por_destino[dst]) for src, dst, algo in queries]
+            version = self.version
+        finally:
+            self._rw.release_read()
+        with self._lock:
+            self.queries += len(queries)
+        return [dict(r, version=version) for r in out]
+
+    def distances(self, sources: List[NodeId], targets: List[NodeId]) -> List[List[int | None]]:
+        """Matriz origem × destino de custos (None = sem rota)."""
+        self._rw.acquire_read()
+        try:
+            alvo = {t for t in targets if t in self.graph.adj}
+            matrix = []
+            for s in sources:
+                dist = dijkstra_all(s, self.graph.adj, self._cost, targets=alvo) if s in self.graph.adj else {}
+                matrix.append([dist.get(t) for t in targets])
+        finally:
+            self._rw.release_read()
+        with self._lock:
+            self.queries += len(sources) * len(targets)
+            self.searches += len(sources)
+        return matrix
+
+    def update_traffic(
+        self,
+        cells: Iterable[Coord] | None = None,   # substitui o tráfego inteiro
+        add: Iterable[Coord] = (),
+        remove: Iterable[Coord] = (),
+    ) -> int:
+        self._rw.acquire_write()
+        try:
+            novo = set(self.traffic) if cells is None else {tuple(c) for c in cells}
+            novo |= {tuple(c) for c in add}
+            novo -= {tuple(c) for c in remove}
+            mudou = self.traffic ^ novo
+            self.traffic = novo
+            if mudou:
+                self._fields.on_traffic_change(mudou)
+                self._invalidate()
+            return self.version
+        finally:
+            self._rw.release_write()
+
+    def update_topology(
+        self,
+        close: Iterable[NodeId | Coord] = (),
+        open: Iterable[NodeId | Coord] = (),
+    ) -> int:
+        self._rw.acquire_write()
+        try:
+            # os campos se reparam pelo aviso do DynamicGraph
+            mudou = self.graph.close_cells(_cells(close)) | self.graph.open_cells(_cells(open))
+            if mudou:
+                self._invalidate()
+            return self.version
+        finally:
+            self._rw.release_write()
+
+    def sample_nodes(self, n: int, seed: int | None = None) -> List[NodeId]:
+        """Nós abertos sorteados (para o gerador de carga)."""
+        abertos = [nid for nid, nbrs in self.graph.adj.items() if nbrs]
+        return random.Random(seed).sample(abertos, min(n, len(abertos)))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "graph": self.graph_path,
+                "nodes": len(self.graph.adj),
+                "version": self.version,
+                "traffic": len(self.traffic),
+                "queries": self.queries,
+                "cache_hits": self.cache_hits,
+                "field_hits": self.field_hits,
+                "searches": self.searches,
+                "updates": self.updates,
+                "fields": len(self._hot),
+                "cached_routes": len(self._cache),
+                "load_s": round(self.load_time, 3),
+            }
+
+    # Algoritmos internos
+    def _route(self, src: NodeId, dst: NodeId, algo: str, no_lote: int) -> Dict:
+        adj = self.graph.adj
+        if src not in adj or dst not in adj:
+            return {"path": None, "cost": None, "error": "nó desconhecido"}
+        if algo not in ALGOS:
+            return {"path": None, "cost": None, "error": f"algoritmo '{algo}' desconhecido"}
+
+        key = (src, dst, algo)
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return {"path": hit[0], "cost": hit[1]}
+
+        field = self._field(dst, no_lote)
+        if field is not None:
+            path = field.path(src) or None
+            cost = field.dist.get(src)
+            with self._lock:
+                self.field_hits += 1
+        else:
+            path, cost = self._search(src, dst, algo)
+            with self._lock:
+                self.searches += 1
+
+        with self._lock:
+            self._cache[key] = (path, cost)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {"path": path, "cost": cost}
+
+    def _field(self, dst: NodeId, no_lote: int) -> DistanceField | None:
+        with self._lock:
+            field = self._hot.get(dst)
+            if field is not None:
+                self._hot.move_to_end(dst)
+                return field
+            if no_lote < FIELD_MIN_QUERIES or not self.max_fields:
+                return None
+            fut = self._building.get(dst)
+            dono = fut is None
+            if dono:
+                fut = self._building[dst] = Future()
+        if not dono:
+            return fut.result()   # outro lote já está montando este campo
+
+        # fora da trava: só quem pede o mesmo destino espera (o grafo não
+        # muda, as atualizações esperam a leitura em andamento)
+        try:
+            field = self._fields.build(dst)
+        except BaseException as exc:
+            with self._lock:
+                del self._building[dst]
+            fut.set_exception(exc)
+            raise
+        with self._lock:
+            del self._building[dst]
+            field = self._hot[dst] = self._fields.acquire(dst, field)
+            if len(self._hot) > self.max_fields:
+                velho, _ = self._hot.popitem(last=False)
+                self._fields.release(velho)
+        fut.set_result(field)
+        return field
+
+    def _search(self, src: NodeId, dst: NodeId, algo: str) -> Tuple[List[NodeId] | None, int | None]:
+        """A* (manhattan/euclidiana, admissíveis: custo >= 1) ou Dijkstra."""
+        pos, adj, cost = self.graph.pos, self.graph.adj, self._cost
+        h = {"astar": manhattan, "euclidean": euclidiana}.get(algo)
+        goal = pos[dst]
+
+        open_heap: List[Tuple[float, int, NodeId]] = [(0, 0, src)]
+        g: Dict[NodeId, int] = {src: 0}
+        came: Dict[NodeId, NodeId] = {}
+        while open_heap:
+            _, gc, cur = heapq.heappop(open_heap)
+            if gc > g[cur]:
+                continue
+            if cur == dst:
+                path = [cur]
+                while cur in came:
+                    cur = came[cur]
+                    path.append(cur)
+                path.reverse()
+                return path, gc
+            for nxt in adj[cur]:
+                ng = gc + cost(cur, nxt)
+                if nxt not in g or ng < g[nxt]:
+                    g[nxt] = ng
+                    came[nxt] = cur
+                    heapq.heappush(open_heap, (ng + (h(pos[nxt], goal) if h else 0), ng, nxt))
+        return None, None
+
+    def _cost(self, a: NodeId, b: NodeId) -> int:
+        return 1 + (self.penalty if self.graph.pos[b] in self.traffic else 0)
+
+    def _invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self.updates += 1
+            self._cache.clear()
+
+
+def _cells(items: Iterable) -> List[NodeId | Coord]:
+    """JSON traz células como listas: [r, c] → (r, c)."""
+    return [tuple(c) if isinstance(c, list) else c for c in items]
+
+
+"""
+Handler HTTP (JSON). Cada conexão tem sua thread; o trabalho de cada
+requisição roda no pool de workers do servidor, que limita quantas buscas
+acontecem ao mesmo tempo.
+
+    GET  /health                       → {"ok", "nodes", "version"}
+    GET  /stats                        → métricas do serviço
+    GET  /nodes?sample=N&seed=S        → nós abertos sorteados
+    POST /route    {"queries": [[src, dst] | {"src", "dst", "algo"}, ...]}
+    POST /distance {"sources": [...], "targets": [...]}
+    POST /traffic  {"cells": [[r, c], ...]} ou {"add": [...], "remove": [...]}
+    POST /topology {"close": [...], "open": [...]}   (células [r, c] ou NodeIds)
+"""
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"    # conexões persistentes (keep-alive)
+    disable_nagle_algorithm = True   # cabeçalho e corpo saem em writes separados
+    server: "RouteServer"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == "/health":
+            self._reply(200, {"ok": True, "nodes": len(service.graph.adj), "version": service.version})
+        elif url.path == "/stats":
+            self._reply(200, service.stats())
+        elif url.path == "/nodes":
+            qs = parse_qs(url.query)
+            try:
+                n = int(qs.get("sample", ["100"])[0])
+                seed = int(qs["seed"][0]) if "seed" in qs else None
+            except ValueError:
+                self._reply(400, {"error": "sample/seed devem ser inteiros"})
+                return
+            self._reply(200, {"nodes": service.sample_nodes(n, seed)})
+        else:
+            self._reply(404, {"error": f"rota desconhecida: {url.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            size = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(size) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("corpo deve ser um objeto JSON")
+        except ValueError as exc:
+            self._reply(400, {"error": f"JSON inválido: {exc}"})
+            return
+
+        handler = {
+            "/route": self._route,
+            "/distance": self._distance,
+            "/traffic": self._traffic,
+            "/topology": self._topology,
+        }.get(urlparse(self.path).path)
+        if handler is None:
+            self._reply(404, {"error": f"rota desconhecida: {self.path}"})
+            return
+        try:
+            status, payload = self.server.pool.submit(handler, body).result()
+        except (KeyError, TypeError, ValueError) as exc:
+            status, payload = 400, {"error": f"requisição inválida: {exc!r}"}
+        self._reply(status, payload)
+
+    # endpoints (rodam no pool)
+    def _route(self, body: Dict) -> Tuple[int, Dict]:
+        queries = []
+        for q in body["queries"]:
+            if isinstance(q, dict):
+                queries.append((q["src"], q["dst"], q.get("algo", "astar")))
+            else:
+                src, dst = q
+                queries.append((src, dst, body.get("algo", "astar")))
+        return 200, {"results": self.server.service.routes(queries)}
+
+    def _distance(self, body: Dict) -> Tuple[int, Dict]:
+        return 200, {"matrix": self.server.service.distances(body["sources"], body["targets"])}
+
+    def _traffic(self, body: Dict) -> Tuple[int, Dict]:
+        service = self.server.service
+        version = service.update_traffic(body.get("cells"), body.get("add", ()), body.get("remove", ()))
+        return 200, {"version": version, "traffic": len(service.traffic)}
+
+    def _topology(self, body: Dict) -> Tuple[int, Dict]:
+        version = self.server.service.update_topology(body.get("close", ()), body.get("open", ()))
+        return 200, {"version": version}
+
+    # util
+    def _reply(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+"""
+Servidor HTTP local com o `RouteService` e um pool de `workers` threads.
+As buscas são Python puro (GIL): mais workers ajudam a sobrepor E/S e
+atualizações, não a multiplicar CPU; o ganho grande vem do estado quente
+(grafo carregado, cache, campos).
+"""
+class RouteServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        service: RouteService,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        workers: int = 4,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__((host, port), _Handler)
+        self.service = service
+        self.pool    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rota")
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def iniciar(
+    graph_path: str | Path = GRAPH_JSON,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    workers: int = 4,
+    **kwargs,
+) -> RouteServer:
+    """Sobe o servidor numa thread de fundo (porta 0 = livre) e devolve-o; `shutdown()` para."""
+    server = RouteServer(RouteService(graph_path, **kwargs), host, port, workers)
+    threading.Thread(target=server.serve_forever, name="route-server", daemon=True).start()
+    return server
+
+
+def main(
+    graph_path: str | Path = GRAPH_JSON,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    workers: int = 4,
+    verbose: bool = False,
+    **kwargs,
+) -> None:
+    service = RouteService(graph_path, **kwargs)
+    server = RouteServer(service, host, port, workers, verbose)
+    print(f"Grafo {graph_path}: {len(service.graph.adj)} nós em {service.load_time:.2f}s")
+    print(f"Servindo rotas em {server.url} ({workers} workers) — Ctrl+C para parar")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import heapq
+from typing import Dict, List, Set, Tuple
+
+from control import ControlAgent
+
+
+"""
+Loop de simulação orientado a eventos, com o mesmo resultado de
+`ControlAgent.step` tick a tick (mesma semente → mesmas posições, entregas e
+alertas).
+
+    • Agentes ativos ficam numa fila de prioridade por (próximo tick, ordem
+      de registro): cada tick só acorda quem tem ação naquele tick, na mesma
+      ordem do loop original.
+    • Agentes parados saem do loop:
+        - `finished`: no objetivo e sem fila (voltam com `set_goals`);
+        - `stranded`: sem rota; tráfego não cria rota, então só voltam com
+          mudança de topologia ou objetivos novos.
+      O tráfego de quem volta é sincronizado no `wake` (sem replanejar).
+    • Sem ninguém ativo, os ticks só avançam os alertas (o sorteio continua
+      consumindo o gerador aleatório, como no loop original).
+
+Os contadores de replanejamento dos agentes parados deixam de crescer: eram
+replanejamentos que não mudavam nada.
+"""
+class EventScheduler:
+
+    def __init__(self, control: ControlAgent) -> None:
+
+        self.control = control
+        control.scheduler = self
+
+        # estado interno
+        self._agents: List = []                        # ordem de registro
+        self._order: Dict[int, int] = {}               # id(agente) -> posição
+        self._queue: List[Tuple[int, int]] = []        # (tick, posição)
+        self._queued: Set[int] = set()
+        self._parked: Dict[int, str] = {}              # posição -> "finished" | "stranded"
+        self._graphs: Dict[int, object] = {}
+
+        # métricas
+        self.agent_steps = 0        # ações de agente executadas
+        self.skipped     = 0        # ações evitadas (agente parado)
+        self.idle_ticks  = 0        # ticks só de tráfego
+
+        self._sync_agents()
+
+    # Interface pública
+    def step(self) -> None:
+        """Um tick, equivalente a `ControlAgent.step`."""
+        ctrl = self.control
+        self._sync_agents()
+        ctrl.advance_traffic()
+
+        due = self._pop_due(ctrl.tick)
+        self.skipped += len(self._agents) - len(due)
+        if not due:
+            self.idle_ticks += 1
+            return
+
+        # quem está na fila sincronizou no tick anterior: basta o delta deste
+        atual, mudou = ctrl.traffic_cells(), ctrl.traffic_changes()
+        agents = [self._agents[i] for i in due]
+        for ag in agents:
+            ag.on_traffic_update(atual, mudou)
+        for ag in agents:
+            ag.next_step()
+        self.agent_steps += len(agents)
+
+        for i, ag in zip(due, agents):
+            estado = self._idle_state(ag)
+            if estado is None:
+                self._push(ctrl.tick + 1, i)
+            else:
+                self._parked[i] = estado
+
+    def run(self, n_ticks: int) -> None:
+        for _ in range(n_ticks):
+            if self._queue or len(self._agents) != len(self.control._agents):
+                self.step()
+            else:
+                # ninguém ativo: só o ambiente anda
+                self.control.advance_traffic()
+                self.skipped += len(self._agents)
+                self.idle_ticks += 1
+
+    def wake(self, agent) -> None:
+        """Devolve um agente parado ao loop a partir do próximo tick."""
+        i = self._order.get(id(agent))
+        if i is None or self._parked.pop(i, None) is None:
+            return
+        agent.sync_traffic(self.control.traffic_cells())
+        self._push(self.control.tick + 1, i)
+
+    @property
+    def active(self) -> int:
+        return len(self._queued)
+
+    def report(self) -> Dict[str, int]:
+        return {
+            "agents": len(self._agents),
+            "active": self.active,
+            "parked": len(self._parked),
+            "agent_steps": self.agent_steps,
+            "skipped": self.skipped,
+            "idle_ticks": self.idle_ticks,
+        }
+
+    # checkpoint (pickle): as chaves por id() são refeitas na cópia
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state["_order"]
+        state["_graphs"] = list(self._graphs.values())
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        state["_order"] = {id(ag): i for i, ag in enumerate(state["_agents"])}
+        state["_graphs"] = {id(g): g for g in state["_graphs"]}
+        self.__dict__.update(state)
+
+    # Algoritmos internos
+    def _sync_agents(self) -> None:
+        """Agentes registrados depois da criação entram ativos."""
+        for ag in self.control._agents[len(self._agents):]:
+            i = len(self._agents)
+            self._agents.append(ag)
+            self._order[id(ag)] = i
+            self._push(self.control.tick + 1, i)
+            graph = getattr(ag, "graph", None)
+            if graph is not None and id(graph) not in self._graphs:
+                self._graphs[id(graph)] = graph
+                graph.subscribe(self._on_topology_change)
+
+    def _on_topology_change(self, version: int, nodes: Set) -> None:
+        # os agentes já replanejaram (inscritos antes); quem estava sem rota volta
+        for i, estado in list(self._parked.items()):
+            if estado == "stranded":
+                self.wake(self._agents[i])
+
+    def _idle_state(self, ag) -> str | None:
+        if ag.finished:
+            return "finished"
+        if ag.stranded:
+            return "stranded"
+        return None
+
+    def _push(self, tick: int, i: int) -> None:
+        if i not in self._queued:
+            self._queued.add(i)
+            heapq.heappush(self._queue, (tick, i))
+
+    def _pop_due(self, tick: int) -> List[int]:
+        due: List[int] = []
+        while self._queue and self._queue[0][0] <= tick:
+            _, i = heapq.heappop(self._queue)
+            self._queued.discard(i)
+            due.append(i)
+        due.sort()   # mesma ordem do loop original
+        return due
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import heapq
+import math
+from typing import Callable, Dict, Hashable, Iterator, List, Set, Tuple
+
+from pathfinder import AdjTable, NodeId
+
+Coord  = Tuple[int, int]   # (row, col)
+Bucket = Tuple[int, int]
+Hit    = Tuple[Hashable, int]   # (chave, distância)
+
+
+"""
+Índice espacial de posições em grade uniforme (baldes de `cell_size` ×
+`cell_size` células), para perguntas como "quais vans estão perto deste
+pedido/incidente" sem varrer todos os agentes.
+
+    • `insert`/`move`/`remove` custam O(1); `move` dentro do mesmo balde só
+      troca a coordenada.
+    • `nearest(cell, k)`: k mais próximos por distância de grade (Manhattan),
+      visitando anéis de baldes a partir do balde da consulta até que nenhum
+      anel seguinte possa ter alguém mais perto.
+    • `within(cell, radius)`: todos a até `radius` (Manhattan).
+    • `nearest_by_road`: refina pela distância na malha viária com uma
+      busca limitada a partir da consulta. Distância de rua >= distância de
+      grade, então os candidatos da grade bastam (o resultado é exato).
+
+As chaves são quaisquer objetos hasheáveis (o ControlAgent usa os próprios
+agentes). Empates saem na ordem de inserção.
+"""
+class SpatialIndex:
+
+    def __init__(self, cell_size: int = 16) -> None:
+
+        if cell_size < 1:
+            raise ValueError("cell_size deve ser >= 1")
+        self.cell_size = cell_size
+
+        # estado interno
+        self._buckets: Dict[Bucket, Dict[Hashable, Coord]] = {}
+        self._where: Dict[Hashable, Coord] = {}
+        self._seq: Dict[Hashable, int] = {}     # ordem de inserção (desempate)
+        self._next = 0
+
+    # Interface pública
+    def insert(self, key: Hashable, cell: Coord) -> None:
+        if key in self._where:
+            self.move(key, cell)
+            return
+        self._where[key] = cell
+        self._seq[key] = self._next
+        self._next += 1
+        self._buckets.setdefault(self._bucket(cell), {})[key] = cell
+
+    def move(self, key: Hashable, cell: Coord) -> None:
+        old = self._where.get(key)
+        if old is None:
+            raise KeyError(key)
+        self._where[key] = cell
+        b_old, b_new = self._bucket(old), self._bucket(cell)
+        if b_old == b_new:
+            self._buckets[b_new][key] = cell
+            return
+        self._discard(b_old, key)
+        self._buckets.setdefault(b_new, {})[key] = cell
+
+    def remove(self, key: Hashable) -> None:
+        cell = self._where.pop(key)
+        del self._seq[key]
+        self._discard(self._bucket(cell), key)
+
+    def position(self, key: Hashable) -> Coord:
+        return self._where[key]
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._where)
+
+    def nearest(
+        self,
+        cell: Coord,
+        k: int = 1,
+        max_dist: int | None = None,
+        where: Callable[[Hashable], bool] | None = None,   # filtro (ex.: só vans livres)
+    ) -> List[Hit]:
+        """Até `k` chaves mais próximas de `cell` (Manhattan), da mais perto à mais longe."""
+        if k <= 0 or not self._where:
+            return []
+        r, c = cell
+        cs = self.cell_size
+        br, bc = r // cs, c // cs
+        seq = self._seq
+        found: List[Tuple[int, int, Hashable]] = []
+
+        def coletar(items: Dict[Hashable, Coord]) -> None:
+            for key, (rr, cc) in items.items():
+                d = abs(rr - r) + abs(cc - c)
+                if (max_dist is None or d <= max_dist) and (where is None or where(key)):
+                    found.append((d, seq[key], key))
+
+        ring = 0
+        while True:
+            if 8 * ring > len(self._buckets):
+                # anel maior que o número de baldes ocupados: varre os que faltam
+                for (rb, cb), items in self._buckets.items():
+                    if max(abs(rb - br), abs(cb - bc)) >= ring:
+                        coletar(items)
+                break
+            for b in _ring(br, bc, ring):
+                items = self._buckets.get(b)
+                if items:
+                    coletar(items)
+            # fora do quadrado de baldes já visto, tudo está a pelo menos `limite`
+            limite = 1 + min(
+                r - (br - ring) * cs, (br + ring + 1) * cs - 1 - r,
+                c - (bc - ring) * cs, (bc + ring + 1) * cs - 1 - c,
+            )
+            if max_dist is not None and limite > max_dist:
+                break
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] < limite:
+                break
+            ring += 1
+        return [(key, d) for d, _, key in heapq.nsmallest(k, found)]
+
+    def within(self, cell: Coord, radius: int) -> List[Hit]:
+        """Todas as chaves a até `radius` de `cell` (Manhattan), da mais perto à mais longe."""
+        r, c = cell
+        cs = self.cell_size
+        found: List[Tuple[int, int, Hashable]] = []
+        for rb in range((r - radius) // cs, (r + radius) // cs + 1):
+            for cb in range((c - radius) // cs, (c + radius) // cs + 1):
+                items = self._buckets.get((rb, cb))
+                if not items:
+                    continue
+                for key, (rr, cc) in items.items():
+                    d = abs(rr - r) + abs(cc - c)
+                    if d <= radius:
+                        found.append((d, self._seq[key], key))
+        found.sort()
+        return [(key, d) for d, _, key in found]
+
+    def nearest_by_road(
+        self,
+        cell: Coord,
+        k: int,
+        adj: AdjTable,
+        node_at: Dict[Coord, NodeId],
+        cost_fn: Callable[[NodeId, NodeId], int] | None = None,   # custo >= 1 por passo
+        max_cost: int | None = None,
+        where: Callable[[Hashable], bool] | None = None,
+        oversample: int = 4,
+    ) -> List[Hit]:
+        """
+        Até `k` chaves mais próximas de `cell` pelo custo de ir da chave até
+        `cell` na malha (sem rota = fora). Candidatos vêm de `nearest`
+        (`oversample`·k); se algum não candidato ainda puder vencer, a lista
+        de candidatos dobra e a busca se repete.
+        """
+        if k <= 0 or cell not in node_at:
+            return []
+        m = max(k, k * oversample)
+        while True:
+            cands = self.nearest(cell, m + 1, max_dist=max_cost, where=where)
+            # ninguém fora da lista está a menos que isto (grade <= rua)
+            limite = cands[m][1] if len(cands) > m else math.inf
+            hits = self._road_costs(node_at[cell], cands[:m], k, adj, node_at, cost_fn, max_cost)
+            if len(cands) <= m or (len(hits) >= k and hits[k - 1][1] <= limite):
+                return hits[:k]
+            m *= 2
+
+    # Algoritmos internos
+    def _bucket(self, cell: Coord) -> Bucket:
+        return cell[0] // self.cell_size, cell[1] // self.cell_size
+
+    def _discard(self, bucket: Bucket, key: Hashable) -> None:
+        items = self._buckets[bucket]
+        del items[key]
+        if not items:
+            del self._buckets[bucket]
+
+    def _road_costs(
+        self,
+        origem: NodeId,
+        cands: List[Hit],
+        k: int,
+        adj: AdjTable,
+        node_at: Dict[Coord, NodeId],
+        cost_fn: Callable[[NodeId, NodeId], int] | None,
+        max_cost: int | None,
+    ) -> List[Hit]:
+        """
+        Dijkstra reverso a partir da consulta (custo de u→v é o de entrar em
+        v, então aresta u→v sai de v). Para ao fixar `k` candidatos ou passar
+        de `max_cost`.
+        """
+        alvos: Dict[NodeId, List[Hashable]] = {}
+        for key, _ in cands:
+            n = node_at.get(self._where[key])
+            if n is not None:
+                alvos.setdefault(n, []).append(key)
+
+        found: List[Tuple[int, int, Hashable]] = []
+        dist: Dict[NodeId, int] = {origem: 0}
+        heap: List[Tuple[int, NodeId]] = [(0, origem)]
+        settled: Set[NodeId] = set()
+        while heap and alvos:
+            d, v = heapq.heappop(heap)
+            if v in settled:
+                continue
+            if max_cost is not None and d > max_cost:
+                break
+            settled.add(v)
+            for key in alvos.pop(v, ()):
+                found.append((d, self._seq[key], key))
+            if len(found) >= k:
+                break
+            for u in adj[v]:
+                nd = d + (cost_fn(u, v) if cost_fn is not None else 1)
+                if nd < dist.get(u, math.inf):
+                    dist[u] = nd
+                    heapq.heappush(heap, (nd, u))
+        found.sort()
+        return [(key, d) for d, _, key in found]
+
+
+def _ring(br: int, bc: int, ring: int) -> Iterator[Bucket]:
+    """Baldes a distância de Chebyshev exatamente `ring` de (br, bc)."""
+    if ring == 0:
+        yield br, bc
+        return
+    for cb in range(bc - ring, bc + ring + 1):
+        yield br - ring, cb
+        yield br + ring, cb
+    for rb in range(br - ring + 1, br + ring):
+        yield rb, bc - ring
+        yield rb, bc + ring
@@ -0,0 +1,219 @@
+from __future__ import annotations
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+Coord = Tuple[int, int] # (row, col)
+
+# sorteios com rejeição antes de cair na amostragem exata
+MAX_REJECTION_ROUNDS = 8
+
+
+"""
+Modelo de tráfego vetorizado (usado pelo ControlAgent com `engine=`).
+
+    • TTL de cada célula num array NumPy (grade achatada) e os alertas vivos
+      num array de índices: decair e expirar é uma operação em bloco.
+    • Alertas novos só caem em células de rua (`road_mask`), opcionalmente
+      com pesos (`weights`: densidade de ruas, mapa de hotspots...).
+    • Gerador próprio (`seed`): a mesma semente repete o mesmo tráfego.
+
+Mesma dinâmica do modelo original: a cada passo os alertas com TTL 1
+expiram, os demais perdem 1, e a grade é completada até `max_alerts` com
+células novas (distintas das que já têm alerta) de TTL `ttl`.
+
+Cada passo guarda também o que mudou (`changes`: células que ganharam ou
+perderam alerta), e `cells` é refeito a partir do conjunto anterior com essas
+mudanças em vez de reconstruído do zero. Consultas pontuais (`in`) olham
+direto `ttl_grid`.
+"""
+class TrafficEngine:
+
+    def __init__(
+        self,
+        rows: int,
+        cols: int,
+        ttl: int = 4,
+        max_alerts: int = 2,
+        road_mask: np.ndarray | None = None,   # (rows, cols) bool; None = todas as células
+        weights: np.ndarray | None = None,     # (rows, cols) >= 0; None = uniforme
+        seed: int | None = None,
+    ) -> None:
+
+        self.rows       = rows
+        self.cols       = cols
+        self.ttl        = ttl
+        self.max_alerts = max_alerts
+        self.rng        = np.random.default_rng(seed)
+
+        # candidatas ao sorteio (índices achatados) e CDF dos pesos
+        mask = np.ones((rows, cols), dtype=bool) if road_mask is None else np.asarray(road_mask, dtype=bool)
+        if mask.shape != (rows, cols):
+            raise ValueError("road_mask deve ter forma (rows, cols)")
+        w = None
+        if weights is not None:
+            w = np.asarray(weights, dtype=np.float64)
+            if w.shape != (rows, cols):
+                raise ValueError("weights deve ter forma (rows, cols)")
+            mask = mask & (w > 0)
+        self._cand = np.flatnonzero(mask)
+        self._cdf = None if w is None else np.cumsum(w.ravel()[self._cand])
+
+        # estado interno
+        self.ttl_grid = np.zeros(rows * cols, dtype=np.int32)   # 0 = sem alerta
+        self._active  = np.empty(0, dtype=np.int64)            # ordem de criação
+        self._scratch = np.empty(rows * cols, dtype=np.int64)   # deduplicação do sorteio
+        self._expired = _VAZIO                                  # saíram no passo atual
+        self._added   = _VAZIO                                  # entraram no passo atual
+        self._cells: Set[Coord] = set()                         # último conjunto entregue
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []  # (saíram, entraram) desde então
+
+    @classmethod
+    def from_roads(
+        cls,
+        is_road: Dict[Coord, bool],
+        rows: int,
+        cols: int,
+        weighting: str | np.ndarray | None = None,   # None, "density" ou array de hotspots
+        **kwargs,
+    ) -> "TrafficEngine":
+        """Engine que só sorteia ruas de `is_road` (formato de `load_graph`)."""
+        mask = np.zeros((rows, cols), dtype=bool)
+        for (r, c), road in is_road.items():
+            if road and 0 <= r < rows and 0 <= c < cols:
+                mask[r, c] = True
+        weights = road_density(mask) if isinstance(weighting, str) and weighting == "density" else weighting
+        return cls(rows, cols, road_mask=mask, weights=weights, **kwargs)
+
+    # Interface pública
+    def step(self) -> None:
+        self._expired = self._added = _VAZIO
+        self.decay()
+        self.spawn()
+
+    def decay(self) -> None:
+        """Expira os alertas com TTL 1 e desconta 1 dos demais."""
+        if not self._active.size:
+            return
+        ttl = self.ttl_grid[self._active] - 1
+        self.ttl_grid[self._active] = ttl
+        vivos = ttl > 0
+        mortos = self._active[~vivos]
+        self._active = self._active[vivos]
+        if mortos.size:
+            self._expired = np.concatenate((self._expired, mortos))
+            self._pending.append((mortos, _VAZIO))
+
+    def spawn(self) -> None:
+        """Completa até `max_alerts` alertas com células de rua ainda livres."""
+        faltam = self.max_alerts - self._active.size
+        if faltam <= 0:
+            return
+        novos = self._sample(faltam)
+        if novos.size:
+            self._active = np.concatenate((self._active, novos))
+            self._added = np.concatenate((self._added, novos))
+            self._pending.append((_VAZIO, novos))
+
+    def __len__(self) -> int:
+        return int(self._active.size)
+
+    def __contains__(self, cell: Coord) -> bool:
+        r, c = cell
+        return 0 <= r < self.rows and 0 <= c < self.cols and self.ttl_grid[r * self.cols + c] > 0
+
+    def cells(self) -> Set[Coord]:
+        """Células com alerta (conjunto novo a cada passo; não modifique)."""
+        if self._pending:
+            delta = sum(a.size + b.size for a, b in self._pending)
+            if delta >= self._active.size:
+                # mais mudanças que alertas: reconstruir sai mais barato
+                cells = set(_coords(self._active, self.cols))
+            else:
+                cells = set(self._cells)
+                for saiu, entrou in self._pending:
+                    cells.difference_update(_coords(saiu, self.cols))
+                    cells.update(_coords(entrou, self.cols))
+            self._cells = cells
+            self._pending = []
+        return self._cells
+
+    def changes(self) -> Set[Coord]:
+        """Células que ganharam ou perderam alerta no último `step`."""
+        # expirou e foi sorteada de novo no mesmo passo: continua com alerta
+        return set(_coords(np.setxor1d(self._expired, self._added), self.cols))
+
+    def ttls(self) -> Dict[Coord, int]:
+        r, c = np.divmod(self._active, self.cols)
+        return dict(zip(zip(r.tolist(), c.tolist()), self.ttl_grid[self._active].tolist()))
+
+    def forecast(self, horizon: int) -> List[Set[Coord]]:
+        """Alertas já conhecidos em cada um dos próximos `horizon` ticks."""
+        r, c = np.divmod(self._active, self.cols)
+        ttl = self.ttl_grid[self._active]
+        return [
+            set(zip(r[ttl > d].tolist(), c[ttl > d].tolist())) if d else self.cells()
+            for d in range(horizon)
+        ]
+
+    # Algoritmos internos
+    def _draw(self, n: int) -> np.ndarray:
+        if self._cdf is None:
+            return self._cand[self.rng.integers(0, self._cand.size, n)]
+        # chaves ordenadas deixam o searchsorted sequencial na memória
+        u = np.sort(self.rng.random(n)) * self._cdf[-1]
+        return self._cand[np.searchsorted(self._cdf, u, side="right")]
+
+    def _sample(self, k: int) -> np.ndarray:
+        """`k` candidatas distintas e sem alerta (já marcadas com TTL em `ttl_grid`)."""
+        if not self._cand.size:
+            return np.empty(0, dtype=np.int64)
+        k = min(k, self._cand.size - self._active.size)   # todo alerta está numa candidata
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        # rejeição em lote: barata enquanto a grade não está quase cheia
+        partes: List[np.ndarray] = []
+        falta = k
+        for _ in range(MAX_REJECTION_ROUNDS):
+            draw = self._draw(falta)
+            draw = draw[self.ttl_grid[draw] == 0]
+            # duplicatas sem ordenar: cada célula fica com uma única posição vencedora
+            pos = np.arange(draw.size)
+            self._scratch[draw] = pos
+            draw = draw[self._scratch[draw] == pos]
+            self.ttl_grid[draw] = self.ttl
+            partes.append(draw)
+            falta -= draw.size
+            if not falta:
+                return np.concatenate(partes)
+
+        # poucas livres: amostragem exata entre as que restam
+        livres = self._cand[self.ttl_grid[self._cand] == 0]
+        p = None
+        if self._cdf is not None:
+            w = np.diff(self._cdf, prepend=0.0)[np.searchsorted(self._cand, livres)]
+            p = w / w.sum()
+        extra = self.rng.choice(livres, size=falta, replace=False, p=p).astype(np.int64)
+        self.ttl_grid[extra] = self.ttl
+        partes.append(extra)
+        return np.concatenate(partes)
+
+
+_VAZIO = np.empty(0, dtype=np.int64)
+
+
+def _coords(idx: np.ndarray, cols: int):
+    r, c = np.divmod(idx, cols)
+    return zip(r.tolist(), c.tolist())
+
+
+def road_density(mask: np.ndarray, radius: int = 1) -> np.ndarray:
+    """Fração de ruas na janela (2·radius+1)² de cada célula (0 fora das ruas)."""
+    m = np.asarray(mask, dtype=np.float64)
+    k = 2 * radius + 1
+    pad = np.pad(m, radius)
+    s = pad.cumsum(0).cumsum(1)
+    s = np.pad(s, ((1, 0), (1, 0)))
+    soma = s[k:, k:] - s[:-k, k:] - s[k:, :-k] + s[:-k, :-k]
+    return np.where(m > 0, soma / (k * k), 0.0)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+NodeId   = str
+Coord    = Tuple[int, int]
+PosTable = Dict[NodeId, Coord]
+
+# maior corrida num único registro (contagem em uint16)
+MAX_RUN = 0xFFFF
+
+
+"""
+Histórico de posições compacto, com a mesma leitura de uma lista de NodeIds
+(`len`, `traj[t]`, iteração).
+
+Guarda só a origem e corridas (direção, passos): um trecho reto vira uma
+corrida de passos (dr, dc) iguais e uma espera vira uma corrida de (0, 0).
+Cada corrida ocupa 3 bytes (código da direção em uint8 + contagem em uint16),
+contra 8 bytes por tick de uma lista de strings.
+
+Com `maxlen`, funciona como ring buffer: só as últimas `maxlen` posições ficam
+guardadas (`offset` diz quantas foram descartadas).
+"""
+class Trajectory:
+
+    def __init__(
+        self,
+        start: NodeId,
+        pos: PosTable,
+        maxlen: int | None = None,
+        node_at: Dict[Coord, NodeId] | None = None,   # inverso de `pos` (pode ser compartilhado)
+    ) -> None:
+
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen deve ser >= 1")
+        self.maxlen  = maxlen
+        self._pos     = pos
+        self._node_at = node_at if node_at is not None else {c: n for n, c in pos.items()}
+
+        # corridas
+        self._deltas: List[Coord] = []          # código -> (dr, dc)
+        self._codes: Dict[Coord, int] = {}
+        self._dirs   = array("B")
+        self._counts = array("H")
+        self._head   = 0                        # primeira corrida viva (ring buffer)
+
+        # estado interno
+        self._origin = pos[start]
+        self._last   = self._origin
+        self._len    = 1
+        self.offset  = 0                        # posições descartadas pelo ring buffer
+        self._index: Tuple[List[int], List[Coord]] | None = None
+
+    # Interface pública
+    def append(self, node_id: NodeId) -> None:
+        r, c = self._pos[node_id]
+        delta = (r - self._last[0], c - self._last[1])
+        code = self._codes.get(delta)
+        if code is None:
+            code = len(self._deltas)
+            if code > 0xFF:
+                raise ValueError("Trajectory: direções distintas demais")
+            self._codes[delta] = code
+            self._deltas.append(delta)
+
+        if len(self._dirs) > self._head and self._dirs[-1] == code and self._counts[-1] < MAX_RUN:
+            self._counts[-1] += 1
+        else:
+            self._dirs.append(code)
+            self._counts.append(1)
+        self._last = (r, c)
+        self._len += 1
+        self._index = None
+
+        if self.maxlen is not None and self._len > self.maxlen:
+            self._trim(self._len - self.maxlen)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, t: int | slice) -> NodeId | List[NodeId]:
+        if isinstance(t, slice):
+            return [self[i] for i in range(*t.indices(self._len))]
+        if t < 0:
+            t += self._len
+        if not 0 <= t < self._len:
+            raise IndexError("Trajectory index out of range")
+        return self._node_at[self._coord_at(t)]
+
+    def __iter__(self) -> Iterator[NodeId]:
+        return iter(self.nodes())
+
+    def nodes(self) -> List[NodeId]:
+        """Lista de NodeIds (compatível com o antigo `history`)."""
+        node_at = self._node_at
+        return [node_at[(r, c)] for r, c in self.coords().tolist()]
+
+    def coords(self) -> "np.ndarray":
+        """
+        Posições como array (n, 2) int32 de (row, col): as corridas são lidas
+        por views sobre os buffers e expandidas com repeat + cumsum, sem
+        passar por NodeIds.
+        """
+        import numpy as np
+
+        out = np.empty((self._len, 2), dtype=np.int32)
+        out[0] = self._origin
+        if self._len > 1:
+            dirs   = np.frombuffer(self._dirs, dtype=np.uint8)[self._head:]
+            counts = np.frombuffer(self._counts, dtype=np.uint16)[self._head:]
+            deltas = np.asarray(self._deltas, dtype=np.int32).reshape(-1, 2)
+            np.cumsum(np.repeat(deltas[dirs], counts, axis=0), axis=0, out=out[1:])
+            out[1:] += out[0]
+            del dirs, counts   # libera os buffers para novos appends
+        return out
+
+    @property
+    def runs(self) -> int:
+        return len(self._dirs) - self._head
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados pelas corridas (sem a tabela de direções)."""
+        return self.runs * (self._dirs.itemsize + self._counts.itemsize)
+
+    # Algoritmos internos
+    def _coord_at(self, t: int) -> Coord:
+        if t == 0:
+            return self._origin
+        if t == self._len - 1:
+            return self._last
+        if self._index is None:
+            self._build_index()
+        ends, starts = self._index
+        # corrida k cobre as posições ends[k-1]+1 .. ends[k]
+        lo, hi = 0, len(ends)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ends[mid] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        k = lo
+        base = ends[k - 1] if k else 0
+        dr, dc = self._deltas[self._dirs[self._head + k]]
+        r0, c0 = starts[k]
+        n = t - base
+        return (r0 + dr * n, c0 + dc * n)
+
+    def _build_index(self) -> None:
+        """Fim (posição) e coordenada inicial de cada corrida viva."""
+        ends: List[int] = []
+        starts: List[Coord] = []
+        r, c = self._origin
+        total = 0
+        for i in range(self._head, len(self._dirs)):
+            n = self._counts[i]
+            dr, dc = self._deltas[self._dirs[i]]
+            starts.append((r, c))
+            r, c = r + dr * n, c + dc * n
+            total += n
+            ends.append(total)
+        self._index = (ends, starts)
+
+    def _trim(self, k: int) -> None:
+        """Descarta as `k` posições mais antigas."""
+        r, c = self._origin
+        while k:
+            i = self._head
+            take = min(k, self._counts[i])
+            dr, dc = self._deltas[self._dirs[i]]
+            r, c = r + dr * take, c + dc * take
+            self._counts[i] -= take
+            k -= take
+            self._len -= take
+            self.offset += take
+            if self._counts[i] == 0:
+                self._head += 1
+        self._origin = (r, c)
+        # compacta de vez em quando (del no início do array é O(n))
+        if self._head > 64 and self._head * 2 > len(self._dirs):
+            del self._dirs[:self._head]
+            del self._counts[:self._head]
+            self._head = 0
+        self._index = None